@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+
+
+class SimpleOfficeConfig(AppConfig):
+    name = 'SimpleOffice'
+
+    def ready(self):
+        from django.db.models.signals import post_migrate
+
+        from SimpleOffice.cache import create_cache_tables
+
+        post_migrate.connect(create_cache_tables, dispatch_uid='SimpleOffice:create_cache_tables')
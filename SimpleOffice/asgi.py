@@ -0,0 +1,21 @@
+"""
+ASGI config for SimpleOffice project.
+
+It exposes the ASGI callable as a module-level variable named ``application``,
+served e.g. with `uvicorn SimpleOffice.asgi:application`.
+
+See SimpleOffice.asgi_handler for how requests are run on Django 2.2.
+"""
+
+import os
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'SimpleOffice.settings')
+django.setup(set_prefix=False)
+
+from SimpleOffice.asgi_handler import ASGIHandler  # noqa: E402 needs the apps loaded
+from SimpleOffice.schema import load  # noqa: E402
+
+application = ASGIHandler()
+load()  # the stored OpenAPI schema, generated if the code changed
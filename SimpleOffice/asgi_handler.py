@@ -0,0 +1,169 @@
+"""
+ASGI handler for Django 2.2, which has neither async views nor an async ORM.
+
+The event loop accepts connections, reads request bodies and writes
+responses; the blocking part of a request (middleware, view, queries and
+rendering) runs in a thread pool whose size caps the database connections
+in use. Requests beyond the cap wait in the loop, not in a thread holding a
+connection as with a threaded WSGI server.
+
+Reads of the directory (list and retrieve of members, skills, projects and
+work hours, MembersFilter included) get a pool of their own, so a burst of
+imports or exports can't starve them.
+"""
+import asyncio
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.urls import Resolver404, resolve
+
+READ_METHODS = ('GET', 'HEAD')
+READ_ROUTES = frozenset(
+    f'{basename}-{suffix}'
+    for basename in ('members', 'skills', 'projects', 'workhours')
+    for suffix in ('list', 'detail')
+)
+
+
+def build_environ(scope, body):
+    """
+    WSGI environ of an ASGI http scope, `body` is a file object
+    """
+    root_path = scope.get('root_path', '')
+    path = scope['path']
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path):]
+
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': root_path.encode('utf-8').decode('latin-1'),
+        'PATH_INFO': path.encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_PROTOCOL': f'HTTP/{scope.get("http_version", "1.1")}',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    server = scope.get('server') or ('localhost', 80)
+    environ['SERVER_NAME'], environ['SERVER_PORT'] = server[0], str(server[1] or 80)
+    if scope.get('client'):
+        environ['REMOTE_ADDR'], environ['REMOTE_PORT'] = scope['client'][0], str(scope['client'][1])
+
+    for name, value in scope.get('headers', ()):
+        name, value = name.decode('latin-1').lower(), value.decode('latin-1')
+        if name == 'content-length':
+            key = 'CONTENT_LENGTH'
+        elif name == 'content-type':
+            key = 'CONTENT_TYPE'
+        else:
+            key = 'HTTP_' + name.upper().replace('-', '_')
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+def is_read(scope):
+    if scope['method'] not in READ_METHODS:
+        return False
+    try:
+        return resolve(scope['path'][len(scope.get('root_path', '')):] or '/').url_name in READ_ROUTES
+    except Resolver404:
+        return False
+
+
+class ASGIHandler:
+    """
+    :param read_concurrency: threads, and so database connections, serving reads
+    :param write_concurrency: threads serving every other request
+    """
+
+    def __init__(self, read_concurrency=None, write_concurrency=None):
+        self.wsgi = WSGIHandler()
+        self.reads = ThreadPoolExecutor(
+            read_concurrency or getattr(settings, 'ASYNC_READ_CONCURRENCY', 16), thread_name_prefix='asgi-read'
+        )
+        self.writes = ThreadPoolExecutor(
+            write_concurrency or getattr(settings, 'ASYNC_WRITE_CONCURRENCY', 4), thread_name_prefix='asgi-write'
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http':
+            raise ValueError(f'Unsupported ASGI scope type {scope["type"]}')
+
+        body = await self.read_body(receive)
+        if body is None:
+            return
+        pool = self.reads if is_read(scope) else self.writes
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(pool, self.respond, build_environ(scope, body), send, loop)
+        finally:
+            body.close()
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.reads.shutdown(wait=True)
+                self.writes.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    @staticmethod
+    async def read_body(receive):
+        """
+        :return: the request body spooled to disk past FILE_UPLOAD_MAX_MEMORY_SIZE,
+            None if the client went away
+        """
+        body = tempfile.SpooledTemporaryFile(max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE, mode='w+b')
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                body.close()
+                return None
+            body.write(message.get('body', b''))
+            if not message.get('more_body', False):
+                body.seek(0)
+                return body
+
+    def respond(self, environ, send, loop):
+        """
+        Runs in a pool thread: the response is iterated in the thread that
+        produced it, as server-side cursors of streamed exports belong to its
+        connection, and only the sending is handed back to the loop
+        """
+        def send_message(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        started = []
+
+        def start_response(status, headers, exc_info=None):
+            started[:] = [int(status.split(' ', 1)[0]), [
+                (name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers
+            ]]
+
+        response = self.wsgi(environ, start_response)
+        try:
+            send_message({'type': 'http.response.start', 'status': started[0], 'headers': started[1]})
+            if environ['REQUEST_METHOD'] == 'HEAD':
+                send_message({'type': 'http.response.body'})
+            elif getattr(response, 'streaming', False):
+                for chunk in response:
+                    if chunk:
+                        send_message({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                send_message({'type': 'http.response.body'})
+            else:
+                send_message({'type': 'http.response.body', 'body': b''.join(response)})
+        finally:
+            # Fires request_finished, which returns the database connection
+            response.close()
@@ -0,0 +1,235 @@
+"""
+Response cache for read endpoints.
+
+Every cached response depends on a few namespaces ('members', 'skills', ...).
+Each namespace has a version, the time of its last change, which is part of
+every cache key, so a write invalidates all dependent responses at once by
+bumping the version from a model signal. The versions of this process are
+bumped right away, the shared ones (get_shared_versions) once writes commit
+so every other process sees them too, and keys hold both. The versions also
+produce the ETag used for conditional GETs. There is no Last-Modified: its resolution of
+a second can't tell apart writes made within the same second, and responses
+depending on the current time change without any write.
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import DatabaseError, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.utils.http import quote_etag
+from rest_framework import status
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from SimpleOffice.db import replica_may_lag
+
+logger = logging.getLogger(__name__)
+
+
+def get_cache():
+    return caches[getattr(settings, 'API_CACHE_ALIAS', 'default')]
+
+
+def _version_key(namespace):
+    return f'api:version:{namespace}'
+
+
+def get_versions(namespaces):
+    """
+    :return: dict namespace -> version, unknown namespaces start now
+    """
+    cache = get_cache()
+    keys = {_version_key(namespace): namespace for namespace in namespaces}
+    found = cache.get_many(keys)
+    missing = {key: time.time() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, None)
+        found.update(missing)
+    return {keys[key]: version for key, version in found.items()}
+
+
+def get_shared_cache():
+    return caches[getattr(settings, 'SHARED_VERSIONS_CACHE_ALIAS', 'versions')]
+
+
+def get_shared_versions(namespaces):
+    """
+    Versions kept in a cache every process reads, bumped once writes commit.
+    The versions of the API cache may be those of this process only (locmem),
+    which never sees the writes made by other processes
+    :return: dict namespace -> version, unknown namespaces start now
+    """
+    cache = get_shared_cache()
+    keys = {_version_key(namespace): namespace for namespace in namespaces}
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        now = time.time()
+        for key in missing:
+            cache.add(key, now, None)  # another process may have started it meanwhile
+        found.update(cache.get_many(missing))
+    return {keys[key]: version for key, version in found.items()}
+
+
+def get_state_versions(namespaces):
+    """
+    What in-process state built from the namespaces, like an index, is current for:
+    the versions of this process, bumped right away by its own writes, and the shared ones
+    """
+    return get_versions(namespaces), get_shared_versions(namespaces)
+
+
+def invalidate(*namespaces):
+    """
+    Bumps the versions right away and once more when the current transaction
+    commits, so responses cached from uncommitted data are dropped as well.
+    The shared versions are bumped on commit only, once other processes can
+    read the changes
+    """
+    def bump(cache):
+        now = time.time()
+        cache.set_many({_version_key(namespace): now for namespace in namespaces}, None)
+
+    def bump_committed():
+        bump(get_cache())
+        try:
+            bump(get_shared_cache())
+        except DatabaseError:
+            # The write is committed already, other processes catch up with the next bump
+            logger.exception('Shared versions of %s not bumped', ', '.join(namespaces))
+
+    bump(get_cache())
+    transaction.on_commit(bump_committed)
+
+
+def create_cache_tables(using, verbosity=1, **kwargs):
+    """
+    post_migrate receiver, the tables of the database caches, the shared
+    versions among them, exist before any write bumps them
+    """
+    call_command('createcachetable', database=using, verbosity=verbosity)
+
+
+def invalidate_on_change(model, *namespaces):
+    """
+    Connects the model signals that invalidate the namespaces,
+    m2m fields of the model are covered too
+    """
+    def handler(sender, **kwargs):
+        if kwargs.get('action', 'post_').startswith('post_'):
+            invalidate(*namespaces)
+
+    dispatch_uid = f'api-cache:{model._meta.label}'
+    post_save.connect(handler, sender=model, weak=False, dispatch_uid=dispatch_uid)
+    post_delete.connect(handler, sender=model, weak=False, dispatch_uid=dispatch_uid)
+    for field in model._meta.many_to_many:
+        m2m_changed.connect(handler, sender=field.remote_field.through, weak=False, dispatch_uid=dispatch_uid)
+
+
+class CacheStats:
+    """
+    Per-process hit/miss counters
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = Counter()
+
+    def count(self, name, event):
+        with self.lock:
+            self.counters[(name, event)] += 1
+
+    def as_dict(self):
+        with self.lock:
+            result = {}
+            for (name, event), value in self.counters.items():
+                result.setdefault(name, {'hit': 0, 'miss': 0, 'not_modified': 0})[event] = value
+            return result
+
+
+stats = CacheStats()
+
+
+class CachedResponseMixin:
+    """
+    Caches list/retrieve response data, keyed by the full URL and the
+    versions of `cache_dependencies`, of this process and the shared ones,
+    and answers conditional GETs with 304
+    """
+    cache_dependencies = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    def get_cache_name(self):
+        return f'{self.basename}-{self.action}'
+
+    def get_cache_key_extra(self, request):
+        """
+        Anything besides the URL the response depends on, e.g. the current time
+        """
+        return ''
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        name = self.get_cache_name()
+        versions, shared_versions = get_state_versions(self.cache_dependencies)
+
+        url = request.build_absolute_uri()
+        key = 'api:response:' + hashlib.md5(
+            f'{url}|{sorted(versions.items())}|{sorted(shared_versions.items())}|'
+            f'{self.get_cache_key_extra(request)}'.encode()
+        ).hexdigest()
+        # Representations differ per media type, the cached data doesn't
+        etag = quote_etag(hashlib.md5(f'{key}|{request.accepted_media_type}'.encode()).hexdigest())
+
+        if self.is_not_modified(request, etag):
+            stats.count(name, 'not_modified')
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            cache = get_cache()
+            data = cache.get(key)
+            if data is not None:
+                stats.count(name, 'hit')
+                response = Response(data)
+            else:
+                stats.count(name, 'miss')
+                response = handler(request, *args, **kwargs)
+                # Neither cached nor tagged when a replica may not have the latest change yet
+                lagging = replica_may_lag(max(*versions.values(), *shared_versions.values(), 0))
+                if response.status_code != status.HTTP_200_OK or lagging:
+                    return response
+                cache.set(key, response.data, getattr(settings, 'API_CACHE_TIMEOUT', 300))
+
+        response['ETag'] = etag
+        response['Vary'] = 'Accept'
+        return response
+
+    @staticmethod
+    def is_not_modified(request, etag):
+        """
+        If-None-Match only, If-Modified-Since is ignored as no Last-Modified is sent
+        """
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match is None:
+            return False
+        return etag in (tag.strip() for tag in if_none_match.split(',')) or if_none_match.strip() == '*'
+
+
+class CacheStatsView(APIView):
+    """
+    Hit/miss counters of the response cache in this process
+    """
+    permission_classes = (AllowAny, )
+
+    def get(self, request):
+        return Response(stats.as_dict())
@@ -0,0 +1,160 @@
+"""
+Read replicas and connection health.
+
+ReplicaRouter sends the queries of read-only viewset actions (ReplicaReadMixin)
+to one of settings.READ_REPLICAS, everything else to the primary. Reads stay
+on the primary for the rest of a request once it wrote, and for
+REPLICA_STICKY_SECONDS afterwards for the same client through a cookie set by
+ReplicaPinningMiddleware, so clients read their own writes despite the
+replication lag.
+
+Connections are persistent (CONN_MAX_AGE); with CONN_HEALTH_CHECKS set on a
+database, reused connections are checked at the start of every request and
+dropped when the server went away, as Django only does it from 4.1 on.
+"""
+import math
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.signals import request_finished, request_started
+from django.db import connections
+
+PIN_COOKIE = 'primary_until'
+
+_state = threading.local()
+
+
+def begin(pinned=False):
+    """
+    Fresh routing state of a request, replicas are off until a read-only action starts
+    """
+    _state.replicas = False
+    _state.replica = None
+    _state.pinned = pinned
+    _state.wrote = False
+
+
+def end(**kwargs):
+    begin()
+
+
+def use_replicas():
+    _state.replicas = True
+
+
+def reads_from_replica():
+    return bool(getattr(_state, 'replicas', False) and not getattr(_state, 'pinned', False) and settings.READ_REPLICAS)
+
+
+def replica_may_lag(since):
+    """
+    Whether data read now may predate a change made at `since`
+    """
+    return reads_from_replica() and time.time() - since < settings.REPLICA_STICKY_SECONDS
+
+
+@contextmanager
+def primary():
+    """
+    Reads of the block go to the primary, e.g. for data cached under the
+    current version of its namespace
+    """
+    pinned = getattr(_state, 'pinned', False)
+    _state.pinned = True
+    try:
+        yield
+    finally:
+        _state.pinned = pinned
+
+
+@contextmanager
+def wrapped_queries(wrapper):
+    """
+    connection.execute_wrapper() on every connection, without a context manager per connection
+    """
+    stacks = [connection.execute_wrappers for connection in connections.all()]
+    for stack in stacks:
+        stack.append(wrapper)
+    try:
+        yield
+    finally:
+        for stack in stacks:
+            stack.pop()
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        if not reads_from_replica():
+            return None
+        if _state.replica is None:
+            _state.replica = self.pick_replica()
+        return _state.replica
+
+    def db_for_write(self, model, **hints):
+        _state.pinned = _state.wrote = True
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # replicas hold the same data
+
+    def allow_migrate(self, db, app_label, **hints):
+        return False if db in settings.READ_REPLICAS else None
+
+    @staticmethod
+    def pick_replica():
+        return random.choice(settings.READ_REPLICAS)
+
+
+class ReplicaReadMixin:
+    """
+    Viewset mixin routing the reads of `replica_actions` to the replicas
+    """
+    replica_actions = ('list', 'retrieve', 'export')
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.action in self.replica_actions:
+            use_replicas()
+
+
+class ReplicaPinningMiddleware:
+    """
+    Keeps a client on the primary for REPLICA_STICKY_SECONDS after it wrote
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            pinned_until = float(request.COOKIES.get(PIN_COOKIE, 0))
+        except ValueError:
+            pinned_until = 0
+        begin(pinned=pinned_until > time.time())
+
+        response = self.get_response(request)
+        if _state.wrote and settings.READ_REPLICAS:
+            sticky = settings.REPLICA_STICKY_SECONDS
+            response.set_cookie(
+                PIN_COOKIE, f'{time.time() + sticky:.3f}', max_age=math.ceil(sticky), httponly=True, samesite='Lax'
+            )
+        return response
+
+
+def check_connections(**kwargs):
+    """
+    request_started receiver closing reused connections the server dropped
+    """
+    for connection in connections.all():
+        if connection.settings_dict.get('CONN_HEALTH_CHECKS') and connection.connection is not None:
+            if not connection.is_usable():
+                connection.close()
+
+
+# Streamed responses are read after the middleware returned, the state lives until they are closed
+request_finished.connect(end, dispatch_uid='replica-routing-end')
+request_started.connect(check_connections, dispatch_uid='connection-health-checks')
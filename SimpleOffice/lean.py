@@ -0,0 +1,224 @@
+"""
+Read-only serialization without model instances or per-row field objects.
+
+A LeanSerializer is compiled once from a ModelSerializer class: every field
+becomes a column of a values() query and a converter chosen up front,
+nested serializers of forward relations read the joined columns and nested
+many=True serializers are filled from one query on the through table per
+page. The output is the same as the ModelSerializer's.
+
+SerializerMethodFields can't be compiled on their own, a serializer declares
+the column and the converter of each in Meta.lean_fields, e.g.
+    lean_fields = {'timezone': ('timezone', str)}
+Serializers that still can't be compiled fall back to the regular path.
+"""
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import ManyToManyField
+from rest_framework import ISO_8601, serializers
+from rest_framework.generics import get_object_or_404
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from SimpleOffice.prefetch import CLASS_CACHE_SIZE
+
+PLAIN, NESTED, MANY = 'plain', 'nested', 'many'
+
+IDENTITY_FIELDS = (
+    serializers.CharField,
+    serializers.IntegerField,
+    serializers.BooleanField,
+    serializers.NullBooleanField,
+)
+
+
+class NotCompilable(Exception):
+    pass
+
+
+def _isoformat(value):
+    return value.isoformat()
+
+
+def converter(field):
+    """
+    :return: function applied to non-null column values, None when they are used as is
+    """
+    if isinstance(field, IDENTITY_FIELDS):
+        return None
+    if isinstance(field, serializers.PrimaryKeyRelatedField) and field.pk_field is None:
+        return None
+    if isinstance(field, serializers.FloatField):
+        return float
+    if isinstance(field, (serializers.DateField, serializers.TimeField)):
+        default = api_settings.DATE_FORMAT if isinstance(field, serializers.DateField) else api_settings.TIME_FORMAT
+        output_format = getattr(field, 'format', default)
+        if output_format is None:
+            return None
+        if output_format.lower() == ISO_8601:
+            return _isoformat
+    return field.to_representation
+
+
+class LeanSerializer:
+    """
+    Compiled form of a ModelSerializer, `prefix` is the lookup of the
+    relation when it is nested into another one
+    """
+
+    def __init__(self, serializer, prefix=''):
+        self.model = serializer.Meta.model
+        self.prefix = prefix
+        self.pk = prefix + self.model._meta.pk.name
+        self.columns = [self.pk]
+        self.steps = []  # (kind, field name, column or relation, converter or LeanSerializer)
+
+        lean_fields = getattr(serializer.Meta, 'lean_fields', {})
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if name in lean_fields:
+                column, convert = lean_fields[name]
+                self.add_plain(name, prefix + column, convert)
+            elif isinstance(field, (serializers.ListSerializer, serializers.ManyRelatedField)):
+                if prefix:
+                    raise NotCompilable(f'{name}: to-many relations are only supported at the top level')
+                self.add_many(name, field)
+            elif isinstance(field, serializers.BaseSerializer):
+                self.add_nested(name, field)
+            elif isinstance(field, serializers.SerializerMethodField) or field.source == '*' or '.' in field.source:
+                raise NotCompilable(f'{name}: {type(field).__name__} needs Meta.lean_fields')
+            else:
+                model_field = self.model_field(field.source)
+                if not model_field.concrete or model_field.many_to_many:
+                    raise NotCompilable(f'{name}: {field.source} is not a column')
+                self.add_plain(name, prefix + field.source, converter(field))
+        self.columns = list(dict.fromkeys(self.columns))
+
+    def model_field(self, source):
+        try:
+            return self.model._meta.get_field(source)
+        except FieldDoesNotExist:
+            raise NotCompilable(f'{source} is not a field of {self.model.__name__}')
+
+    def add_plain(self, name, column, convert):
+        self.columns.append(column)
+        self.steps.append((PLAIN, name, column, convert))
+
+    def add_nested(self, name, field):
+        model_field = self.model_field(field.source)
+        if not (model_field.many_to_one or model_field.one_to_one) or not model_field.concrete:
+            raise NotCompilable(f'{name}: only forward relations can be nested')
+        nested = LeanSerializer(field, f'{self.prefix}{field.source}__')
+        column = self.prefix + field.source  # the id, no join needed to tell NULLs
+        self.columns += [column] + nested.columns
+        self.steps.append((NESTED, name, column, nested))
+
+    def add_many(self, name, field):
+        model_field = self.model_field(field.source)
+        if not isinstance(model_field, ManyToManyField):
+            raise NotCompilable(f'{name}: only many-to-many relations are supported')
+        through = model_field.remote_field.through
+        target = model_field.m2m_reverse_field_name()
+        if isinstance(field, serializers.ManyRelatedField):
+            # A list of pks, read from the through table alone
+            child = field.child_relation
+            if not isinstance(child, serializers.PrimaryKeyRelatedField) or child.pk_field is not None:
+                raise NotCompilable(f'{name}: only lists of pks are supported')
+            nested = None
+        else:
+            nested = LeanSerializer(field.child, f'{target}__')
+        relation = (through, model_field.m2m_field_name() + '_id', target)
+        self.steps.append((MANY, name, relation, nested))
+
+    def values(self, queryset):
+        """
+        The queryset as values() rows, prefetches are dropped since they
+        only apply to model instances
+        """
+        return queryset.prefetch_related(None).values(*self.columns)
+
+    def related(self, rows):
+        """
+        :return: dict field name -> {owner pk: [nested representations]}
+        """
+        result = {}
+        ids = None
+        for kind, name, relation, nested in self.steps:
+            if kind != MANY:
+                continue
+            if ids is None:
+                ids = [row[self.pk] for row in rows]
+            through, owner, target = relation
+            links = through.objects.filter(**{f'{owner}__in': ids}).order_by(f'{target}_id')
+            grouped = result[name] = {}
+            if nested is None:
+                for owner_id, target_id in links.values_list(owner, f'{target}_id'):
+                    grouped.setdefault(owner_id, []).append(target_id)
+                continue
+            for link in links.values(owner, *nested.columns):
+                grouped.setdefault(link[owner], []).append(nested.represent(link, {}))
+        return result
+
+    def represent(self, row, related):
+        data = {}
+        for kind, name, column, convert in self.steps:
+            if kind == PLAIN:
+                value = row[column]
+                data[name] = value if value is None or convert is None else convert(value)
+            elif kind == NESTED:
+                data[name] = None if row[column] is None else convert.represent(row, related)
+            else:
+                data[name] = related[name].get(row[self.pk], [])
+        return data
+
+    def serialize(self, rows):
+        rows = list(rows)
+        related = self.related(rows)
+        return [self.represent(row, related) for row in rows]
+
+
+@lru_cache(maxsize=CLASS_CACHE_SIZE)
+def lean_serializer_for(serializer_class):
+    """
+    Cached LeanSerializer of a ModelSerializer class, None if it can't be compiled
+    """
+    if getattr(getattr(serializer_class, 'Meta', None), 'model', None) is None:
+        return None
+    try:
+        return LeanSerializer(serializer_class())
+    except NotCompilable:
+        return None
+
+
+class LeanReadMixin:
+    """
+    Viewset mixin serving list and retrieve through the LeanSerializer
+    of the serializer class
+    """
+
+    def get_lean_serializer(self):
+        return lean_serializer_for(self.get_serializer_class())
+
+    def list(self, request, *args, **kwargs):
+        lean = self.get_lean_serializer()
+        if lean is None:
+            return super().list(request, *args, **kwargs)
+
+        rows = lean.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(lean.serialize(page))
+        return Response(lean.serialize(rows))
+
+    def retrieve(self, request, *args, **kwargs):
+        lean = self.get_lean_serializer()
+        if lean is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        rows = lean.values(self.filter_queryset(self.get_queryset()))
+        row = get_object_or_404(rows, **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        self.check_object_permissions(request, row)
+        return Response(lean.serialize([row])[0])
@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from SimpleOffice.schema import load, path_of
+
+
+class Command(BaseCommand):
+    help = 'Generates the OpenAPI schema of /api/docs for the current code into SCHEMA_DIR, ' \
+           'see SimpleOffice.schema'
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        schema = load(regenerate=True)
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {path_of(schema.key)} '
+            f'in {time.monotonic() - started:.1f}s'
+        ))
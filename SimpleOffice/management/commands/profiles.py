@@ -0,0 +1,56 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from SimpleOffice.profiling import folded, query_summary, store
+
+
+class Command(BaseCommand):
+    help = 'Shows the request profiles stored by SimpleOffice.profiling: folded stacks ' \
+           'for flamegraph.pl/speedscope/inferno, or the queries by normalized SQL and by action'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', choices=('flamegraph', 'queries'))
+        parser.add_argument('--view', help='Only profiles of this URL name, e.g. members-list')
+        parser.add_argument('--action', help='Only profiles of this viewset action, e.g. list')
+        parser.add_argument('--path', help='Only profiles of paths containing this, e.g. is_working=true')
+        parser.add_argument('--reason', choices=('sampled', 'slow'))
+        parser.add_argument('--limit', type=int, default=20, help='Rows per table of queries')
+        parser.add_argument('--json', action='store_true', help='Print queries as JSON')
+
+    def handle(self, *args, **options):
+        profiles = [
+            profile for profile in store().read()
+            if (not options['view'] or profile['view'] == options['view'])
+            and (not options['action'] or profile['action'] == options['action'])
+            and (not options['path'] or options['path'] in profile['path'])
+            and (not options['reason'] or profile['reason'] == options['reason'])
+        ]
+
+        if options['output'] == 'flamegraph':
+            for stack, count in sorted(folded(profiles).items()):
+                self.stdout.write(f'{stack} {count}')
+            return
+
+        statements, actions = query_summary(profiles)
+        statements, actions = statements[:options['limit']], actions[:options['limit']]
+        if options['json']:
+            self.stdout.write(json.dumps({'statements': statements, 'actions': actions}, indent=2))
+            return
+
+        self.stdout.write(f'{len(profiles)} profiles\n\nBy statement:')
+        for statement in statements:
+            self.stdout.write(
+                f'{statement["total_ms"]:10.1f} ms total {statement["count"]:6}x '
+                f'mean {statement["mean_ms"]:8.2f} max {statement["max_ms"]:8.2f} ms  '
+                f'[{", ".join(statement["actions"])}]\n    {statement["sql"]}'
+            )
+            if statement['explain']:
+                self.stdout.write('    ' + statement['explain'].replace('\n', '\n    '))
+        self.stdout.write('\nBy action:')
+        for action in actions:
+            self.stdout.write(
+                f'{action["action"]:40} {action["requests"]:6} requests, mean {action["mean_ms"]:8.1f} ms, '
+                f'{action["queries_per_request"]:.1f} queries, {action["sql_ms"]:.1f} ms in SQL\n'
+                f'    slowest: {action["slowest_sql"]}'
+            )
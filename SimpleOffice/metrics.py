@@ -0,0 +1,164 @@
+"""
+Per-request metrics: wall time, database time, number of queries and
+response size of every route, labelled with the URL name, the viewset action,
+the method and the status code.
+
+Observations go into in-process histograms with fixed buckets, exposed in
+the Prometheus text format by metrics_view (one series set per process) and
+summed up per response in a Server-Timing header. Database time is taken
+with an execute_wrapper on every connection, so queries made while a
+streamed response is consumed after the middleware returned aren't counted.
+"""
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+from django.http import HttpResponse
+
+from SimpleOffice.db import wrapped_queries
+
+LABELS = ('view', 'action', 'method', 'status')
+UNRESOLVED = '<unresolved>'
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 500)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def view_labels(request, view_func):
+    """
+    :return: (URL name, viewset action) of the view serving the request
+    """
+    match = request.resolver_match
+    actions = getattr(view_func, 'actions', None) or {}  # viewsets map methods to actions
+    return match.url_name or match.view_name if match else UNRESOLVED, actions.get(request.method.lower(), '')
+
+
+class Histogram:
+    """
+    Counts per bucket and the sum of the observations of every label set,
+    updated under the lock of the owning RequestMetrics
+    """
+
+    def __init__(self, name, documentation, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.series = {}  # labels -> [count per bucket..., count above the last one, sum]
+
+    def observe(self, labels, value):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0] * (len(self.buckets) + 1) + [0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        bounds = [_number(bound) for bound in self.buckets] + ['+Inf']
+        for labels, series in sorted(self.series.items()):
+            names = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(LABELS, labels))
+            cumulative = 0
+            for bound, count in zip(bounds, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{names},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{names}}} {_number(series[-1])}')
+            lines.append(f'{self.name}_count{{{names}}} {cumulative}')
+        return lines
+
+
+class RequestMetrics:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.duration = Histogram('http_request_duration_seconds', 'Wall time of requests.', DURATION_BUCKETS)
+        self.db_duration = Histogram(
+            'http_request_db_duration_seconds', 'Time requests spent in database queries.', DURATION_BUCKETS
+        )
+        self.queries = Histogram('http_request_queries', 'SQL queries per request.', QUERY_BUCKETS)
+        self.response_size = Histogram(
+            'http_response_size_bytes', 'Size of response bodies, streamed ones excluded.', SIZE_BUCKETS
+        )
+
+    def observe(self, labels, duration, db_duration, queries, size):
+        with self.lock:
+            self.duration.observe(labels, duration)
+            self.db_duration.observe(labels, db_duration)
+            self.queries.observe(labels, queries)
+            if size is not None:
+                self.response_size.observe(labels, size)
+
+    def expose(self):
+        with self.lock:
+            lines = [
+                line
+                for histogram in (self.duration, self.db_duration, self.queries, self.response_size)
+                for line in histogram.expose()
+            ]
+        return '\n'.join(lines) + '\n'
+
+
+metrics = RequestMetrics()
+
+
+class QueryTimer:
+    """
+    execute_wrapper summing up the time and number of queries
+    """
+
+    def __init__(self):
+        self.duration = 0.0
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+
+class MetricsMiddleware:
+    """
+    Records every request into `metrics`, adds Server-Timing unless SERVER_TIMING is off
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        timer = QueryTimer()
+        with wrapped_queries(timer):
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+
+        view, action = getattr(request, 'view_labels', (UNRESOLVED, ''))
+        size = None if response.streaming else len(response.content)
+        metrics.observe((view, action, request.method, response.status_code), duration, timer.duration, timer.count, size)
+
+        if settings.SERVER_TIMING:
+            response['Server-Timing'] = (
+                f'app;dur={duration * 1000:.1f}, db;dur={timer.duration * 1000:.1f};desc="{timer.count} queries"'
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.view_labels = view_labels(request, view_func)
+
+
+def metrics_view(request):
+    """
+    The metrics of this process in the Prometheus text format
+    """
+    return HttpResponse(metrics.expose(), content_type='text/plain; version=0.0.4; charset=utf-8')
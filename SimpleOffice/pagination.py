@@ -0,0 +1,112 @@
+import json
+from collections import OrderedDict
+
+from django.db import connections
+from rest_framework.pagination import BasePagination, CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+
+
+def estimate_count(queryset):
+    """
+    Row estimate of the query planner, PostgreSQL only.
+    Other backends don't keep statistics, so they fall back to COUNT(*)
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination over the primary key: no COUNT(*) and no OFFSET,
+    every page is an index range scan.
+    ?count=approx adds the planner's estimate of the total
+    """
+    ordering = 'id'
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    count_query_param = 'count'
+    count = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = None
+        if request.query_params.get(self.count_query_param) == 'approx':
+            self.count = estimate_count(queryset)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if self.count is not None:
+            response.data['count'] = self.count
+            response.data.move_to_end('count', last=False)
+        return response
+
+
+class OptionalKeysetPagination(BasePagination):
+    """
+    Page number pagination unless the client opts in to keyset pagination
+    with ?pagination=cursor (next/previous links keep the cursor)
+    """
+    query_param = 'pagination'
+
+    def __init__(self):
+        self.page_number = PageNumberPagination()
+        self.keyset = KeysetPagination()
+        self.paginator = self.page_number
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        use_keyset = params.get(self.query_param) == 'cursor' or self.keyset.cursor_query_param in params
+        self.paginator = self.keyset if use_keyset else self.page_number
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    @property
+    def display_page_controls(self):
+        return getattr(self.paginator, 'display_page_controls', False)
+
+    def to_html(self):
+        return self.paginator.to_html()
+
+    def get_results(self, data):
+        return data['results']
+
+    def get_schema_fields(self, view):
+        fields = self.page_number.get_schema_fields(view) + self.keyset.get_schema_fields(view)
+        return list({field.name: field for field in fields}.values())
+
+
+class RankedPagination(BasePagination):
+    """
+    A single page with the first `page_size` results of a queryset
+    ordered by relevance, for search results that can't be keyset paginated
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return list(queryset[:self.get_page_size(request)])
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([('results', data)]))
+
+    def get_results(self, data):
+        return data['results']
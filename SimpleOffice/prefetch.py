@@ -0,0 +1,143 @@
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+# Bound of the caches of serializer classes: sparse fieldsets derive a class
+# per ?fields=/?expand=/?omit= combination, an evicted one is derived anew,
+# so the plans and lean serializers keyed by those classes share the bound
+CLASS_CACHE_SIZE = 256
+
+
+class QueryPlan:
+    """
+    The set of select_related/prefetch_related calls a serializer needs
+    so that serializing a page of objects costs a constant number of queries
+    """
+
+    def __init__(self, select_related=(), prefetch_related=()):
+        self.select_related = tuple(select_related)
+        # (lookup, model, only fields or None, nested QueryPlan)
+        self.prefetch_related = tuple(prefetch_related)
+
+    def apply(self, queryset):
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*self.prefetches())
+        return queryset
+
+    def prefetches(self):
+        """
+        Prefetch objects are built on every call because they hold querysets
+        """
+        result = []
+        for lookup, model, only, plan in self.prefetch_related:
+            child_queryset = model._default_manager.all()
+            if only:
+                child_queryset = child_queryset.only(*only)
+            result.append(Prefetch(lookup, queryset=plan.apply(child_queryset)))
+        return result
+
+    def __bool__(self):
+        return bool(self.select_related or self.prefetch_related)
+
+    def __repr__(self):
+        return f'QueryPlan(select_related={self.select_related}, prefetch_related={self.prefetch_related})'
+
+
+def _model_field(model, source):
+    try:
+        return model._meta.get_field(source)
+    except FieldDoesNotExist:
+        return None
+
+
+def _only_fields(model, serializer):
+    """
+    Concrete columns a nested serializer reads, or None if it reads anything
+    that can't be resolved to a column (method fields, properties, ...)
+    """
+    columns = [model._meta.pk.name]
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        if isinstance(field, (serializers.SerializerMethodField, serializers.ManyRelatedField,
+                              serializers.BaseSerializer)):
+            return None
+        model_field = _model_field(model, field.source)
+        if model_field is None or not model_field.concrete or model_field.many_to_many:
+            return None
+        columns.append(model_field.name)
+    return tuple(dict.fromkeys(columns))
+
+
+def _walk(model, serializer, prefix, select_related, prefetch_related):
+    for field in serializer.fields.values():
+        if field.write_only or field.source == '*' or '.' in field.source:
+            continue
+
+        model_field = _model_field(model, field.source)
+        if model_field is None or not model_field.is_relation:
+            continue
+
+        lookup = prefix + field.source
+        related_model = model_field.related_model
+
+        if isinstance(field, serializers.ListSerializer):
+            child = field.child
+            plan = build_plan(related_model, child) if isinstance(child, serializers.Serializer) else QueryPlan()
+            prefetch_related.append((lookup, related_model, _only_fields(related_model, child), plan))
+        elif isinstance(field, serializers.ManyRelatedField):
+            prefetch_related.append((lookup, related_model, (related_model._meta.pk.name, ), QueryPlan()))
+        elif isinstance(field, serializers.Serializer):
+            if model_field.many_to_many or model_field.one_to_many:
+                prefetch_related.append((lookup, related_model, None, build_plan(related_model, field)))
+                continue
+            select_related.append(lookup)
+            _walk(related_model, field, lookup + '__', select_related, prefetch_related)
+        elif isinstance(field, serializers.RelatedField):
+            if isinstance(field, serializers.PrimaryKeyRelatedField):
+                continue  # reads the *_id column only
+            select_related.append(lookup)
+
+
+def build_plan(model, serializer):
+    """
+    Reads the (possibly nested) fields of a serializer instance and returns
+    the QueryPlan needed to serialize `model` instances without N+1 queries.
+    Forward relations rendered by nested serializers are joined,
+    to-many relations get a Prefetch limited to the columns the child reads.
+    """
+    select_related, prefetch_related = [], []
+    _walk(model, serializer, '', select_related, prefetch_related)
+    return QueryPlan(select_related, prefetch_related)
+
+
+@lru_cache(maxsize=CLASS_CACHE_SIZE)
+def plan_for(serializer_class):
+    """
+    Cached QueryPlan for a ModelSerializer class
+    """
+    model = getattr(getattr(serializer_class, 'Meta', None), 'model', None)
+    if model is None:
+        return QueryPlan()
+    return build_plan(model, serializer_class())
+
+
+def plan_queryset(queryset, serializer_class):
+    return plan_for(serializer_class).apply(queryset)
+
+
+class PrefetchPlannerMixin:
+    """
+    Viewset mixin that applies the serializer's QueryPlan to the queryset
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        serializer_class = self.get_serializer_class()
+        if getattr(getattr(serializer_class, 'Meta', None), 'model', None) is not queryset.model:
+            return queryset
+        return plan_queryset(queryset, serializer_class)
@@ -0,0 +1,311 @@
+"""
+Opt-in sampling profiler and slow-query log.
+
+PROFILE_SAMPLE_RATE of the requests are profiled; with PROFILE_SLOW_MS set
+every request is, and its profile is kept when it took at least that long.
+A profile holds the Python stacks of the thread serving the request, sampled
+every PROFILE_INTERVAL_MS by a background thread, and its SQL queries without
+their parameters, with the plan of the SELECTs slower than PROFILE_EXPLAIN_MS.
+
+Profiles are appended as JSON lines to PROFILE_DIR/profiles.jsonl, rotated at
+PROFILE_MAX_BYTES with PROFILE_BACKUPS older files kept.
+`manage.py profiles flamegraph` folds their stacks for flamegraph.pl,
+speedscope or inferno, `manage.py profiles queries` summarizes the queries by
+normalized SQL and by viewset action.
+"""
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DatabaseError, connections
+
+from SimpleOffice.db import wrapped_queries
+from SimpleOffice.metrics import UNRESOLVED, view_labels
+
+FILENAME = 'profiles.jsonl'
+EXPLAIN_LIMIT = 5  # distinct statements explained per request, slowest first
+
+_labels = {}  # code object -> frame label
+
+
+def _label(code):
+    label = _labels.get(code)
+    if label is None:
+        filename = code.co_filename
+        for root in sorted(filter(None, sys.path), key=len, reverse=True):
+            if filename.startswith(root + os.sep):
+                filename = filename[len(root) + 1:]
+                break
+        # ; separates the frames of folded stacks
+        label = _labels[code] = f'{code.co_name} ({filename}:{code.co_firstlineno})'.replace(';', ',')
+    return label
+
+
+class Sampler(threading.Thread):
+    """
+    Samples the stacks of the threads serving profiled requests
+    """
+
+    def __init__(self, interval):
+        super().__init__(name='request-profiler', daemon=True)
+        self.interval = interval
+        self.profiles = {}  # thread id -> Profile
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+
+    def add(self, ident, profile):
+        with self.lock:
+            self.profiles[ident] = profile
+        self.wake.set()
+
+    def remove(self, ident):
+        with self.lock:
+            self.profiles.pop(ident, None)
+
+    def run(self):
+        while True:
+            if not self.profiles:
+                self.wake.wait()
+                self.wake.clear()
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self.lock:
+                for ident, profile in self.profiles.items():
+                    frame, stack = frames.get(ident), []
+                    while frame is not None:
+                        stack.append(_label(frame.f_code))
+                        frame = frame.f_back
+                    if stack:
+                        profile.samples[tuple(reversed(stack))] += 1
+
+
+_sampler = None
+_sampler_lock = threading.Lock()
+
+
+def sampler():
+    global _sampler
+    with _sampler_lock:
+        if _sampler is None:
+            _sampler = Sampler(settings.PROFILE_INTERVAL_MS / 1000)
+            _sampler.start()
+    return _sampler
+
+
+class Profile:
+    """
+    Stack samples and queries of one request, the queries are logged as an execute_wrapper
+    """
+
+    def __init__(self):
+        self.samples = Counter()
+        self.queries = []  # (alias, sql, params, many, seconds)
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((context['connection'].alias, sql, params, many, time.perf_counter() - started))
+
+    def record(self, request, response, duration, reason):
+        view, action = getattr(request, 'view_labels', (UNRESOLVED, ''))
+        explained = explain_slowest(self.queries, settings.PROFILE_EXPLAIN_MS / 1000)
+        return {
+            'time': datetime.now(timezone.utc).isoformat(timespec='milliseconds'),
+            'reason': reason,
+            'method': request.method,
+            'path': request.get_full_path(),
+            'view': view,
+            'action': action,
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 2),
+            'interval_ms': settings.PROFILE_INTERVAL_MS,
+            'samples': {';'.join(stack): count for stack, count in self.samples.items()},
+            'queries': [
+                {
+                    'alias': alias,
+                    'sql': sql,
+                    'many': many,
+                    'duration_ms': round(seconds * 1000, 3),
+                    'explain': explained.get((alias, sql)),
+                }
+                for alias, sql, params, many, seconds in self.queries
+            ],
+        }
+
+
+def explain(alias, sql, params):
+    """
+    :return: the plan of a query as text, the error when it can't be explained
+    """
+    connection = connections[alias]
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+            # one line per row on PostgreSQL, the detail is the last column on SQLite
+            return '\n'.join(str(row[-1]) for row in cursor.fetchall())
+    except DatabaseError as error:
+        return f'{type(error).__name__}: {error}'
+
+
+def explain_slowest(queries, threshold):
+    """
+    :return: dict (alias, sql) -> plan of the slowest SELECTs taking `threshold` seconds or more
+    """
+    plans = {}
+    for alias, sql, params, many, seconds in sorted(queries, key=lambda query: -query[-1]):
+        if seconds < threshold or len(plans) == EXPLAIN_LIMIT:
+            break
+        if not many and (alias, sql) not in plans and sql.lstrip().upper().startswith('SELECT'):
+            plans[alias, sql] = explain(alias, sql, params)
+    return plans
+
+
+class ProfileStore:
+    """
+    Profiles as JSON lines in `directory`, rotated by logging's RotatingFileHandler
+    """
+
+    def __init__(self, directory, max_bytes=0, backups=0):
+        self.path = os.path.join(directory, FILENAME)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.handler = None
+        self.lock = threading.Lock()
+
+    def write(self, record):
+        with self.lock:
+            if self.handler is None:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                self.handler = RotatingFileHandler(
+                    self.path, maxBytes=self.max_bytes, backupCount=self.backups, encoding='utf-8', delay=True
+                )
+        self.handler.handle(logging.makeLogRecord({'msg': json.dumps(record, separators=(',', ':'))}))
+        self.handler.flush()
+
+    def read(self):
+        """
+        :return: the stored profiles, oldest first
+        """
+        paths = [f'{self.path}.{number}' for number in range(self.backups, 0, -1)] + [self.path]
+        for path in paths:
+            if os.path.exists(path):
+                with open(path, encoding='utf-8') as file:
+                    for line in file:
+                        if line.strip():
+                            yield json.loads(line)
+
+
+def store():
+    return ProfileStore(settings.PROFILE_DIR, settings.PROFILE_MAX_BYTES, settings.PROFILE_BACKUPS)
+
+
+class ProfilingMiddleware:
+    """
+    Profiles sampled and slow requests into the PROFILE_DIR store, unused unless
+    PROFILE_SAMPLE_RATE or PROFILE_SLOW_MS is set
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILE_SAMPLE_RATE and settings.PROFILE_SLOW_MS is None:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.store = store()
+
+    def __call__(self, request):
+        sampled = random.random() < settings.PROFILE_SAMPLE_RATE
+        slow_ms = settings.PROFILE_SLOW_MS
+        if not sampled and slow_ms is None:
+            return self.get_response(request)
+
+        profile, ident = Profile(), threading.get_ident()
+        sampler().add(ident, profile)
+        started = time.perf_counter()
+        try:
+            with wrapped_queries(profile):
+                response = self.get_response(request)
+        finally:
+            sampler().remove(ident)
+        duration = time.perf_counter() - started
+
+        slow = slow_ms is not None and duration * 1000 >= slow_ms
+        if sampled or slow:
+            self.store.write(profile.record(request, response, duration, 'slow' if slow else 'sampled'))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.view_labels = view_labels(request, view_func)
+
+
+def folded(profiles):
+    """
+    :return: Counter of the stacks of all profiles, ; separated frames, root first
+    """
+    stacks = Counter()
+    for profile in profiles:
+        stacks.update(profile['samples'])
+    return stacks
+
+
+def normalize(sql):
+    """
+    SQL with literals and placeholders replaced by ?, IN lists collapsed and whitespace squeezed
+    """
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    sql = re.sub(r'%s|\b\d+(?:\.\d+)?\b', '?', sql)
+    sql = re.sub(r'\(\s*\?(?:\s*,\s*\?)*\s*\)', '(...)', sql)
+    return re.sub(r'\s+', ' ', sql).strip()
+
+
+def query_summary(profiles):
+    """
+    :return: (rows per normalized SQL, rows per view and action), most SQL time first
+    """
+    statements, actions = {}, {}
+    for profile in profiles:
+        key = f'{profile["view"]}:{profile["action"]}' if profile['action'] else profile['view']
+        action = actions.setdefault(key, {
+            'action': key, 'requests': 0, 'duration_ms': 0, 'queries': 0, 'sql_ms': 0, 'statements': Counter(),
+        })
+        action['requests'] += 1
+        action['duration_ms'] += profile['duration_ms']
+
+        for query in profile['queries']:
+            sql = normalize(query['sql'])
+            statement = statements.setdefault(sql, {
+                'sql': sql, 'count': 0, 'total_ms': 0, 'max_ms': 0, 'explain': None, 'actions': Counter(),
+            })
+            statement['count'] += 1
+            statement['total_ms'] += query['duration_ms']
+            statement['actions'][key] += 1
+            if query['duration_ms'] >= statement['max_ms']:
+                statement['max_ms'] = query['duration_ms']
+                statement['explain'] = query['explain'] or statement['explain']
+            action['queries'] += 1
+            action['sql_ms'] += query['duration_ms']
+            action['statements'][sql] += query['duration_ms']
+
+    for statement in statements.values():
+        statement['mean_ms'] = statement['total_ms'] / statement['count']
+        statement['actions'] = [name for name, _ in statement['actions'].most_common()]
+    for action in actions.values():
+        action['mean_ms'] = action['duration_ms'] / action['requests']
+        action['queries_per_request'] = action['queries'] / action['requests']
+        action['slowest_sql'] = action['statements'].most_common(1)[0][0] if action['statements'] else None
+        del action['statements']
+
+    return (
+        sorted(statements.values(), key=lambda statement: -statement['total_ms']),
+        sorted(actions.values(), key=lambda action: -action['sql_ms']),
+    )
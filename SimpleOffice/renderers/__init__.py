@@ -0,0 +1,15 @@
+"""
+Renderers and parsers of the API, see REST_FRAMEWORK in settings
+"""
+from SimpleOffice.renderers.fast_json import ORJSONRenderer
+from SimpleOffice.renderers.messagepack import MessagePackParser, MessagePackRenderer
+from SimpleOffice.renderers.streaming import CSVRenderer, NDJSONRenderer, StreamingRenderer
+
+__all__ = (
+    'CSVRenderer',
+    'MessagePackParser',
+    'MessagePackRenderer',
+    'NDJSONRenderer',
+    'ORJSONRenderer',
+    'StreamingRenderer',
+)
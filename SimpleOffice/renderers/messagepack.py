@@ -0,0 +1,42 @@
+"""
+MessagePack (application/msgpack) for service-to-service callers: smaller
+payloads and cheaper encoding/decoding than JSON. Values msgpack has no type
+for (dates, times, Decimal, ...) are sent as the strings the JSON renderer
+produces. Both classes require the optional msgpack package, settings only
+register them when it is installed.
+"""
+from rest_framework.utils import encoders
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+MEDIA_TYPE = 'application/msgpack'
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = MEDIA_TYPE
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        assert msgpack is not None, 'msgpack must be installed to use MessagePackRenderer'
+        if data is None:
+            return b''
+        return msgpack.packb(data, use_bin_type=True, default=encoders.JSONEncoder().default)
+
+
+class MessagePackParser(BaseParser):
+    media_type = MEDIA_TYPE
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        assert msgpack is not None, 'msgpack must be installed to use MessagePackParser'
+        try:
+            return msgpack.unpackb(stream.read(), raw=False, strict_map_key=False)
+        except (ValueError, TypeError) as exc:  # all msgpack unpacking errors are ValueErrors
+            raise ParseError(f'MessagePack parse error - {exc}')
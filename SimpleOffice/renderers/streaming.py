@@ -0,0 +1,73 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.renderers import BaseRenderer
+
+from SimpleOffice.renderers import fast_json
+
+
+class StreamingRenderer(BaseRenderer):
+    """
+    Renderer that can also produce a body from an iterator of rows,
+    chunks of `rows_per_chunk` rows are yielded at a time
+    """
+    charset = 'utf-8'
+    flat = False  # rows must not contain nested objects
+    rows_per_chunk = 500
+
+    def stream(self, rows):
+        lines = []
+        for line in self.lines(rows):
+            lines.append(line)
+            if len(lines) >= self.rows_per_chunk:
+                yield ''.join(lines)
+                lines = []
+        if lines:
+            yield ''.join(lines)
+
+    def lines(self, rows):
+        raise NotImplementedError
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if isinstance(data, dict):
+            data = [data]
+        return ''.join(self.lines(data)).encode(self.charset)
+
+
+class NDJSONRenderer(StreamingRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+    def lines(self, rows):
+        if fast_json.orjson is not None:
+            for row in rows:
+                yield fast_json.dumps(row).decode() + '\n'
+            return
+        dumps = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), default=DjangoJSONEncoder().default).encode
+        for row in rows:
+            yield dumps(row) + '\n'
+
+
+class CSVRenderer(StreamingRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+    flat = True
+
+    class _Line:
+        """
+        File-like object for csv.writer that hands back the written line
+        """
+
+        def write(self, value):
+            return value
+
+    def lines(self, rows):
+        writer = None
+        for row in rows:
+            if writer is None:
+                writer = csv.DictWriter(self._Line(), fieldnames=list(row), extrasaction='ignore')
+                yield writer.writeheader()
+            yield writer.writerow(row)
@@ -0,0 +1,171 @@
+"""
+The OpenAPI schema behind /api/docs, generated once per version of the code.
+
+drf_yasg introspects every viewset and serializer to build it, so the JSON
+document is generated by `manage.py generate_schema` or at startup, stored
+as SCHEMA_DIR/openapi-<fingerprint>.json and served from memory, gzipped
+when accepted, with an ETag. The fingerprint hashes the sources of the
+project's packages, the versions of the libraries the schema is built with
+and the REST framework settings, so a stored schema is used until one of
+them changes. The rarely used YAML format is still generated per request.
+"""
+import glob
+import gzip
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from importlib import import_module
+
+from django.apps import apps
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import quote_etag
+from drf_yasg import openapi
+from drf_yasg.app_settings import swagger_settings
+from drf_yasg.codecs import OpenAPICodecJson
+from drf_yasg.views import get_schema_view
+from rest_framework.permissions import AllowAny
+
+INFO = openapi.Info(
+    title="JetBridge Test Task",
+    default_version='v1',
+)
+LIBRARIES = ('django', 'rest_framework', 'django_filters', 'drf_yasg')
+
+_accepts_gzip = re.compile(r'\bgzip\b')
+
+
+def source_files():
+    """
+    The modules of the project's apps and of the package of the URLconf
+    """
+    roots = {config.path for config in apps.get_app_configs() if config.path.startswith(settings.BASE_DIR + os.sep)}
+    roots.add(os.path.dirname(import_module(settings.ROOT_URLCONF).__file__))
+    for root in roots:
+        for directory, subdirectories, filenames in os.walk(root):
+            subdirectories[:] = [name for name in subdirectories if name != '__pycache__']
+            yield from (os.path.join(directory, name) for name in filenames if name.endswith('.py'))
+
+
+def fingerprint():
+    digest = hashlib.sha256()
+    for library in LIBRARIES:
+        digest.update(f'{library} {import_module(library).__version__}\n'.encode())
+    digest.update(repr((settings.REST_FRAMEWORK, getattr(settings, 'SWAGGER_SETTINGS', None))).encode())
+    for path in sorted(source_files()):
+        digest.update(os.path.relpath(path, settings.BASE_DIR).encode())
+        with open(path, 'rb') as file:
+            digest.update(hashlib.sha256(file.read()).digest())
+    return digest.hexdigest()[:16]
+
+
+def generate():
+    """
+    :return: the JSON document, without the host, so it's the one serving it
+    """
+    generator = swagger_settings.DEFAULT_GENERATOR_CLASS(INFO)
+    return OpenAPICodecJson(validators=[]).encode(generator.get_schema(request=None, public=True))
+
+
+def path_of(key):
+    return os.path.join(settings.SCHEMA_DIR, f'openapi-{key}.json')
+
+
+def read(key):
+    """
+    :return: the stored document, None when there's none or it can't be read (e.g. another owner's)
+    """
+    try:
+        with open(path_of(key), 'rb') as file:
+            return file.read()
+    except OSError:
+        return None
+
+
+def write(key, document):
+    """
+    Stores the document of `key` in place of those of older versions
+    """
+    os.makedirs(settings.SCHEMA_DIR, exist_ok=True)
+    descriptor, temporary = tempfile.mkstemp(dir=settings.SCHEMA_DIR, prefix='.openapi-')
+    with os.fdopen(descriptor, 'wb') as file:
+        file.write(document)
+    # mkstemp creates it 0600, the server may run as another user than generate_schema
+    os.chmod(temporary, 0o644)
+    os.replace(temporary, path_of(key))
+    for path in glob.glob(os.path.join(settings.SCHEMA_DIR, 'openapi-*.json')):
+        if path != path_of(key):
+            os.remove(path)
+
+
+class Schema:
+    """
+    The document of one fingerprint, as is and gzipped
+    """
+
+    def __init__(self, key, document):
+        self.key = key
+        self.document = document
+        self.gzipped = gzip.compress(document, compresslevel=9)
+
+    def respond(self, request, content_type):
+        gzipped = bool(_accepts_gzip.search(request.META.get('HTTP_ACCEPT_ENCODING', '')))
+        etag = quote_etag(self.key + ('-gzip' if gzipped else ''))
+
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match is not None and (
+            etag in (tag.strip() for tag in if_none_match.split(',')) or if_none_match.strip() == '*'
+        ):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(self.gzipped if gzipped else self.document, content_type=content_type)
+            if gzipped:
+                response['Content-Encoding'] = 'gzip'
+        response['ETag'] = etag
+        response['Cache-Control'] = 'no-cache'  # revalidated, the code may change with a deploy
+        patch_vary_headers(response, ('Accept', 'Accept-Encoding'))
+        return response
+
+
+_schema = None
+_lock = threading.Lock()
+
+
+def load(regenerate=False):
+    """
+    :return: the Schema of the current code, stored one unless `regenerate`
+    """
+    global _schema
+    with _lock:
+        if _schema is None or regenerate:
+            key = fingerprint()
+            document = None if regenerate else read(key)
+            if document is None:
+                document = generate()
+                try:
+                    write(key, document)
+                except OSError:
+                    pass  # a read-only SCHEMA_DIR, served from memory only
+            _schema = Schema(key, document)
+        return _schema
+
+
+def get_docs_view():
+    """
+    The drf_yasg schema view serving the JSON of load() in place of generating it per request
+    """
+    base = get_schema_view(INFO, public=True, permission_classes=(AllowAny, ))
+
+    class DocsView(base):
+
+        def get(self, request, version='', format=None):
+            renderer = request.accepted_renderer
+            if getattr(renderer, 'codec_class', None) is OpenAPICodecJson:
+                return load().respond(request, f'{renderer.media_type}; charset={renderer.charset}')
+            # the UI pages are built without introspecting the views
+            return super().get(request, version, format)
+
+    return DocsView
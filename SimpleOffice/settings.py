@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
+import importlib.util
 import os
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
@@ -42,9 +43,11 @@ INSTALLED_APPS = [
     'rest_framework',
 
     # MY APPS
+    'SimpleOffice.apps.SimpleOfficeConfig',
     'members',
     'projects',
     'skills',
+    'analytics',
 
     # INSTALLED APPS
     'timezone_field',
@@ -53,7 +56,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'SimpleOffice.metrics.MetricsMiddleware',
+    'SimpleOffice.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'SimpleOffice.db.ReplicaPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -83,6 +89,10 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'SimpleOffice.wsgi.application'
 
+# Threads of SimpleOffice.asgi, every one may hold a database connection
+ASYNC_READ_CONCURRENCY = int(os.environ.get('ASYNC_READ_CONCURRENCY', 16))
+ASYNC_WRITE_CONCURRENCY = int(os.environ.get('ASYNC_WRITE_CONCURRENCY', 4))
+
 
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
@@ -105,9 +115,23 @@ DATABASES = {
         'PASSWORD': '',
         'HOST': 'db',
         'PORT': '5432',
+        # Persistent connections, checked at the start of every request (SimpleOffice.db)
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Read replicas, DATABASE_REPLICAS=host1,host2 adds the aliases replica1, replica2, ...
+# (DATABASE_REPLICAS=db makes the primary stand in for one locally)
+for number, host in enumerate(filter(None, os.environ.get('DATABASE_REPLICAS', '').split(',')), 1):
+    DATABASES[f'replica{number}'] = dict(DATABASES['default'], HOST=host.strip(), TEST={'MIRROR': 'default'})
+
+READ_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+# Clients read from the primary for that long after a write, the replication lag budget
+REPLICA_STICKY_SECONDS = float(os.environ.get('REPLICA_STICKY_SECONDS', 5))
+
+DATABASE_ROUTERS = ['SimpleOffice.db.ReplicaRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -147,10 +171,85 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 
+# Cache
+# https://docs.djangoproject.com/en/2.2/topics/cache/
+
+# Backend of the API response cache, API_CACHE_BACKEND=file|db switches it
+# (the db backend needs `python manage.py createcachetable`)
+API_CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',  # LRU
+        'LOCATION': 'api',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, '.cache', 'api'),
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+    'db': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'api_cache',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'api': API_CACHE_BACKENDS[os.environ.get('API_CACHE_BACKEND', 'locmem')],
+    # Namespace versions all the processes share, see SimpleOffice.cache.get_shared_versions,
+    # its table is created on migrate
+    'versions': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'cache_versions',
+    },
+}
+
+API_CACHE_ALIAS = 'api'
+SHARED_VERSIONS_CACHE_ALIAS = 'versions'
+API_CACHE_TIMEOUT = 300
+
+# Server-Timing headers with the wall and database time of every response,
+# the same numbers are scraped from /metrics
+SERVER_TIMING = os.environ.get('SERVER_TIMING', '1') == '1'
+
+# Where the OpenAPI schema of /api/docs is stored per version of the code,
+# see SimpleOffice/schema.py
+SCHEMA_DIR = os.environ.get('SCHEMA_DIR', os.path.join(BASE_DIR, '.schema'))
+
+# Opt-in request profiler, see SimpleOffice/profiling.py: PROFILE_SAMPLE_RATE=0.01
+# profiles 1% of the requests, PROFILE_SLOW_MS=500 the ones taking 500 ms or more
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+PROFILE_SLOW_MS = float(os.environ['PROFILE_SLOW_MS']) if os.environ.get('PROFILE_SLOW_MS') else None
+PROFILE_INTERVAL_MS = float(os.environ.get('PROFILE_INTERVAL_MS', 5))
+PROFILE_EXPLAIN_MS = float(os.environ.get('PROFILE_EXPLAIN_MS', 50))
+PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(BASE_DIR, 'profiles'))
+PROFILE_MAX_BYTES = int(os.environ.get('PROFILE_MAX_BYTES', 50 * 1024 * 1024))
+PROFILE_BACKUPS = int(os.environ.get('PROFILE_BACKUPS', 5))
+
+# Seconds the summaries of /api/analytics/ may lag behind changes,
+# see analytics/summaries.py
+ANALYTICS_MAX_STALENESS = float(os.environ.get('ANALYTICS_MAX_STALENESS', 60))
+
+# MessagePack is content-negotiated (Accept/Content-Type: application/msgpack)
+# when the optional msgpack package is installed
+HAS_MSGPACK = importlib.util.find_spec('msgpack') is not None
+
 REST_FRAMEWORK = {
     'DEFAULT_FILTER_BACKENDS': (
         'django_filters.rest_framework.DjangoFilterBackend',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'SimpleOffice.renderers.ORJSONRenderer',  # stdlib json without orjson
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ) + (('SimpleOffice.renderers.MessagePackRenderer', ) if HAS_MSGPACK else ()),
+    'DEFAULT_PARSER_CLASSES': (
+        'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ) + (('SimpleOffice.renderers.MessagePackParser', ) if HAS_MSGPACK else ()),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
 }
\ No newline at end of file
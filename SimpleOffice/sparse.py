@@ -0,0 +1,149 @@
+"""
+Sparse fieldsets for read endpoints:
+
+    ?fields=id,first_name,project     only these fields, relations as ids
+    ?fields=id,project.name           dotted names select fields of a nested object
+    ?expand=project,skills            render these relations as nested objects
+    ?omit=workhours                   everything but these fields
+
+Without ?fields= every field is rendered as before, relations nested.
+A trimmed serializer class is derived (and cached, the CLASS_CACHE_SIZE most
+recent ones) for every combination, so the prefetch planner and the lean
+serializer only join, prefetch and read what is actually rendered.
+"""
+from functools import lru_cache
+
+from drf_yasg import openapi
+from drf_yasg.inspectors import SwaggerAutoSchema
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+
+from SimpleOffice.prefetch import CLASS_CACHE_SIZE
+
+FIELDS, EXPAND, OMIT = 'fields', 'expand', 'omit'
+
+
+def parse(value):
+    """
+    "id,project.name" -> {'id': {}, 'project': {'name': {}}}
+    """
+    tree = {}
+    for path in filter(None, (part.strip() for part in (value or '').split(','))):
+        node = tree
+        for name in path.split('.'):
+            node = node.setdefault(name, {})
+    return tree
+
+
+def freeze(tree):
+    return tuple(sorted((name, freeze(subtree)) for name, subtree in tree.items()))
+
+
+def thaw(frozen):
+    return {name: thaw(subtree) for name, subtree in frozen}
+
+
+def _related_pk_field(field):
+    """
+    The id form of a nested serializer: a pk, or a list of pks for many=True
+    """
+    if isinstance(field, serializers.ListSerializer):
+        return serializers.PrimaryKeyRelatedField(many=True, read_only=True, source=field.source)
+    return serializers.PrimaryKeyRelatedField(read_only=True, source=field.source)
+
+
+def _nested_field(field, serializer_class):
+    many = isinstance(field, serializers.ListSerializer)
+    return serializer_class(many=many, read_only=True, source=field.source)
+
+
+@lru_cache(maxsize=CLASS_CACHE_SIZE)
+def _sparse_class(serializer_class, fields, expand, omit):
+    fields, expand, omit = thaw(fields) if fields is not None else None, thaw(expand), thaw(omit)
+    declared = serializer_class._declared_fields
+    names = list(serializer_class.Meta.fields)
+
+    unknown = set(fields or ()) | set(expand) | set(omit)
+    unknown -= set(names)
+    if unknown:
+        raise ValidationError({FIELDS: [f'Unknown field(s): {", ".join(sorted(unknown))}']})
+
+    selected = [
+        name for name in names
+        if (fields is None or name in fields or name in expand) and not (name in omit and not omit[name])
+    ]
+    attrs = {name: None for name in declared if name not in selected}
+    for name in selected:
+        field = declared.get(name)
+        if not isinstance(field, serializers.BaseSerializer):
+            continue
+        nested_fields = (fields or {}).get(name) or None
+        if fields is not None and name not in expand and nested_fields is None:
+            attrs[name] = _related_pk_field(field)
+            continue
+        nested_class = type(field.child if isinstance(field, serializers.ListSerializer) else field)
+        nested = sparse_serializer_class(nested_class, nested_fields, expand.get(name), omit.get(name))
+        if nested is not nested_class:
+            attrs[name] = _nested_field(field, nested)
+
+    if selected == names and not attrs:
+        return serializer_class
+    attrs['Meta'] = type('Meta', (serializer_class.Meta, ), {'fields': tuple(selected)})
+    return type(serializer_class.__name__, (serializer_class, ), attrs)
+
+
+def sparse_serializer_class(serializer_class, fields=None, expand=None, omit=None):
+    """
+    :param fields: tree of the fields to render (see parse), None for all of them
+    :param expand: tree of the relations to nest even though `fields` is given
+    :param omit: tree of the fields to leave out
+    :return: serializer_class itself when nothing changes
+    """
+    if not issubclass(serializer_class, serializers.ModelSerializer) or not (fields or expand or omit):
+        return serializer_class
+    return _sparse_class(serializer_class, freeze(fields) if fields else None, freeze(expand or {}), freeze(omit or {}))
+
+
+class SparseFieldsAutoSchema(SwaggerAutoSchema):
+    """
+    Documents the sparse fieldset parameters of list and retrieve
+    """
+
+    def get_query_parameters(self):
+        parameters = super().get_query_parameters()
+        if self.method == 'GET' and getattr(self.view, 'action', None) in ('list', 'retrieve'):
+            parameters += [
+                openapi.Parameter(FIELDS, openapi.IN_QUERY, type=openapi.TYPE_STRING, description=(
+                    'Comma separated fields to render, relations are rendered as ids unless expanded; '
+                    'dotted names select fields of a nested object, e.g. id,project.name'
+                )),
+                openapi.Parameter(EXPAND, openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                                  description='Comma separated relations to render as nested objects'),
+                openapi.Parameter(OMIT, openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                                  description='Comma separated fields to leave out'),
+            ]
+        return parameters
+
+
+class SparseFieldsMixin:
+    """
+    Viewset mixin deriving the serializer class of reads from ?fields=, ?expand= and ?omit=
+    """
+    swagger_schema = SparseFieldsAutoSchema
+
+    def get_serializer_class(self):
+        serializer_class = super().get_serializer_class()
+        request = getattr(self, 'request', None)
+        if request is None or request.method not in SAFE_METHODS:
+            return serializer_class
+
+        params = request.query_params
+        if not any(name in params for name in (FIELDS, EXPAND, OMIT)):
+            return serializer_class
+        return sparse_serializer_class(
+            serializer_class,
+            parse(params[FIELDS]) if FIELDS in params else None,
+            parse(params.get(EXPAND)),
+            parse(params.get(OMIT)),
+        )
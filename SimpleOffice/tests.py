@@ -0,0 +1,368 @@
+import asyncio
+import gzip
+import io
+import json
+import os
+import stat
+import tempfile
+import threading
+import time
+from unittest import mock, skipUnless
+
+from django.core.management import call_command
+from django.core.management.sql import emit_post_migrate_signal
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, Client, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+
+from members.models import Member
+from SimpleOffice import schema
+from SimpleOffice.asgi_handler import ASGIHandler, is_read
+from SimpleOffice.cache import create_cache_tables, get_shared_versions
+from SimpleOffice.db import PIN_COOKIE, ReplicaRouter, begin, check_connections, end, primary, use_replicas
+from SimpleOffice.metrics import Histogram, RequestMetrics
+from SimpleOffice.profiling import Profile, normalize, sampler, store
+from SimpleOffice.renderers import ORJSONRenderer
+from SimpleOffice.renderers.messagepack import msgpack
+from skills.models import Skill
+
+client = Client()
+
+
+class SharedVersionsTest(TransactionTestCase):
+    """ Test module for the table of the versions all the processes share """
+
+    def test_created_on_migrate(self):
+        self.addCleanup(create_cache_tables, 'default', verbosity=0)
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TABLE cache_versions')
+
+        # A committed write isn't failed by the missing table
+        with self.assertLogs('SimpleOffice.cache', 'ERROR'):
+            response = client.post(reverse('skills-list'), data=json.dumps({'name': 'go'}),
+                                   content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(Skill.objects.filter(name='go').exists())
+
+        emit_post_migrate_signal(0, False, 'default')
+        self.assertEqual(set(get_shared_versions(('skills', ))), {'skills'})
+
+
+class RenderersTest(TestCase):
+    """ Test module for the JSON and MessagePack content negotiation """
+
+    def setUp(self) -> None:
+        self.skill = Skill.objects.create(name='Python\u2028Ćwiczenia')
+
+    def test_json_matches_stdlib(self):
+        response = client.get(reverse('skills-detail', kwargs={'pk': self.skill.pk}))
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(response.content, JSONRenderer().render(response.data))
+
+        response = client.get(reverse('skills-list'), HTTP_ACCEPT='application/json; indent=4')
+        self.assertIn(b'\n  ', response.content)
+        self.assertEqual(json.loads(response.content)['results'][0]['name'], self.skill.name)
+
+    def test_fallback_without_orjson(self):
+        data = {'name': self.skill.name, 'id': 1}
+        with mock.patch('SimpleOffice.renderers.fast_json.orjson', None):
+            self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    @skipUnless(msgpack, 'msgpack is not installed')
+    def test_msgpack(self):
+        response = client.get(reverse('skills-detail', kwargs={'pk': self.skill.pk}), HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content, raw=False), {'id': self.skill.pk, 'name': self.skill.name})
+
+        response = client.post(reverse('skills-list'), data=msgpack.packb({'name': 'Go'}),
+                                content_type='application/msgpack', HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(msgpack.unpackb(response.content, raw=False)['name'], 'Go')
+
+        response = client.post(reverse('skills-list'), data=b'\xc1', content_type='application/msgpack')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class MetricsTest(TestCase):
+    """ Test module for the request metrics and the Server-Timing header """
+
+    def setUp(self) -> None:
+        Skill.objects.create(
+            name='JS'
+        )
+        patcher = mock.patch('SimpleOffice.metrics.metrics', RequestMetrics())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_server_timing(self):
+        response = client.get(reverse('skills-list'))
+        self.assertRegex(response['Server-Timing'], r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries"$')
+
+        with self.settings(SERVER_TIMING=False):
+            response = client.get(reverse('skills-list'))
+        self.assertNotIn('Server-Timing', response)
+
+    def test_prometheus_text(self):
+        client.get(reverse('skills-list'))
+        client.get(reverse('skills-detail', kwargs={'pk': 30}))
+        client.get('/api/nothing-here/')
+        response = client.get(reverse('metrics'))
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        text = response.content.decode()
+
+        self.assertIn('# TYPE http_request_duration_seconds histogram', text)
+        self.assertIn('http_request_duration_seconds_count'
+                      '{view="skills-list",action="list",method="GET",status="200"} 1', text)
+        self.assertIn('http_request_queries_count'
+                      '{view="skills-detail",action="retrieve",method="GET",status="404"} 1', text)
+        self.assertIn('http_response_size_bytes_bucket'
+                      '{view="<unresolved>",action="",method="GET",status="404",le="+Inf"} 1', text)
+
+    def test_histogram(self):
+        histogram = Histogram('latency', 'Latency.', (1, 5))
+        for value in (0.5, 1, 3, 7):
+            histogram.observe(('a"b', ), value)
+        with mock.patch('SimpleOffice.metrics.LABELS', ('name', )):
+            lines = histogram.expose()
+        self.assertEqual(lines[2:], [
+            'latency_bucket{name="a\\"b",le="1"} 2',
+            'latency_bucket{name="a\\"b",le="5"} 3',
+            'latency_bucket{name="a\\"b",le="+Inf"} 4',
+            'latency_sum{name="a\\"b"} 11.5',
+            'latency_count{name="a\\"b"} 4',
+        ])
+
+
+class SchemaTest(TestCase):
+    """ Test module for the stored OpenAPI schema of /api/docs """
+
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp()
+        overridden = override_settings(SCHEMA_DIR=self.directory)
+        overridden.enable()
+        self.addCleanup(overridden.disable)
+        patcher = mock.patch('SimpleOffice.schema._schema', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get_schema(self, **headers):
+        return client.get(reverse('docs'), {'format': 'openapi'}, **headers)
+
+    def test_generated_once(self):
+        response = self.get_schema()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('/skills/', json.loads(response.content)['paths'])
+        self.assertEqual(os.listdir(self.directory), [f'openapi-{schema.fingerprint()}.json'])
+
+        with mock.patch('SimpleOffice.schema.generate') as generate:
+            gzipped = self.get_schema(HTTP_ACCEPT_ENCODING='gzip, deflate')
+            schema._schema = None  # a new process reads the stored one
+            self.assertEqual(self.get_schema().content, response.content)
+        generate.assert_not_called()
+        self.assertEqual(gzipped['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(gzipped.content), response.content)
+        self.assertNotEqual(gzipped['ETag'], response['ETag'])
+
+        response = self.get_schema(HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_readable_by_other_users(self):
+        self.get_schema()
+        path = schema.path_of(schema.fingerprint())
+        self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o644)
+
+        # A stored document that can't be read is generated again rather than failing the start
+        with mock.patch('SimpleOffice.schema.fingerprint', return_value='unreadable'):
+            os.mkdir(schema.path_of('unreadable'))
+            schema._schema = None
+            response = self.get_schema()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['ETag'], '"unreadable"')
+
+    def test_code_change(self):
+        self.get_schema()
+        with mock.patch('SimpleOffice.schema.fingerprint', return_value='changed'):
+            schema._schema = None
+            call_command('generate_schema', stdout=io.StringIO())
+            response = self.get_schema()
+        self.assertEqual(os.listdir(self.directory), ['openapi-changed.json'])
+        self.assertEqual(response['ETag'], '"changed"')
+
+
+class ASGIHandlerTest(TransactionTestCase):
+    """ Test module for SimpleOffice.asgi_handler, the pool threads use connections of their own """
+
+    def setUp(self) -> None:
+        self.handler = ASGIHandler(read_concurrency=2, write_concurrency=1)
+        self.skill = Skill.objects.create(name='js')
+        self.member = Member.objects.create(first_name='Vasya', last_name='Pupkin')
+        self.member.skills.add(self.skill)
+
+    def tearDown(self) -> None:
+        self.handler.reads.shutdown()
+        self.handler.writes.shutdown()
+
+    def request(self, method, path, query='', body=b'', headers=()):
+        scope = {
+            'type': 'http', 'method': method, 'path': path, 'query_string': query.encode(),
+            'http_version': '1.1', 'headers': [(name.encode(), value.encode()) for name, value in headers],
+        }
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': body}
+
+        async def send(message):
+            messages.append(message)
+
+        asyncio.run(self.handler(scope, receive, send))
+        start, bodies = messages[0], messages[1:]
+        self.assertFalse(bodies[-1].get('more_body', False))
+        return start['status'], dict(start['headers']), b''.join(message.get('body', b'') for message in bodies)
+
+    def test_reads(self):
+        self.assertTrue(is_read({'method': 'GET', 'path': '/api/members/'}))
+        self.assertTrue(is_read({'method': 'HEAD', 'path': f'/api/skills/{self.skill.pk}/'}))
+        self.assertFalse(is_read({'method': 'GET', 'path': '/api/members/export/'}))
+        self.assertFalse(is_read({'method': 'POST', 'path': '/api/skills/'}))
+        self.assertFalse(is_read({'method': 'GET', 'path': '/nowhere/'}))
+
+        code, headers, body = self.request('GET', '/api/members/', 'skills=js&fields=id')
+        self.assertEqual(code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(body)['results'], [{'id': self.member.pk}])
+        self.assertEqual(json.loads(self.request('GET', '/api/members/', 'skills=go')[2])['results'], [])
+
+        code, headers, body = self.request('HEAD', f'/api/skills/{self.skill.pk}/')
+        self.assertEqual((code, body), (status.HTTP_200_OK, b''))
+
+    def test_writes_and_streaming(self):
+        code, headers, body = self.request(
+            'POST', '/api/skills/', body=b'{"name": "go"}',
+            headers=[('content-type', 'application/json'), ('content-length', '14')],
+        )
+        self.assertEqual(code, status.HTTP_201_CREATED)
+        self.assertTrue(Skill.objects.filter(name='go').exists())
+
+        code, headers, body = self.request('GET', '/api/members/export/', 'format=ndjson')
+        self.assertEqual(code, status.HTTP_200_OK)
+        self.assertEqual([json.loads(line)['id'] for line in body.splitlines()], [self.member.pk])
+
+
+class ReplicaRoutingTest(TestCase):
+    """ Test module for SimpleOffice.db, the test database stands in for the replica """
+
+    def setUp(self) -> None:
+        self.member = Member.objects.create(first_name='Vasya', last_name='Pupkin')
+        self.router = ReplicaRouter()
+
+    def tearDown(self) -> None:
+        end()
+
+    @override_settings(READ_REPLICAS=['replica'])
+    def test_router(self):
+        begin()
+        self.assertIsNone(self.router.db_for_read(Member))
+        use_replicas()
+        self.assertEqual(self.router.db_for_read(Member), 'replica')
+        with primary():
+            self.assertIsNone(self.router.db_for_read(Member))
+        self.assertEqual(self.router.db_for_read(Member), 'replica')
+
+        self.router.db_for_write(Member)
+        self.assertIsNone(self.router.db_for_read(Member))
+        self.assertFalse(self.router.allow_migrate('replica', 'members'))
+        self.assertIsNone(self.router.allow_migrate('default', 'members'))
+
+    @override_settings(READ_REPLICAS=['default'])
+    def test_reads_your_writes(self):
+        reader = Client()
+        with mock.patch.object(ReplicaRouter, 'pick_replica', return_value='default') as pick_replica:
+            self.assertEqual(reader.get(reverse('members-list')).status_code, status.HTTP_200_OK)
+            self.assertTrue(pick_replica.called)
+
+            pick_replica.reset_mock()
+            response = reader.post(reverse('skills-list'), {'name': 'go'}, content_type='application/json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.assertIn(PIN_COOKIE, response.cookies)
+            self.assertFalse(pick_replica.called)
+
+            # Other clients read from the replica, without caching what it may not have yet
+            response = Client().get(reverse('members-list'))
+            self.assertTrue(pick_replica.called)
+            self.assertNotIn('ETag', response)
+
+            pick_replica.reset_mock()
+            self.assertEqual(reader.get(reverse('members-list')).status_code, status.HTTP_200_OK)
+            self.assertFalse(pick_replica.called)
+
+    def test_health_checks(self):
+        connection.ensure_connection()
+        with mock.patch.dict(connection.settings_dict, {'CONN_HEALTH_CHECKS': True}), \
+                mock.patch.object(connection, 'is_usable', return_value=False), \
+                mock.patch.object(connection, 'close') as close:
+            check_connections()
+        close.assert_called_once_with()
+
+
+class ProfilingTest(TestCase):
+    """ Test module for SimpleOffice.profiling and the profiles command """
+
+    def setUp(self) -> None:
+        python = Skill.objects.create(name='Python')
+        member = Member.objects.create(first_name='Olena', last_name='Shevchenko')
+        member.skills.add(python)
+        self.directory = tempfile.mkdtemp()
+
+    def profiled(self, path, **settings):
+        options = {'PROFILE_SAMPLE_RATE': 0, 'PROFILE_SLOW_MS': None, 'PROFILE_EXPLAIN_MS': 0,
+                   'PROFILE_DIR': self.directory, 'API_CACHE_TIMEOUT': 0}
+        options.update(settings)
+        with override_settings(**options):
+            Client().get(path)  # a new client loads the middleware with these settings
+            return list(store().read())
+
+    def test_sampled_request(self):
+        profiles = self.profiled('/api/members/?skills=Python&is_working=false', PROFILE_SAMPLE_RATE=1)
+        self.assertEqual(len(profiles), 1)
+        profile = profiles[0]
+        self.assertEqual((profile['view'], profile['action'], profile['reason']), ('members-list', 'list', 'sampled'))
+        self.assertTrue(profile['queries'])
+        self.assertTrue(any(query['explain'] for query in profile['queries']))
+        self.assertNotIn('Python', json.dumps(profile['queries']))  # parameters aren't stored
+
+    def test_slow_requests(self):
+        self.assertEqual(self.profiled('/api/members/', PROFILE_SLOW_MS=60000), [])
+        profiles = self.profiled('/api/members/', PROFILE_SLOW_MS=0)
+        self.assertEqual([profile['reason'] for profile in profiles], ['slow'])
+
+    def test_stack_samples(self):
+        profile = Profile()
+        ident = threading.get_ident()
+        sampler().add(ident, profile)
+        deadline = time.monotonic() + 0.1
+        while time.monotonic() < deadline:
+            pass
+        sampler().remove(ident)
+        self.assertTrue(profile.samples)
+        self.assertTrue(all('test_stack_samples' in stack[-1] for stack in profile.samples))
+
+    def test_normalize(self):
+        self.assertEqual(
+            normalize("SELECT *  FROM t1 WHERE id IN (%s, %s, %s) AND name = 'it''s' LIMIT 21"),
+            'SELECT * FROM t1 WHERE id IN (...) AND name = ? LIMIT ?',
+        )
+
+    def test_command(self):
+        self.profiled('/api/members/', PROFILE_SAMPLE_RATE=1)
+        with override_settings(PROFILE_DIR=self.directory):
+            out = io.StringIO()
+            call_command('profiles', 'queries', '--json', stdout=out)
+            summary = json.loads(out.getvalue())
+            self.assertEqual(summary['actions'][0]['action'], 'members-list:list')
+            self.assertIn('members-list:list', summary['statements'][0]['actions'])
+
+            out = io.StringIO()
+            call_command('profiles', 'flamegraph', '--view', 'skills-list', stdout=out)
+            self.assertEqual(out.getvalue(), '')
@@ -17,10 +17,11 @@ from django.contrib import admin
 from django.urls import path, include
 
 # -------- SWAGGER --------
-from drf_yasg import openapi
 from drf_yasg.inspectors import SwaggerAutoSchema
-from drf_yasg.views import get_schema_view
-from rest_framework.permissions import AllowAny
+
+from SimpleOffice.cache import CacheStatsView
+from SimpleOffice.metrics import metrics_view
+from SimpleOffice.schema import get_docs_view
 
 
 class CategorizedAutoSchema(SwaggerAutoSchema):
@@ -30,18 +31,16 @@ class CategorizedAutoSchema(SwaggerAutoSchema):
         return super().get_tags(operation_keys)
 
 
-schema_view = get_schema_view(
-    openapi.Info(
-      title="JetBridge Test Task",
-      default_version='v1',
-    ),
-    permission_classes=(AllowAny, ),
-)
+# The schema is generated once per version of the code, see SimpleOffice.schema
+schema_view = get_docs_view()
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/docs', schema_view.with_ui(), name='docs'),
+    path('api/cache/stats/', CacheStatsView.as_view(), name='cache-stats'),
+    path('metrics', metrics_view, name='metrics'),
     path('api/', include('skills.urls')),
     path('api/', include('projects.urls')),
     path('api/', include('members.urls')),
+    path('api/', include('analytics.urls')),
 ]
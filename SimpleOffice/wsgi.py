@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'SimpleOffice.settings')
 
 application = get_wsgi_application()
+
+from SimpleOffice.schema import load  # noqa: E402 needs the apps loaded
+
+load()  # the stored OpenAPI schema, generated if the code changed
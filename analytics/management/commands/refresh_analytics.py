@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from analytics.summaries import SUMMARIES, refresh
+
+
+class Command(BaseCommand):
+    help = 'Refreshes the summaries of /api/analytics/ that are out of date, see analytics.summaries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('summaries', nargs='*', help=f'Some of {", ".join(SUMMARIES)}, all by default')
+        parser.add_argument('--force', action='store_true', help='Refresh even the up to date ones')
+
+    def handle(self, *args, **options):
+        unknown = set(options['summaries']) - set(SUMMARIES)
+        if unknown:
+            raise CommandError(f'Unknown summaries: {", ".join(sorted(unknown))}')
+
+        for name in options['summaries'] or SUMMARIES:
+            started = time.monotonic()
+            state, stale = refresh(name, force=options['force'], max_staleness=0)
+            self.stdout.write(self.style.SUCCESS(
+                f'{name}: as of {state.as_of}, refreshed at {state.refreshed_at:%Y-%m-%d %H:%M:%S} '
+                f'({time.monotonic() - started:.2f}s)'
+            ))
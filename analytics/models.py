@@ -0,0 +1,81 @@
+from django.db import models
+
+
+def snapshot_of(model, **kwargs):
+    """
+    A reference from a summary row, kept as is when the row it points to is deleted
+    """
+    return models.ForeignKey(model, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+', **kwargs)
+
+
+class SummaryState(models.Model):
+    """
+    When a summary was refreshed, and from which versions of its namespaces
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    versions = models.TextField(default='{}')  # JSON, see SimpleOffice.cache.get_shared_versions
+    as_of = models.DateField(null=True)
+    refreshed_at = models.DateTimeField(null=True)
+
+
+class ProjectHeadcount(models.Model):
+    """
+    Members per project, the project is None for those without one
+    """
+    project = snapshot_of('projects.Project', null=True)
+    name = models.CharField(max_length=50, null=True)
+    members = models.PositiveIntegerField()
+    on_holidays = models.PositiveIntegerField()
+
+    @property
+    def available(self):
+        return self.members - self.on_holidays
+
+
+class SkillHeadcount(models.Model):
+    """
+    Members per skill
+    """
+    skill = snapshot_of('skills.Skill')
+    name = models.CharField(max_length=100)
+    members = models.PositiveIntegerField()
+    on_holidays = models.PositiveIntegerField()
+
+    @property
+    def available(self):
+        return self.members - self.on_holidays
+
+
+class SkillCoverage(models.Model):
+    """
+    Members of a project per skill, skills nobody on the project has are left out
+    """
+    project = snapshot_of('projects.Project')
+    skill = snapshot_of('skills.Skill')
+    name = models.CharField(max_length=100)
+    members = models.PositiveIntegerField()
+    on_holidays = models.PositiveIntegerField()
+
+    class Meta:
+        indexes = (
+            models.Index(fields=('project', 'skill'), name='skillcoverage_project_idx'),
+        )
+
+    @property
+    def available(self):
+        return self.members - self.on_holidays
+
+
+class ManagerSpan(models.Model):
+    """
+    Direct reports per manager
+    """
+    manager = snapshot_of('members.Member')
+    first_name = models.CharField(max_length=50)
+    last_name = models.CharField(max_length=50)
+    reports = models.PositiveIntegerField()
+
+    class Meta:
+        indexes = (
+            models.Index(fields=('-reports', 'manager'), name='managerspan_reports_idx'),
+        )
@@ -0,0 +1,51 @@
+from rest_framework import serializers
+
+from analytics.models import ManagerSpan, ProjectHeadcount, SkillCoverage, SkillHeadcount
+
+
+class ProjectHeadcountSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ProjectHeadcount
+        fields = (
+            'project',
+            'name',
+            'members',
+            'available',
+            'on_holidays',
+        )
+
+
+class SkillHeadcountSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SkillHeadcount
+        fields = (
+            'skill',
+            'name',
+            'members',
+            'available',
+            'on_holidays',
+        )
+
+
+class SkillCoverageSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SkillCoverage
+        fields = (
+            'project',
+            'skill',
+            'name',
+            'members',
+            'available',
+            'on_holidays',
+        )
+
+
+class ManagerSpanSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ManagerSpan
+        fields = (
+            'manager',
+            'first_name',
+            'last_name',
+            'reports',
+        )
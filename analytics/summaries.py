@@ -0,0 +1,153 @@
+"""
+Summary tables behind /api/analytics/.
+
+Every summary is a table filled by INSERT ... SELECT of its aggregate
+queries, so the counting is done by the database and dashboards read a few
+precomputed rows instead of the member list. A table is replaced within one
+transaction, readers see the previous rows until it commits.
+
+A summary is refreshed when it's read and the cache namespaces it depends
+on changed since, by their shared versions every worker reads alike (see
+SimpleOffice.cache.get_shared_versions), at most once every
+ANALYTICS_MAX_STALENESS seconds though, so it can be that much behind the
+members it counts. The on holidays counts are as of a day and refreshed once
+it's over. `manage.py refresh_analytics` refreshes them ahead of the
+dashboards, e.g. from cron.
+"""
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Count, IntegerField, Q, Value
+from django.utils import timezone
+
+from analytics.models import ManagerSpan, ProjectHeadcount, SkillCoverage, SkillHeadcount, SummaryState
+from members.models import Member, MemberQuerySet
+from projects.models import Project
+from SimpleOffice.cache import get_shared_versions
+from skills.models import Skill
+
+MemberSkill = Member.skills.through
+
+
+def project_headcounts(as_of):
+    return [
+        Member.objects.values('project_id', 'project__name').annotate(
+            members=Count('pk'),
+            on_holidays=Count('pk', filter=MemberQuerySet.on_holidays_q(as_of)),
+        ),
+        Project.objects.filter(member__isnull=True).values('pk', 'name').annotate(
+            members=Value(0, IntegerField()),
+            on_holidays=Value(0, IntegerField()),
+        ),
+    ]
+
+
+def skill_headcounts(as_of):
+    return [
+        MemberSkill.objects.values('skill_id', 'skill__name').annotate(
+            members=Count('member_id'),
+            on_holidays=Count('member_id', filter=Q(member__in=Member.objects.on_holidays(as_of))),
+        ),
+        Skill.objects.filter(member__isnull=True).values('pk', 'name').annotate(
+            members=Value(0, IntegerField()),
+            on_holidays=Value(0, IntegerField()),
+        ),
+    ]
+
+
+def skill_coverage(as_of):
+    return [
+        MemberSkill.objects.filter(member__project__isnull=False).values(
+            'member__project_id', 'skill_id', 'skill__name'
+        ).annotate(
+            members=Count('member_id'),
+            on_holidays=Count('member_id', filter=Q(member__in=Member.objects.on_holidays(as_of))),
+        ),
+    ]
+
+
+def manager_spans(as_of):
+    return [
+        Member.objects.filter(manager_id__isnull=False).values(
+            'manager_id', 'manager_id__first_name', 'manager_id__last_name'
+        ).annotate(reports=Count('pk')),
+    ]
+
+
+class Summary:
+    """
+    :param fields: the fields of `model` the columns selected by `queries` go to, in their order
+    :param queries: function of the date holidays are counted at returning values() querysets
+    :param dependencies: cache namespaces the rows are computed from
+    """
+
+    def __init__(self, model, fields, queries, dependencies):
+        self.model = model
+        self.fields = fields
+        self.queries = queries
+        self.dependencies = dependencies
+
+    def fill(self, using, as_of):
+        connection = connections[using]
+        quote = connection.ops.quote_name
+        table = quote(self.model._meta.db_table)
+        columns = ', '.join(quote(self.model._meta.get_field(name).column) for name in self.fields)
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {table}')
+            for queryset in self.queries(as_of):
+                sql, params = queryset.order_by().query.get_compiler(using).as_sql()
+                cursor.execute(f'INSERT INTO {table} ({columns}) {sql}', params)
+
+
+SUMMARIES = {
+    'projects': Summary(
+        ProjectHeadcount, ('project', 'name', 'members', 'on_holidays'), project_headcounts, ('members', 'projects'),
+    ),
+    'skills': Summary(
+        SkillHeadcount, ('skill', 'name', 'members', 'on_holidays'), skill_headcounts, ('members', 'skills'),
+    ),
+    'coverage': Summary(
+        SkillCoverage, ('project', 'skill', 'name', 'members', 'on_holidays'), skill_coverage,
+        ('members', 'skills', 'projects'),
+    ),
+    'managers': Summary(
+        ManagerSpan, ('manager', 'first_name', 'last_name', 'reports'), manager_spans, ('members', ),
+    ),
+}
+
+
+def is_fresh(state, versions, as_of, max_staleness):
+    if state.as_of != as_of:
+        return False
+    recent = state.refreshed_at > timezone.now() - timedelta(seconds=max_staleness)
+    return recent or json.loads(state.versions) == versions
+
+
+def refresh(name, force=False, max_staleness=None):
+    """
+    Refreshes the summary unless it's fresh enough, or `force`
+    :return: (SummaryState, whether changes may be missing from it)
+    """
+    summary = SUMMARIES[name]
+    if max_staleness is None:
+        max_staleness = settings.ANALYTICS_MAX_STALENESS
+    # Versions are taken first, changes made while refreshing make it stale
+    versions = get_shared_versions(summary.dependencies)
+    as_of = timezone.localdate()
+
+    state = SummaryState.objects.filter(name=name).first()
+    if force or state is None or not is_fresh(state, versions, as_of, max_staleness):
+        using = router.db_for_write(SummaryState)
+        with transaction.atomic(using=using):
+            # The lock serializes refreshes, the first one refreshes and the others find it fresh
+            state, created = SummaryState.objects.using(using).select_for_update().get_or_create(name=name)
+            if force or created or not is_fresh(state, versions, as_of, max_staleness):
+                summary.fill(using, as_of)
+                state.versions = json.dumps(versions)
+                state.as_of = as_of
+                state.refreshed_at = timezone.now()
+                state.save(using=using)
+
+    return state, json.loads(state.versions) != versions
@@ -0,0 +1,139 @@
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TransactionTestCase, Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+
+from analytics.models import SummaryState
+from analytics.summaries import refresh
+from members.models import Member
+from projects.models import Project
+from SimpleOffice.cache import _version_key, get_cache, get_shared_cache
+from skills.models import Skill
+
+client = Client()
+
+
+@override_settings(ANALYTICS_MAX_STALENESS=0)
+class AnalyticsTest(TransactionTestCase):
+    """ Test module for the staffing analytics and the refresh of their summaries """
+    # Commits, the shared versions summaries are compared against are bumped on commit only
+
+    def setUp(self) -> None:
+        self.web = Project.objects.create(name='web')
+        self.mobile = Project.objects.create(name='mobile')
+        self.empty = Project.objects.create(name='empty')
+        self.python = Skill.objects.create(name='python')
+        self.js = Skill.objects.create(name='js')
+        self.cobol = Skill.objects.create(name='cobol')
+
+        self.boss = Member.objects.create(first_name='Olga', last_name='Boss', project=self.web)
+        self.boss.skills.add(self.python)
+        self.dev = Member.objects.create(first_name='Vasya', last_name='Dev', project=self.web, manager_id=self.boss)
+        self.dev.skills.add(self.python, self.js)
+        self.resting = Member.objects.create(
+            first_name='Petr', last_name='Rest', project=self.mobile, manager_id=self.boss,
+            on_holidays_till=timezone.localdate(),
+        )
+        self.resting.skills.add(self.js)
+        self.away = Member.objects.create(first_name='Ivan', last_name='Away', manager_id=self.dev)
+        self.away.set_holidays([(timezone.localdate(), timezone.localdate() + timedelta(days=3))])
+
+    def get(self, name, **params):
+        response = client.get(reverse(f'analytics-{name}'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_overview(self):
+        data = self.get('list')
+        self.assertEqual(data['as_of'], timezone.localdate().isoformat())
+        self.assertFalse(data['stale'])
+        self.assertEqual(
+            {key: data[key] for key in ('members', 'available', 'on_holidays', 'unassigned', 'projects', 'skills')},
+            {'members': 4, 'available': 2, 'on_holidays': 2, 'unassigned': 1, 'projects': 3, 'skills': 3},
+        )
+        self.assertEqual((data['managers'], data['mean_span'], data['max_span']), (2, 1.5, 2))
+
+    def test_headcounts(self):
+        projects = {row['project']: (row['members'], row['available']) for row in self.get('projects')['results']}
+        self.assertEqual(projects, {self.web.pk: (2, 2), self.mobile.pk: (1, 0), self.empty.pk: (0, 0), None: (1, 0)})
+
+        skills = [(row['name'], row['members'], row['on_holidays']) for row in self.get('skills')['results']]
+        self.assertEqual(skills, [('js', 2, 1), ('python', 2, 0), ('cobol', 0, 0)])
+
+        coverage = [(row['name'], row['members']) for row in self.get('coverage', project=self.web.pk)['results']]
+        self.assertEqual(coverage, [('python', 2), ('js', 1)])
+        self.assertEqual(len(self.get('coverage')['results']), 3)
+
+        managers = [(row['manager'], row['reports']) for row in self.get('managers')['results']]
+        self.assertEqual(managers, [(self.boss.pk, 2), (self.dev.pk, 1)])
+        self.assertEqual(len(self.get('managers', limit=1)['results']), 1)
+        response = client.get(reverse('analytics-managers'), {'limit': 0})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_refreshed_on_changes_only(self):
+        self.get('projects')
+        with self.assertNumQueries(3):  # versions, state, rows
+            self.get('projects')
+
+        Member.objects.create(first_name='New', last_name='Hire', project=self.empty)
+        projects = {row['project']: row['members'] for row in self.get('projects')['results']}
+        self.assertEqual(projects[self.empty.pk], 1)
+
+        # Changes of other namespaces don't refresh the span of control
+        self.get('managers')
+        refreshed_at = SummaryState.objects.get(name='managers').refreshed_at
+        Skill.objects.create(name='go')
+        self.get('managers')
+        self.assertEqual(SummaryState.objects.get(name='managers').refreshed_at, refreshed_at)
+
+    def test_shared_between_processes(self):
+        self.get('projects')
+        refreshed_at = SummaryState.objects.get(name='projects').refreshed_at
+
+        # The versions of this process alone don't tell what other workers refreshed from
+        get_cache().set(_version_key('members'), time.time(), None)
+        self.assertFalse(self.get('projects')['stale'])
+        self.assertEqual(SummaryState.objects.get(name='projects').refreshed_at, refreshed_at)
+
+        get_shared_cache().set(_version_key('members'), time.time(), None)
+        self.get('projects')
+        self.assertGreater(SummaryState.objects.get(name='projects').refreshed_at, refreshed_at)
+
+    def test_staleness_bound(self):
+        self.get('projects')
+        Member.objects.create(first_name='New', last_name='Hire', project=self.empty)
+
+        with override_settings(ANALYTICS_MAX_STALENESS=60):
+            data = self.get('projects')
+            self.assertTrue(data['stale'])
+            self.assertEqual({row['project']: row['members'] for row in data['results']}[self.empty.pk], 0)
+
+            later = timezone.now() + timedelta(seconds=61)
+            with mock.patch('analytics.summaries.timezone.now', return_value=later):
+                data = self.get('projects')
+            self.assertFalse(data['stale'])
+            self.assertEqual({row['project']: row['members'] for row in data['results']}[self.empty.pk], 1)
+
+        # On holidays is counted again once the day is over
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        with mock.patch('analytics.summaries.timezone.localdate', return_value=tomorrow):
+            state, stale = refresh('projects', max_staleness=3600)
+        self.assertEqual(state.as_of, tomorrow)
+
+    def test_refresh_command(self):
+        out = StringIO()
+        call_command('refresh_analytics', stdout=out)
+        self.assertEqual(SummaryState.objects.count(), 4)
+        self.assertIn('coverage: as of', out.getvalue())
+
+        refreshed_at = SummaryState.objects.get(name='skills').refreshed_at
+        call_command('refresh_analytics', 'skills', stdout=out)
+        self.assertEqual(SummaryState.objects.get(name='skills').refreshed_at, refreshed_at)
+        call_command('refresh_analytics', 'skills', '--force', stdout=out)
+        self.assertGreater(SummaryState.objects.get(name='skills').refreshed_at, refreshed_at)
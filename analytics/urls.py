@@ -0,0 +1,7 @@
+from rest_framework.routers import SimpleRouter
+from analytics import views
+
+router = SimpleRouter()
+router.register(r'analytics', views.AnalyticsViewSet, basename='analytics')
+
+urlpatterns = router.urls
@@ -0,0 +1,117 @@
+from django.db.models import Avg, Count, Max, Q, Sum
+from django.db.models.functions import Coalesce
+from rest_framework import serializers, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from analytics.models import ManagerSpan, ProjectHeadcount, SkillCoverage, SkillHeadcount
+from analytics.serializers import ManagerSpanSerializer, ProjectHeadcountSerializer, SkillCoverageSerializer, \
+    SkillHeadcountSerializer
+from analytics.summaries import refresh
+
+MANAGERS_LIMIT = 100
+MAX_MANAGERS_LIMIT = 1000
+
+
+class FreshnessSerializer(serializers.Serializer):
+    as_of = serializers.DateField()  # the day on holidays is counted at
+    refreshed_at = serializers.DateTimeField()
+    stale = serializers.BooleanField()  # changes up to ANALYTICS_MAX_STALENESS seconds old may be missing
+
+
+def freshness(*names):
+    states = [refresh(name) for name in names]
+    return FreshnessSerializer({
+        'as_of': states[0][0].as_of,
+        'refreshed_at': min(state.refreshed_at for state, stale in states),
+        'stale': any(stale for state, stale in states),
+    }).data
+
+
+def positive_int(request, name, default=None, maximum=None):
+    value = request.query_params.get(name)
+    if value is None:
+        return default
+    if not value.isdigit() or int(value) < 1 or (maximum and int(value) > maximum):
+        raise ValidationError({name: [f'A whole number from 1{f" to {maximum}" if maximum else ""} is required']})
+    return int(value)
+
+
+class AnalyticsViewSet(viewsets.GenericViewSet):
+    """
+    Staffing aggregates read from summary tables, see analytics.summaries
+    """
+    queryset = ProjectHeadcount.objects.all()
+    serializer_class = ProjectHeadcountSerializer
+    pagination_class = None
+    filter_backends = ()
+
+    def list(self, request):
+        """
+        URL: /analytics/
+        Totals of the directory: members available and on holidays, projects, skills and span of control
+        """
+        data = freshness('projects', 'skills', 'managers')
+        data.update(ProjectHeadcount.objects.aggregate(
+            members=Coalesce(Sum('members'), 0),
+            on_holidays=Coalesce(Sum('on_holidays'), 0),
+            unassigned=Coalesce(Sum('members', filter=Q(project__isnull=True)), 0),
+            projects=Count('pk', filter=Q(project__isnull=False)),
+        ))
+        data['available'] = data['members'] - data['on_holidays']
+        data['skills'] = SkillHeadcount.objects.count()
+        data.update(ManagerSpan.objects.aggregate(
+            managers=Count('pk'),
+            mean_span=Avg('reports'),
+            max_span=Max('reports'),
+        ))
+        return Response(data)
+
+    @action(detail=False, methods=['GET', ])
+    def projects(self, request):
+        """
+        URL: /analytics/projects/
+        Headcount per project, largest first, project null for the members without one
+        """
+        data = freshness('projects')
+        rows = ProjectHeadcount.objects.order_by('-members', 'project')
+        data['results'] = ProjectHeadcountSerializer(rows, many=True).data
+        return Response(data)
+
+    @action(detail=False, methods=['GET', ], serializer_class=SkillHeadcountSerializer)
+    def skills(self, request):
+        """
+        URL: /analytics/skills/
+        Headcount per skill, most common first
+        """
+        data = freshness('skills')
+        rows = SkillHeadcount.objects.order_by('-members', 'name', 'skill')
+        data['results'] = SkillHeadcountSerializer(rows, many=True).data
+        return Response(data)
+
+    @action(detail=False, methods=['GET', ], serializer_class=SkillCoverageSerializer)
+    def coverage(self, request):
+        """
+        URL: /analytics/coverage/?project=1
+        Members of every project per skill, of one project with ?project=
+        """
+        project = positive_int(request, 'project')
+        data = freshness('coverage')
+        rows = SkillCoverage.objects.order_by('project', '-members', 'name', 'skill')
+        if project is not None:
+            rows = rows.filter(project=project)
+        data['results'] = SkillCoverageSerializer(rows, many=True).data
+        return Response(data)
+
+    @action(detail=False, methods=['GET', ], serializer_class=ManagerSpanSerializer)
+    def managers(self, request):
+        """
+        URL: /analytics/managers/?limit=100
+        Managers with the most direct reports first
+        """
+        limit = positive_int(request, 'limit', MANAGERS_LIMIT, MAX_MANAGERS_LIMIT)
+        data = freshness('managers')
+        rows = ManagerSpan.objects.order_by('-reports', 'manager')[:limit]
+        data['results'] = ManagerSpanSerializer(rows, many=True).data
+        return Response(data)
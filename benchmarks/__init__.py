@@ -0,0 +1,69 @@
+"""
+Benchmarks, run one with `python -m benchmarks.<name> --help`.
+
+Every benchmark works on a throwaway test database of the configured backend
+filled by members.generator, and prints its results as JSON.
+"""
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+import django
+
+
+def setup():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'SimpleOffice.settings')
+    django.setup()
+
+
+@contextmanager
+def test_database(shared=False):
+    """
+    :param shared: the database is used from other threads or processes too,
+        which an in-memory SQLite database can't be
+    """
+    from django.db import connection
+
+    if shared and connection.vendor == 'sqlite':
+        connection.settings_dict['TEST']['NAME'] = os.path.join(tempfile.mkdtemp(), 'benchmark.sqlite3')
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def best_of(func, repeat=5):
+    """
+    :return: the fastest of `repeat` runs in seconds
+    """
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def latency_summary(latencies):
+    """
+    :return: p50/p95/p99/max in milliseconds of latencies in seconds
+    """
+    ordered = sorted(latencies)
+    result = {}
+    for name, fraction in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99), ('max', 1)):
+        value = ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else None
+        result[f'{name}_ms'] = round(value * 1000, 2) if value is not None else None
+    return result
+
+
+def disable_response_cache():
+    """
+    Responses expire right away, the cache versions the in-process indexes
+    depend on are kept
+    """
+    from django.conf import settings
+
+    settings.API_CACHE_TIMEOUT = 0
@@ -0,0 +1,160 @@
+"""
+Requests per second and latency percentiles of the read endpoints under many
+concurrent clients, served by the threaded WSGI server of runserver and by
+uvicorn with SimpleOffice.asgi. The response cache is disabled so every
+request reaches the database.
+"""
+import argparse
+import asyncio
+import json
+import random
+import socket
+import subprocess
+import sys
+import time
+from urllib.parse import quote
+
+from benchmarks import disable_response_cache, latency_summary, setup, test_database
+
+MODES = ('wsgi', 'asgi')
+
+
+def serve(mode, port, database):
+    """
+    Server process of one mode on the benchmark database
+    """
+    setup()
+    from django.conf import settings
+    from django.db import connections
+
+    settings.DEBUG = False
+    disable_response_cache()
+    connections['default'].settings_dict['NAME'] = database
+
+    if mode == 'wsgi':
+        from django.core.servers.basehttp import run
+        from django.core.wsgi import get_wsgi_application
+
+        run('127.0.0.1', port, get_wsgi_application(), threading=True)
+    else:
+        import uvicorn
+        from SimpleOffice.asgi_handler import ASGIHandler
+
+        uvicorn.run(ASGIHandler(), host='127.0.0.1', port=port, log_level='warning', access_log=False)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'Nothing listens on port {port}')
+
+
+async def fetch(port, path, timeout):
+    """
+    :return: the status code, one connection per request
+    """
+    reader, writer = await asyncio.wait_for(asyncio.open_connection('127.0.0.1', port), timeout)
+    try:
+        writer.write(f'GET {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n'.encode())
+        response = await asyncio.wait_for(reader.read(), timeout)
+        return int(response.split(b' ', 2)[1])
+    finally:
+        writer.close()
+
+
+async def load(port, paths, clients, duration, timeout):
+    latencies, errors = [], 0
+    rng = random.Random(0)
+    deadline = time.monotonic() + duration
+
+    async def client():
+        nonlocal errors
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                code = await fetch(port, rng.choice(paths), timeout)
+            except (OSError, asyncio.TimeoutError, IndexError, ValueError):
+                code = None
+            if code == 200:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+
+    started = time.monotonic()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    return latencies, errors, time.monotonic() - started
+
+
+def run_mode(mode, database, paths, clients, duration, timeout):
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'benchmarks.concurrency', '--serve', mode, '--port', str(port), '--database', database],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_for(port)
+        asyncio.run(load(port, paths, min(clients, 20), 1, timeout))  # warm up
+        latencies, errors, elapsed = asyncio.run(load(port, paths, clients, duration, timeout))
+    finally:
+        server.terminate()
+        server.wait()
+
+    result = {'requests': len(latencies), 'errors': errors, 'requests_per_second': round(len(latencies) / elapsed, 1)}
+    result.update(latency_summary(latencies))
+    return result
+
+
+def run(modes=MODES, members=2000, clients=500, duration=10, timeout=30):
+    from django.db import connection
+    from members.generator import generate_org
+
+    org = generate_org(members)
+    skills = [quote(name) for name in org['skills']]
+    paths = [
+        '/api/members/',
+        f'/api/members/?skills={skills[1]},{skills[2]}',
+        f'/api/members/?skills_all={skills[3]},{skills[4]}&skills_none={skills[5]}',
+        '/api/skills/',
+        '/api/projects/',
+        '/api/workhours/',
+    ] + [f'/api/members/{pk}/' for pk in org['member_ids'][:20]]
+
+    result = {'members': members, 'clients': clients, 'duration_s': duration, 'vendor': connection.vendor}
+    for mode in modes:
+        result[mode] = run_mode(mode, connection.settings_dict['NAME'], paths, clients, duration, timeout)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--members', type=int, default=2000)
+    parser.add_argument('--clients', type=int, default=500)
+    parser.add_argument('--duration', type=float, default=10, help='seconds per mode')
+    parser.add_argument('--timeout', type=float, default=30, help='seconds per request')
+    parser.add_argument('--modes', default=','.join(MODES))
+    parser.add_argument('--serve', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--database', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        return serve(args.serve, args.port, args.database)
+
+    setup()
+    with test_database(shared=True):
+        print(json.dumps(run(args.modes.split(','), args.members, args.clients, args.duration, args.timeout), indent=2))
+
+
+if __name__ == '__main__':
+    main()
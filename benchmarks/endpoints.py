@@ -0,0 +1,259 @@
+"""
+Throughput, latency percentiles and SQL queries of every endpoint and filter
+combination, driven by concurrent in-process clients on generated orgs.
+
+    python -m benchmarks.endpoints --members 1000,10000 --output run.json
+    python -m benchmarks.endpoints --compare run.json   # flags regressions
+
+The response cache is disabled unless --cache is given, so every request
+reaches the database. The exit status is 1 when regressions were flagged.
+"""
+import argparse
+import json
+import queue
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import quote
+
+from benchmarks import disable_response_cache, latency_summary, setup, test_database
+
+GET, POST = 'GET', 'POST'
+
+
+def scenarios(org):
+    """
+    :param org: what members.generator.generate_org returned
+    :return: dict name -> function of a Random returning (method, path, json body)
+    """
+    member_ids, project_ids = org['member_ids'], org['project_ids']
+    project = project_ids[0]
+    manager, member = member_ids[0], member_ids[len(member_ids) // 2]
+    skills = org['skills']  # most popular first
+    common, second, third, rare = (quote(name) for name in (skills[0], skills[1], skills[4], skills[-1]))
+
+    def get(path):
+        return lambda rng: (GET, path, None)
+
+    return {
+        'members': get('/api/members/'),
+        'members?page_size=200': get('/api/members/?page_size=200'),
+        'members?fields': get('/api/members/?fields=id,first_name,last_name'),
+        'members?skills': get(f'/api/members/?skills={common}'),
+        'members?skills(rare)': get(f'/api/members/?skills={rare}'),
+        'members?skills_all': get(f'/api/members/?skills_all={common},{second}'),
+        'members?skills_none': get(f'/api/members/?skills_none={common},{second}'),
+        'members?holidays': get('/api/members/?holidays=true'),
+        'members?holidays=false': get('/api/members/?holidays=false'),
+        'members?is_working': get('/api/members/?is_working=true'),
+        'members?is_working&at': get('/api/members/?is_working=true&at=2024-01-10T12:00:00Z'),
+        'members?project': get(f'/api/members/?project={project}'),
+        'members?skills&holidays&is_working&project': get(
+            f'/api/members/?skills={common},{third}&holidays=false&is_working=true&project={project}'
+        ),
+        'members?search': get('/api/members/?search=olena%20shevchneko'),
+        'members/export': get(f'/api/members/export/?format=ndjson&project={project}'),
+        'members/rollups': get('/api/members/rollups/'),
+        'member': lambda rng: (GET, f'/api/members/{rng.choice(member_ids)}/', None),
+        'member/reports': get(f'/api/members/{manager}/reports/'),
+        'member/chain': get(f'/api/members/{member}/chain/'),
+        'member/assign_to_project': lambda rng: (
+            POST, f'/api/members/{rng.choice(member_ids)}/assign_to_project/', {'id': rng.choice(project_ids)}
+        ),
+        'members/assign_to_project': lambda rng: (
+            POST, '/api/members/assign_to_project/',
+            {'project': rng.choice(project_ids), 'members': rng.sample(member_ids, 10)},
+        ),
+        'members/assign_to_project(filter)': lambda rng: (
+            POST, '/api/members/assign_to_project/',
+            {'project': rng.choice(project_ids), 'filter': {'skills': [skills[-1]], 'holidays': False}},
+        ),
+        'members/staffing': lambda rng: (
+            POST, '/api/members/staffing/', {'skills': skills[:3], 'overlap_hours': 4}
+        ),
+        'members/meeting_slots': lambda rng: (
+            POST, '/api/members/meeting_slots/', {'project': rng.choice(project_ids), 'duration_minutes': 30}
+        ),
+        'members/meeting_slots(month)': lambda rng: (
+            POST, '/api/members/meeting_slots/',
+            {'members': rng.sample(member_ids, min(500, len(member_ids))),
+             'start': '2024-01-01T00:00:00Z', 'end': '2024-02-01T00:00:00Z'},
+        ),
+        'skills': get('/api/skills/'),
+        'projects': get('/api/projects/'),
+        'workhours': get('/api/workhours/'),
+        'analytics': get('/api/analytics/'),
+        'analytics/projects': get('/api/analytics/projects/'),
+        'analytics/skills': get('/api/analytics/skills/'),
+        'analytics/coverage?project': get(f'/api/analytics/coverage/?project={project}'),
+        'analytics/managers': get('/api/analytics/managers/'),
+    }
+
+
+def drive(scenario, requests, clients, seed=0):
+    """
+    Runs `requests` requests of a scenario from `clients` threads
+    """
+    from django.db import connection, connections
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+
+    pending = queue.Queue()
+    for number in range(requests):
+        pending.put(number)
+    latencies, queries, errors = [], [], []
+    lock = threading.Lock()
+
+    def worker():
+        client = Client()
+        try:
+            while True:
+                try:
+                    number = pending.get_nowait()
+                except queue.Empty:
+                    return
+                method, path, body = scenario(random.Random(seed * 1000003 + number))
+                started = time.perf_counter()
+                try:
+                    with CaptureQueriesContext(connection) as captured:
+                        if method == GET:
+                            response = client.get(path)
+                        else:
+                            response = client.post(path, json.dumps(body), content_type='application/json')
+                        if response.streaming:
+                            b''.join(response.streaming_content)
+                    status = response.status_code
+                except Exception as error:  # the test client re-raises what the view raised, e.g. lock timeouts
+                    status = type(error).__name__
+                elapsed = time.perf_counter() - started
+                with lock:
+                    if isinstance(status, int) and status < 400:
+                        latencies.append(elapsed)
+                        queries.append(len(captured))
+                    else:
+                        errors.append(status)
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=worker) for _ in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    result = {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'requests_per_second': round(len(latencies) / elapsed, 1),
+        'queries': statistics.median(queries) if queries else None,
+        'queries_max': max(queries, default=None),
+    }
+    result.update(latency_summary(latencies))
+    return result
+
+
+def run(members, requests=200, clients=8, only=None):
+    from members.generator import generate_org
+
+    started = time.perf_counter()
+    org = generate_org(members)
+    result = {'seed_s': round(time.perf_counter() - started, 2), 'endpoints': {}}
+
+    for name, scenario in scenarios(org).items():
+        if only and not any(part in name for part in only):
+            continue
+        drive(scenario, min(clients, requests), 1)  # warm up the caches and in-process indexes
+        result['endpoints'][name] = drive(scenario, requests, clients)
+        print(f'{members} {name}: {result["endpoints"][name]}', file=sys.stderr)
+    return result
+
+
+def regressions(baseline, current, tolerance):
+    """
+    Endpoints slower at p95, with less throughput or more queries than in the baseline
+    """
+    flagged = []
+    for size, run in current['runs'].items():
+        old_endpoints = baseline.get('runs', {}).get(size, {}).get('endpoints', {})
+        for name, new in run['endpoints'].items():
+            old = old_endpoints.get(name)
+            if not old:
+                continue
+            reasons = []
+            if old['p95_ms'] and new['p95_ms'] and new['p95_ms'] > old['p95_ms'] * (1 + tolerance):
+                reasons.append(f'p95 {old["p95_ms"]} -> {new["p95_ms"]} ms')
+            if new['requests_per_second'] < old['requests_per_second'] / (1 + tolerance):
+                reasons.append(f'throughput {old["requests_per_second"]} -> {new["requests_per_second"]} req/s')
+            if old['queries'] is not None and new['queries'] is not None and new['queries'] > old['queries']:
+                reasons.append(f'queries {old["queries"]} -> {new["queries"]}')
+            if new['errors'] > old['errors']:
+                reasons.append(f'errors {old["errors"]} -> {new["errors"]}')
+            if reasons:
+                flagged.append({'members': size, 'endpoint': name, 'reasons': reasons})
+    return flagged
+
+
+def revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--members', default='1000', help='comma separated org sizes, e.g. 1000,10000,100000')
+    parser.add_argument('--requests', type=int, default=200, help='requests per endpoint')
+    parser.add_argument('--clients', type=int, default=8, help='concurrent clients')
+    parser.add_argument('--only', help='comma separated parts of endpoint names to run')
+    parser.add_argument('--cache', action='store_true', help='keep the response cache on')
+    parser.add_argument('--output', help='file to write the results to, stdout by default')
+    parser.add_argument('--compare', help='results of an earlier run to flag regressions against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='relative slowdown flagged, 0.2 by default')
+    args = parser.parse_args()
+
+    setup()
+    from django.conf import settings
+    from django.db import connection
+
+    settings.DEBUG = False
+    if not args.cache:
+        disable_response_cache()
+
+    result = {
+        'meta': {
+            'started': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'revision': revision(),
+            'vendor': connection.vendor,
+            'requests': args.requests,
+            'clients': args.clients,
+            'cache': args.cache,
+        },
+        'runs': {},
+    }
+    only = args.only.split(',') if args.only else None
+    for members in map(int, args.members.split(',')):
+        with test_database(shared=True):
+            result['runs'][str(members)] = run(members, args.requests, args.clients, only)
+
+    if args.compare:
+        with open(args.compare) as baseline:
+            result['regressions'] = regressions(json.load(baseline), result, args.tolerance)
+
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(output + '\n')
+    else:
+        print(output)
+    return 1 if result.get('regressions') else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""
+Overhead of SimpleOffice.metrics.MetricsMiddleware: the same requests served
+in-process with and without it, sequentially, the faster of interleaved runs
+of each. The response cache is disabled unless --cache is given; cached
+responses are the cheapest requests, so the worst case for the overhead.
+
+End to end differences of a few percent are within the noise, so the cost of
+the middleware around a stub view is measured too and set against the
+requests without it (isolated_overhead_percent).
+"""
+import argparse
+import json
+import time
+from urllib.parse import quote
+
+from benchmarks import best_of, disable_response_cache, setup, test_database
+
+MIDDLEWARE = 'SimpleOffice.metrics.MetricsMiddleware'
+
+
+def client_for(middleware):
+    from django.test import Client, override_settings
+
+    client = Client()
+    with override_settings(MIDDLEWARE=middleware):
+        client.get('/api/skills/')  # the handler loads the middleware on its first request
+    return client
+
+
+def timed(client, path, requests):
+    started = time.perf_counter()
+    for _ in range(requests):
+        client.get(path)
+    return time.perf_counter() - started
+
+
+def isolated(path, requests):
+    """
+    :return: seconds per request the middleware adds around a view doing nothing
+    """
+    from django.http import HttpResponse
+    from django.test import RequestFactory
+    from django.urls import resolve
+    from SimpleOffice.metrics import MetricsMiddleware
+
+    request, response = RequestFactory().get(path), HttpResponse(b'x' * 2000)
+    request.resolver_match = resolve(request.path_info)
+    middleware = MetricsMiddleware(lambda request: response)
+
+    def serve():
+        for _ in range(requests):
+            middleware.process_view(request, request.resolver_match.func, (), {})
+            middleware(request)
+
+    return best_of(serve) / requests
+
+
+def run(members=1000, requests=50, repeat=20):
+    from django.conf import settings
+    from members.generator import generate_org
+
+    org = generate_org(members)
+    skill = quote(org['skills'][0])
+    paths = {
+        'members': '/api/members/',
+        'members?skills&holidays': f'/api/members/?skills={skill}&holidays=false',
+        'member': f'/api/members/{org["member_ids"][0]}/',
+        'skills': '/api/skills/',
+        'workhours': '/api/workhours/',
+    }
+    clients = {
+        'with': client_for(settings.MIDDLEWARE),
+        'without': client_for([name for name in settings.MIDDLEWARE if name != MIDDLEWARE]),
+    }
+
+    result = {'members': members, 'requests': requests, 'endpoints': {}}
+    for name, path in paths.items():
+        timings = {mode: [] for mode in clients}
+        for _ in range(repeat):
+            for mode, client in clients.items():
+                timings[mode].append(timed(client, path, requests))
+        with_, without = min(timings['with']), min(timings['without'])
+        cost = isolated(path, requests)
+        result['endpoints'][name] = {
+            'with_us': round(with_ / requests * 1e6, 1),
+            'without_us': round(without / requests * 1e6, 1),
+            'overhead_us': round((with_ - without) / requests * 1e6, 1),
+            'overhead_percent': round((with_ / without - 1) * 100, 2),
+            'isolated_us': round(cost * 1e6, 1),
+            'isolated_overhead_percent': round(cost * requests / without * 100, 2),
+        }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--members', type=int, default=1000)
+    parser.add_argument('--requests', type=int, default=50, help='requests per endpoint and run')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--cache', action='store_true', help='keep the response cache on')
+    args = parser.parse_args()
+
+    setup()
+    from django.conf import settings
+
+    settings.DEBUG = False
+    if not args.cache:
+        disable_response_cache()
+    with test_database():
+        print(json.dumps(run(args.members, args.requests, args.repeat), indent=2))
+
+
+if __name__ == '__main__':
+    main()
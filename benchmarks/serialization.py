@@ -0,0 +1,54 @@
+"""
+Per-row cost of serializing members with MemberSerializer and with its
+LeanSerializer, with and without the queries
+"""
+import argparse
+import json
+
+from benchmarks import best_of, setup, test_database
+
+
+def run(members=2000, repeat=5):
+    from members.generator import generate_org
+    from members.models import Member
+    from members.serializers import MemberSerializer
+    from SimpleOffice.lean import lean_serializer_for
+    from SimpleOffice.prefetch import plan_queryset
+
+    generate_org(members)
+    lean = lean_serializer_for(MemberSerializer)
+
+    def regular_queryset():
+        return plan_queryset(Member.objects.order_by('pk'), MemberSerializer)
+
+    def lean_rows():
+        return list(lean.values(Member.objects.order_by('pk')))
+
+    instances, rows = list(regular_queryset()), lean_rows()
+    timings = {
+        'regular': best_of(lambda: MemberSerializer(list(regular_queryset()), many=True).data, repeat),
+        'lean': best_of(lambda: lean.serialize(lean_rows()), repeat),
+        'regular_serialize_only': best_of(lambda: MemberSerializer(instances, many=True).data, repeat),
+        'lean_serialize_only': best_of(lambda: lean.serialize(rows), repeat),
+    }
+    result = {'rows': members}
+    for name, seconds in timings.items():
+        result[f'{name}_us_per_row'] = round(seconds / members * 1e6, 2)
+    result['speedup'] = round(timings['regular'] / timings['lean'], 2)
+    result['serialize_only_speedup'] = round(timings['regular_serialize_only'] / timings['lean_serialize_only'], 2)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--members', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    setup()
+    with test_database():
+        print(json.dumps(run(args.members, args.repeat), indent=2))
+
+
+if __name__ == '__main__':
+    main()
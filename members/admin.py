@@ -1,6 +1,23 @@
 from django.contrib import admin
 
-from members.models import WorkHours, Member
+from members.models import Holiday, Shift, WorkHours, Member
 
-admin.site.register(Member)
-admin.site.register(WorkHours)
+
+class ShiftInline(admin.TabularInline):
+    model = Shift
+    extra = 0
+
+
+@admin.register(WorkHours)
+class WorkHoursAdmin(admin.ModelAdmin):
+    inlines = (ShiftInline, )
+
+
+class HolidayInline(admin.TabularInline):
+    model = Holiday
+    extra = 0
+
+
+@admin.register(Member)
+class MemberAdmin(admin.ModelAdmin):
+    inlines = (HolidayInline, )
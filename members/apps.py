@@ -3,3 +3,18 @@ from django.apps import AppConfig
 
 class PeopleConfig(AppConfig):
     name = 'members'
+
+    def ready(self):
+        from django.db.models.signals import post_migrate
+
+        from members.models import Holiday, Member, Shift, WorkHours, create_holiday_indexes
+        from members.search import create_search_indexes
+        from SimpleOffice.cache import invalidate_on_change
+
+        post_migrate.connect(create_search_indexes, sender=self)
+        post_migrate.connect(create_holiday_indexes, sender=self)
+
+        invalidate_on_change(Member, 'members')
+        invalidate_on_change(Holiday, 'members')
+        invalidate_on_change(WorkHours, 'workhours')
+        invalidate_on_change(Shift, 'workhours')
@@ -0,0 +1,51 @@
+"""
+Full-directory export. Members are read as plain rows through a server-side
+cursor and the skills of every chunk are fetched with one query
+(see SimpleOffice.lean), so memory stays flat and no model instances are built
+"""
+from itertools import islice
+
+from members.serializers import MemberSerializer
+from SimpleOffice.lean import lean_serializer_for
+
+CHUNK_SIZE = 2000
+
+
+def flat_member_row(row):
+    """
+    One CSV record per member, skills are joined with ";"
+    """
+    project, workhours = row['project'] or {}, row['workhours'] or {}
+    return {
+        'id': row['id'],
+        'first_name': row['first_name'],
+        'last_name': row['last_name'],
+        'skills': ';'.join(skill['name'] for skill in row['skills']),
+        'project': project.get('id'),
+        'project_name': project.get('name'),
+        'manager_id': row['manager_id'],
+        'workhours_start': workhours.get('start'),
+        'workhours_end': workhours.get('end'),
+        'workhours_timezone': workhours.get('timezone'),
+        'on_holidays_till': row['on_holidays_till'],
+    }
+
+
+def iter_member_rows(queryset, chunk_size=CHUNK_SIZE):
+    """
+    MemberSerializer representations built by its LeanSerializer chunk by chunk
+    """
+    lean = lean_serializer_for(MemberSerializer)
+    rows = lean.values(queryset).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield from lean.serialize(chunk)
+
+
+def export_rows(queryset, flat=False, chunk_size=CHUNK_SIZE):
+    rows = iter_member_rows(queryset, chunk_size)
+    if flat:
+        return map(flat_member_row, rows)
+    return rows
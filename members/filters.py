@@ -1,35 +1,110 @@
-from django.db.models import Q
-from django.utils.datetime_safe import datetime
+from django.db.models import Count
+from django.utils import timezone
 from django_filters import rest_framework as filters
+from rest_framework.exceptions import ValidationError
 
-from members.models import Member
+from members.models import Member, WorkInterval
+
+
+class NameInFilter(filters.BaseInFilter, filters.CharFilter):
+    pass
+
+
+class PeriodFilter(filters.BaseRangeFilter, filters.DateFilter):
+    """
+    Two dates separated by a comma, both days included
+    """
 
 
 class MembersFilter(filters.FilterSet):
     """
     Filterset to filter members by skills, holiday and working hours
     """
-    skills = filters.BaseInFilter(field_name='skills__name')
+    # Skill names separated by commas, matched together in filter_by_skills
+    skills = NameInFilter(method='filter_skills')  # same as skills_any
+    skills_all = NameInFilter(method='filter_skills')
+    skills_any = NameInFilter(method='filter_skills')
+    skills_none = NameInFilter(method='filter_skills')
     holidays = filters.BooleanFilter(method='filter_is_on_holidays')
+    as_of = filters.DateFilter(method='filter_as_of')  # date for holidays, today by default
     is_working = filters.BooleanFilter(method='filter_is_working')
+    at = filters.IsoDateTimeFilter(method='filter_at')  # moment for is_working, now by default
+    available_between = PeriodFilter(method='filter_available_between')
+    off_between = PeriodFilter(method='filter_off_between')
 
     class Meta:
         model = Member
         fields = (
             'skills',
+            'skills_all',
+            'skills_any',
+            'skills_none',
             'project',
             'holidays',
+            'as_of',
             'is_working',
+            'at',
+            'available_between',
+            'off_between',
         )
 
+    def filter_queryset(self, queryset):
+        return self.filter_by_skills(super().filter_queryset(queryset))
+
+    def filter_skills(self, queryset, name, value):
+        return queryset  # all skill filters are combined in filter_by_skills
+
+    def filter_by_skills(self, queryset):
+        """
+        Semi-joins on the skills through-table, a skill name may belong to several skills.
+        Holders of all the required skills are those having as many distinct names of them
+        """
+        data = self.form.cleaned_data
+        required = data.get('skills_all')
+        wanted = (data.get('skills') or []) + (data.get('skills_any') or [])
+        unwanted = data.get('skills_none')
+
+        holders = Member.skills.through.objects.values('member_id')
+        if required:
+            required = sorted(set(required))
+            queryset = queryset.filter(pk__in=holders.filter(skill__name__in=required).annotate(
+                names=Count('skill__name', distinct=True),
+            ).filter(names=len(required)).values('member_id'))
+        if wanted:
+            queryset = queryset.filter(pk__in=holders.filter(skill__name__in=wanted))
+        if unwanted:
+            queryset = queryset.exclude(pk__in=holders.filter(skill__name__in=unwanted))
+        return queryset
+
+    def filter_as_of(self, queryset, name, value):
+        return queryset  # only used by filter_is_on_holidays
+
     def filter_is_on_holidays(self, queryset, name, value):
+        as_of = self.form.cleaned_data.get('as_of')
         if value:
-            return queryset.filter(Q(on_holidays_till__isnull=False) | Q(on_holidays_till__gt=datetime.now()))
-        return queryset.filter(Q(on_holidays_till__isnull=True) | Q(on_holidays_till__lt=datetime.now()))
+            return queryset.on_holidays(as_of)
+        return queryset.available(as_of)
+
+    @staticmethod
+    def period(name, value):
+        start, end = value
+        if start > end:
+            raise ValidationError({name: ['The start must not be after the end']})
+        return start, end
 
+    def filter_available_between(self, queryset, name, value):
+        return queryset.available_between(*self.period(name, value))
+
+    def filter_off_between(self, queryset, name, value):
+        return queryset.off_between(*self.period(name, value))
+
+    def filter_at(self, queryset, name, value):
+        return queryset  # only used by filter_is_working
 
     def filter_is_working(self, queryset, name, value):
-        if value:
-            return queryset.filter(Q(workhours__start__lt=datetime.now()) & Q(workhours__end__gt=datetime.now()))
+        moment = self.form.cleaned_data.get('at') or timezone.now()
+        working = WorkInterval.objects.covering(moment).values('workhours_id')
 
-        return queryset.filter(Q(workhours__start__gt=datetime.now()) | Q(workhours__end__lt=datetime.now()))
+        if value:
+            return queryset.filter(workhours__in=working)
+        return queryset.exclude(workhours__in=working)
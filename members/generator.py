@@ -0,0 +1,301 @@
+"""
+Deterministic synthetic org for capacity planning and benchmarks.
+
+The same seed gives the same org: a manager tree of about `span` reports per
+manager, skill popularity and project sizes following a power law (Zipf),
+shifts across TIMEZONES, teams mostly sharing the project and shift of their
+manager, and some members on past or current holidays.
+
+Rows are generated as tuples and written in batches, with COPY on
+PostgreSQL and executemany elsewhere, ids are assigned up front so managers
+go into the same insert. An org can be dumped to and loaded from a gzipped
+file of JSON lines: a {"model", "columns"} header per table followed by one
+array per row.
+"""
+import csv
+import gzip
+import io
+import json
+import random
+from array import array
+from datetime import time, timedelta
+from itertools import accumulate, islice
+
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+
+from members.models import Holiday, Member, Shift, WorkHours, WorkInterval
+from projects.models import Project
+from SimpleOffice.cache import invalidate
+from skills.models import Skill
+
+FIRST_NAMES = (
+    'Olena', 'Andrii', 'Maria', 'Dmytro', 'Anna', 'Oleksandr', 'Iryna', 'Serhii', 'Emma', 'Liam', 'Olivia', 'Noah',
+    'Sofia', 'Mateo', 'Yuki', 'Hiroshi', 'Priya', 'Arjun', 'Wei', 'Mei', 'Lucas', 'Camila', 'Ahmed', 'Fatima',
+    'Jonas', 'Lena', 'Piotr', 'Zofia', 'Chloe', 'Hugo', 'Amara', 'Kwame', 'Ingrid', 'Lars', 'Diego', 'Valentina',
+)
+LAST_NAMES = (
+    'Shevchenko', 'Kovalenko', 'Bondarenko', 'Tkachenko', 'Smith', 'Johnson', 'Garcia', 'Martinez', 'Muller',
+    'Schmidt', 'Kowalski', 'Nowak', 'Tanaka', 'Sato', 'Sharma', 'Patel', 'Wang', 'Li', 'Silva', 'Santos', 'Dubois',
+    'Martin', 'Rossi', 'Bianchi', 'Hansen', 'Larsen', 'Okafor', 'Mensah', 'Hassan', 'Ali', 'Novak', 'Horvat',
+)
+SKILL_NAMES = (
+    'python', 'javascript', 'sql', 'react', 'django', 'typescript', 'docker', 'aws', 'java', 'postgresql',
+    'kubernetes', 'go', 'node.js', 'css', 'linux', 'git', 'c#', 'terraform', 'graphql', 'redis', 'kotlin', 'swift',
+    'rust', 'scala', 'spark', 'kafka', 'elasticsearch', 'vue', 'angular', 'flutter', 'c++', 'ruby', 'rails', 'php',
+    'figma', 'ux research', 'product management', 'scrum', 'qa automation', 'selenium', 'pandas', 'pytorch',
+    'tensorflow', 'machine learning', 'data engineering', 'airflow', 'gcp', 'azure', 'ansible', 'nginx',
+)
+# UTC offsets from -8 to +10 with half hours, DST on both hemispheres
+TIMEZONES = (
+    'America/Los_Angeles', 'America/Denver', 'America/Chicago', 'America/New_York', 'America/Sao_Paulo',
+    'America/Argentina/Buenos_Aires', 'Atlantic/Reykjavik', 'Europe/London', 'Europe/Lisbon', 'Europe/Berlin',
+    'Europe/Warsaw', 'Europe/Kiev', 'Africa/Lagos', 'Africa/Nairobi', 'Europe/Moscow', 'Asia/Dubai',
+    'Asia/Karachi', 'Asia/Kolkata', 'Asia/Kathmandu', 'Asia/Bangkok', 'Asia/Singapore', 'Asia/Shanghai',
+    'Asia/Tokyo', 'Australia/Adelaide', 'Australia/Sydney',
+)
+SHIFT_STARTS = (7, 8, 9, 10)
+SHIFT_HOURS = 8
+
+BATCH_SIZE = 5000
+ORG_MODELS = (Skill, Project, WorkHours, Member, Member.skills.through)
+DUMP_COLUMNS = {
+    Skill: ('id', 'name'),
+    Project: ('id', 'name'),
+    WorkHours: ('id', 'start', 'end', 'timezone'),
+    Member: ('id', 'first_name', 'last_name', 'manager_id_id', 'project_id', 'workhours_id', 'on_holidays_till'),
+    Member.skills.through: ('member_id', 'skill_id'),
+}
+
+
+def zipf_cumulative(count, exponent=1.1):
+    """
+    Cumulative weights of ranks 1..count for random.choices
+    """
+    return list(accumulate(1 / rank ** exponent for rank in range(1, count + 1)))
+
+
+def skill_name(rank):
+    return SKILL_NAMES[rank] if rank < len(SKILL_NAMES) else f'skill{rank}'
+
+
+def write_rows(model, columns, rows, batch_size=BATCH_SIZE):
+    """
+    Inserts tuples of column values in batches
+    :return: number of rows written
+    """
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    names = ', '.join(quote(column) for column in columns)
+    rows = iter(rows)
+    written = 0
+
+    with connection.cursor() as cursor:
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                return written
+            written += len(batch)
+            if connection.vendor != 'postgresql':
+                cursor.executemany(f'INSERT INTO {table} ({names}) VALUES ({", ".join(["%s"] * len(columns))})', batch)
+                continue
+
+            # Quoted strings and unquoted empty NULLs
+            buffer = io.StringIO()
+            csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC).writerows(batch)
+            buffer.seek(0)
+            cursor.copy_expert(f'COPY {table} ({names}) FROM STDIN WITH (FORMAT csv)', buffer)
+
+
+def next_id(model):
+    return (model.objects.order_by('-pk').values_list('pk', flat=True).first() or 0) + 1
+
+
+def clear_org():
+    """
+    Deletes every member, skill, project and work hours without loading them
+    """
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        for model in (Member.skills.through, Holiday, Member, WorkInterval, Shift, WorkHours, Project, Skill):
+            cursor.execute(f'DELETE FROM {quote(model._meta.db_table)}')
+
+
+def finish(workhours_ids=()):
+    """
+    Work intervals, sequences, planner statistics and caches after raw inserts
+    """
+    for workhours in WorkHours.objects.filter(pk__in=list(workhours_ids)):
+        workhours.rebuild_intervals()
+    with connection.cursor() as cursor:
+        for statement in connection.ops.sequence_reset_sql(no_style(), [Skill, Project, WorkHours, Member]):
+            cursor.execute(statement)
+        if connection.vendor == 'postgresql':
+            for model in ORG_MODELS:
+                cursor.execute(f'ANALYZE {connection.ops.quote_name(model._meta.db_table)}')
+    invalidate('members', 'skills', 'projects', 'workhours')
+
+
+class OrgGenerator:
+    """
+    :param members: number of members to add
+    :param skills: number of skills, scales with members by default
+    :param projects: number of projects, scales with members by default
+    :param skills_per_member: mean of the exponentially distributed skill count
+    :param span: mean number of direct reports of a manager
+    :param timezones: of the shifts, every one gets SHIFT_STARTS
+    :param as_of: date holidays are relative to, today by default
+    """
+
+    def __init__(self, members, skills=None, projects=None, skills_per_member=4, span=6, timezones=TIMEZONES,
+                 seed=0, as_of=None, batch_size=BATCH_SIZE):
+        self.members = members
+        self.skills = skills or min(max(50, members // 100), 5000)
+        self.projects = projects or max(10, members // 50)
+        self.skills_per_member = skills_per_member
+        self.span = span
+        self.timezones = timezones
+        self.rng = random.Random(seed)
+        self.as_of = as_of or timezone.localdate()
+        self.batch_size = batch_size
+
+    def generate(self):
+        """
+        :return: dict with the ids of what was added and skill names by popularity
+        """
+        with transaction.atomic():
+            skill_ids = self.write_named(Skill, [skill_name(rank) for rank in range(self.skills)])
+            project_ids = self.write_named(Project, [f'Project {number + 1}' for number in range(self.projects)])
+            workhours_ids = [
+                WorkHours.objects.create(start=time(hour), end=time((hour + SHIFT_HOURS) % 24), timezone=zone).pk
+                for zone in self.timezones for hour in SHIFT_STARTS
+            ]
+            first_id = next_id(Member)
+            member_ids = range(first_id, first_id + self.members)
+
+            write_rows(Member, DUMP_COLUMNS[Member],
+                       self.member_rows(member_ids, project_ids, workhours_ids), self.batch_size)
+            links = write_rows(Member.skills.through, DUMP_COLUMNS[Member.skills.through],
+                               self.skill_rows(member_ids, skill_ids), self.batch_size)
+            finish()
+
+        return {
+            'member_ids': member_ids,
+            'project_ids': project_ids,
+            'workhours_ids': workhours_ids,
+            'skills': [skill_name(rank) for rank in range(self.skills)],
+            'skill_links': links,
+        }
+
+    def write_named(self, model, names):
+        first_id = next_id(model)
+        write_rows(model, ('id', 'name'), ((first_id + number, name) for number, name in enumerate(names)),
+                   self.batch_size)
+        return list(range(first_id, first_id + len(names)))
+
+    def member_rows(self, member_ids, project_ids, workhours_ids):
+        rng = self.rng
+        project_weights = zipf_cumulative(len(project_ids))
+        # Project and shift per member number, 0 for no project
+        projects, shifts = array('q'), array('q')
+
+        for number, pk in enumerate(member_ids):
+            manager = None
+            if number:
+                # Heap-like tree, the jitter makes the spans uneven
+                parent = (number - 1) // self.span
+                manager = rng.randint(max(0, parent - 2), parent)
+
+            if manager is not None and projects[manager] and rng.random() < 0.8:
+                project_id, workhours_id = projects[manager], shifts[manager]
+            else:
+                project_id = rng.choices(project_ids, cum_weights=project_weights)[0] if rng.random() < 0.8 else 0
+                workhours_id = rng.choice(workhours_ids)
+            projects.append(project_id)
+            shifts.append(workhours_id)
+
+            holidays = rng.random()
+            if holidays < 0.05:
+                on_holidays_till = self.as_of + timedelta(days=rng.randint(0, 21))
+            elif holidays < 0.2:
+                on_holidays_till = self.as_of - timedelta(days=rng.randint(1, 365))
+            else:
+                on_holidays_till = None
+
+            yield (
+                pk,
+                rng.choice(FIRST_NAMES),
+                rng.choice(LAST_NAMES),
+                None if manager is None else member_ids[manager],
+                project_id or None,
+                workhours_id,
+                on_holidays_till and on_holidays_till.isoformat(),
+            )
+
+    def skill_rows(self, member_ids, skill_ids):
+        rng = self.rng
+        weights = zipf_cumulative(len(skill_ids))
+        for pk in member_ids:
+            count = min(len(skill_ids), max(1, round(rng.expovariate(1 / self.skills_per_member))))
+            chosen = set()
+            while len(chosen) < count:
+                chosen.add(rng.choices(skill_ids, cum_weights=weights)[0])
+            for skill_id in sorted(chosen):
+                yield pk, skill_id
+
+
+def generate_org(members, **options):
+    return OrgGenerator(members, **options).generate()
+
+
+def _json_value(value):
+    if value is None or isinstance(value, (int, str)):
+        return value
+    return value.isoformat() if hasattr(value, 'isoformat') else str(value)
+
+
+def dump_org(path):
+    """
+    Writes every member, skill, project and work hours to a gzipped JSON lines file
+    :return: dict model label -> number of rows
+    """
+    counts = {}
+    with gzip.open(path, 'wt', encoding='utf-8') as output:
+        for model, columns in DUMP_COLUMNS.items():
+            label = model._meta.label_lower
+            output.write(json.dumps({'model': label, 'columns': columns}) + '\n')
+            counts[label] = 0
+            for row in model.objects.order_by(*columns[:2]).values_list(*columns).iterator(chunk_size=BATCH_SIZE):
+                output.write(json.dumps([_json_value(value) for value in row], separators=(',', ':')) + '\n')
+                counts[label] += 1
+    return counts
+
+
+def load_org(path, batch_size=BATCH_SIZE):
+    """
+    Loads a dump_org file, ids are kept so the directory should be empty
+    :return: dict model label -> number of rows
+    """
+    models = {model._meta.label_lower: model for model in DUMP_COLUMNS}
+    counts = {}
+
+    with gzip.open(path, 'rt', encoding='utf-8') as lines, transaction.atomic():
+        lines = iter(lines)
+        header = json.loads(next(lines, 'null'))
+        while header is not None:
+            model, columns = models[header['model']], header['columns']
+            header = None
+
+            def rows():
+                nonlocal header
+                for line in lines:
+                    value = json.loads(line)
+                    if isinstance(value, dict):
+                        header = value
+                        return
+                    yield tuple(value)
+
+            counts[model._meta.label_lower] = write_rows(model, columns, rows(), batch_size)
+        finish(WorkHours.objects.values_list('pk', flat=True))
+    return counts
@@ -0,0 +1,124 @@
+"""
+Org chart queries over Member.manager_id, each one is a single recursive CTE
+(supported by PostgreSQL and SQLite). MAX_DEPTH bounds the recursion so
+even corrupted data with a cycle can't loop forever.
+"""
+from django.db import connection
+
+from members.models import Member
+
+MAX_DEPTH = 64
+
+TABLE = Member._meta.db_table
+MANAGER = Member._meta.get_field('manager_id').column
+
+
+def _descendants_cte():
+    return (
+        f'WITH RECURSIVE tree(id, depth) AS ('
+        f'SELECT id, 1 FROM {TABLE} WHERE {MANAGER} = %s '
+        f'UNION ALL '
+        f'SELECT m.id, tree.depth + 1 FROM {TABLE} m JOIN tree ON m.{MANAGER} = tree.id '
+        f'WHERE tree.depth < {MAX_DEPTH}'
+        f') '
+    )
+
+
+def _ancestors_cte():
+    return (
+        f'WITH RECURSIVE chain(id, depth) AS ('
+        f'SELECT {MANAGER}, 1 FROM {TABLE} WHERE id = %s AND {MANAGER} IS NOT NULL '
+        f'UNION ALL '
+        f'SELECT m.{MANAGER}, chain.depth + 1 FROM {TABLE} m JOIN chain ON m.id = chain.id '
+        f'WHERE m.{MANAGER} IS NOT NULL AND chain.depth < {MAX_DEPTH}'
+        f') '
+    )
+
+
+def reports_of(queryset, member_id):
+    """
+    Narrows a Member queryset down to every direct and indirect report of the member.
+    A RawSQL in pk__in would be wrapped in a second pair of parentheses,
+    which turns the subquery into a scalar, hence extra()
+    """
+    subquery = _descendants_cte() + 'SELECT DISTINCT id FROM tree'
+    return queryset.extra(where=[f'{TABLE}.id IN ({subquery})'], params=[member_id])
+
+
+def chain_of_command(member_id):
+    """
+    :return: ids of the managers from the direct one up to the root
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(_ancestors_cte() + 'SELECT id FROM chain ORDER BY depth', (member_id, ))
+        ids = [row[0] for row in cursor.fetchall()]
+    # A cycle repeats the chain, keep the first occurrence of each manager
+    return list(dict.fromkeys(ids))
+
+
+def rollup(member_id):
+    """
+    :return: dict with direct reports, total headcount and depth of the subtree
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            _descendants_cte() +
+            'SELECT COUNT(DISTINCT id), COALESCE(MAX(depth), 0), '
+            'COUNT(DISTINCT CASE WHEN depth = 1 THEN id END) FROM tree',
+            (member_id, )
+        )
+        headcount, depth, direct_reports = cursor.fetchone()
+    return {'id': member_id, 'direct_reports': direct_reports, 'headcount': headcount, 'depth': depth}
+
+
+def rollups():
+    """
+    Rollup of every manager, biggest organisations first
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'WITH RECURSIVE pairs(manager, id, depth) AS ('
+            f'SELECT {MANAGER}, id, 1 FROM {TABLE} WHERE {MANAGER} IS NOT NULL '
+            f'UNION ALL '
+            f'SELECT pairs.manager, m.id, pairs.depth + 1 FROM {TABLE} m JOIN pairs ON m.{MANAGER} = pairs.id '
+            f'WHERE pairs.depth < {MAX_DEPTH}'
+            f') '
+            f'SELECT manager, COUNT(DISTINCT CASE WHEN depth = 1 THEN id END), COUNT(DISTINCT id), MAX(depth) '
+            f'FROM pairs GROUP BY manager ORDER BY 3 DESC, manager'
+        )
+        return [
+            {'id': manager, 'direct_reports': direct_reports, 'headcount': headcount, 'depth': depth}
+            for manager, direct_reports, headcount, depth in cursor.fetchall()
+        ]
+
+
+def creates_cycle(member_id, manager_id):
+    """
+    Whether making manager_id the manager of member_id closes a loop,
+    i.e. the member already is above the new manager
+    """
+    if manager_id is None or member_id is None:
+        return False
+    return manager_id == member_id or member_id in chain_of_command(manager_id)
+
+
+def members_in_cycles(member_ids):
+    """
+    Members among member_ids that are their own (indirect) manager
+    """
+    member_ids = list(member_ids)
+    if not member_ids:
+        return set()
+    placeholders = ', '.join(['%s'] * len(member_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'WITH RECURSIVE walk(start, current, depth) AS ('
+            f'SELECT id, {MANAGER}, 1 FROM {TABLE} WHERE id IN ({placeholders}) AND {MANAGER} IS NOT NULL '
+            f'UNION ALL '
+            f'SELECT walk.start, m.{MANAGER}, walk.depth + 1 FROM {TABLE} m JOIN walk ON m.id = walk.current '
+            f'WHERE m.{MANAGER} IS NOT NULL AND walk.current <> walk.start AND walk.depth < {MAX_DEPTH}'
+            f') '
+            f'SELECT DISTINCT start FROM walk WHERE current = start',
+            member_ids
+        )
+        return {row[0] for row in cursor.fetchall()}
@@ -0,0 +1,428 @@
+"""
+Bulk import of members with their skills and work hours from CSV or NDJSON.
+
+Every row describes a whole member and replaces what is stored for it:
+    id                  optional, rows with an id are upserted
+    first_name          required
+    last_name           required
+    skills              list of names (NDJSON) or names separated by ";" (CSV)
+    project             project id
+    manager_id          member id, may point to a member later in the input
+    on_holidays_till    YYYY-MM-DD
+    workhours           {"start", "end", "timezone"} (NDJSON) or
+                        workhours_start, workhours_end, workhours_timezone (CSV)
+
+The input is consumed as a stream and written in batches.
+"""
+import csv
+import io
+import json
+from itertools import islice
+
+import pytz
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils.dateparse import parse_date, parse_time
+
+from members.hierarchy import members_in_cycles
+from members.models import Member, WorkHours
+from projects.models import Project
+from SimpleOffice.cache import invalidate
+from skills.models import Skill
+
+CSV = 'csv'
+NDJSON = 'ndjson'
+FORMATS = (CSV, NDJSON)
+
+MEMBER_FIELDS = ('first_name', 'last_name', 'project', 'workhours', 'on_holidays_till')
+
+
+class RowError(Exception):
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def read_rows(lines, fmt):
+    """
+    :param lines: iterable of text lines
+    :return: iterator of (line number, raw dict)
+    """
+    if fmt == CSV:
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as error:
+            yield number, RowError({'non_field_errors': [f'Invalid JSON: {error}']})
+            continue
+        if not isinstance(row, dict):
+            yield number, RowError({'non_field_errors': ['Expected a JSON object']})
+            continue
+        yield number, row
+
+
+def _blank(value):
+    return value is None or value == ''
+
+
+def _integer(value, errors, field):
+    if _blank(value):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        errors[field] = ['A valid integer is required.']
+
+
+class MemberRow:
+    __slots__ = ('line', 'pk', 'first_name', 'last_name', 'skills', 'project',
+                 'manager', 'on_holidays_till', 'workhours')
+
+    def __init__(self, line, raw):
+        self.line = line
+        errors = {}
+
+        self.pk = _integer(raw.get('id'), errors, 'id')
+        self.project = _integer(raw.get('project'), errors, 'project')
+        self.manager = _integer(raw.get('manager_id'), errors, 'manager_id')
+
+        for field in ('first_name', 'last_name'):
+            value = raw.get(field) or ''
+            setattr(self, field, value.strip() if isinstance(value, str) else '')
+            max_length = Member._meta.get_field(field).max_length
+            if not isinstance(value, str):
+                errors[field] = ['Not a valid string.']
+            elif not getattr(self, field):
+                errors[field] = ['This field may not be blank.']
+            elif len(getattr(self, field)) > max_length:
+                errors[field] = [f'Ensure this field has no more than {max_length} characters.']
+
+        skills = raw.get('skills') or []
+        if isinstance(skills, str):
+            skills = skills.split(';')
+        if not isinstance(skills, list) or not all(isinstance(name, str) for name in skills):
+            errors['skills'] = ['Expected a list of skill names or a string of names separated by ";".']
+            skills = []
+        self.skills = tuple(dict.fromkeys(name.strip() for name in skills if name and name.strip()))
+        if any(len(name) > Skill._meta.get_field('name').max_length for name in self.skills):
+            errors['skills'] = ['Skill names have no more than 100 characters.']
+
+        self.on_holidays_till = None
+        if not _blank(raw.get('on_holidays_till')):
+            try:
+                self.on_holidays_till = parse_date(str(raw['on_holidays_till']))
+            except ValueError:
+                pass
+            if self.on_holidays_till is None:
+                errors['on_holidays_till'] = ['Date has wrong format. Use YYYY-MM-DD.']
+
+        self.workhours = self._parse_workhours(raw, errors)
+
+        if errors:
+            raise RowError(errors)
+
+    @staticmethod
+    def _parse_workhours(raw, errors):
+        workhours = raw.get('workhours')
+        if not isinstance(workhours, dict):
+            workhours = {
+                'start': raw.get('workhours_start'),
+                'end': raw.get('workhours_end'),
+                'timezone': raw.get('workhours_timezone'),
+            }
+        if all(_blank(value) for value in workhours.values()):
+            return None
+
+        start, end, tz = workhours.get('start'), workhours.get('end'), workhours.get('timezone')
+        try:
+            start, end = parse_time(str(start)), parse_time(str(end))
+        except ValueError:
+            start = end = None
+        if start is None or end is None:
+            errors['workhours'] = ['Time has wrong format. Use hh:mm[:ss].']
+        elif not isinstance(tz, str) or tz not in pytz.all_timezones_set:
+            errors['workhours'] = [f'Unknown timezone "{tz}".']
+        else:
+            return start, end, tz
+
+
+class MemberImporter:
+    """
+    Upserts members in batches: one query per batch for existing ids, one
+    bulk insert and one bulk update for members, and one bulk write
+    of the skills through-table (COPY on PostgreSQL)
+    """
+    max_errors = 1000
+
+    def __init__(self, batch_size=2000, dry_run=False):
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.through = Member.skills.through
+
+        self.created = 0
+        self.updated = 0
+        self.skills_created = 0
+        self.workhours_created = 0
+        self.error_count = 0
+        self.errors = []
+
+        self._managers = []  # (member pk, manager pk, line)
+
+    def add_error(self, line, errors):
+        self.error_count += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'line': line, 'errors': errors})
+
+    @property
+    def report(self):
+        return {
+            'dry_run': self.dry_run,
+            'created': self.created,
+            'updated': self.updated,
+            'skills_created': self.skills_created,
+            'workhours_created': self.workhours_created,
+            'error_count': self.error_count,
+            'errors': self.errors,
+        }
+
+    def run(self, lines, fmt):
+        if fmt not in FORMATS:
+            raise ValueError(f'Unknown format "{fmt}", expected one of {", ".join(FORMATS)}')
+
+        with transaction.atomic():
+            self._load_lookups()
+            rows = self._parse(read_rows(lines, fmt))
+            while True:
+                batch = list(islice(rows, self.batch_size))
+                if not batch:
+                    break
+                self._write_batch(batch)
+
+            self._write_managers()
+            self._reset_sequence()
+
+            if self.dry_run:
+                transaction.set_rollback(True)
+            else:
+                # Raw SQL writes don't send model signals
+                invalidate('members', 'skills', 'workhours')
+        return self.report
+
+    def _load_lookups(self):
+        self.projects = set(Project.objects.values_list('pk', flat=True))
+        self.skills = {}
+        for pk, name in Skill.objects.order_by('-pk').values_list('pk', 'name'):
+            self.skills[name] = pk  # the oldest skill wins for duplicated names
+        self.workhours = {
+            (start, end, str(tz)): pk
+            for pk, start, end, tz in WorkHours.objects.values_list('pk', 'start', 'end', 'timezone')
+        }
+
+    def _parse(self, raw_rows):
+        seen = set()
+        for line, raw in raw_rows:
+            if isinstance(raw, RowError):
+                self.add_error(line, raw.errors)
+                continue
+            try:
+                row = MemberRow(line, raw)
+            except RowError as error:
+                self.add_error(line, error.errors)
+                continue
+
+            if row.project is not None and row.project not in self.projects:
+                self.add_error(line, {'project': [f'Invalid pk "{row.project}" - object does not exist.']})
+                continue
+            if row.pk is not None:
+                if row.pk in seen:
+                    self.add_error(line, {'id': ['Duplicated id in the input.']})
+                    continue
+                seen.add(row.pk)
+            yield row
+
+    def _skill_ids(self, rows):
+        missing = {name for row in rows for name in row.skills if name not in self.skills}
+        if missing:
+            Skill.objects.bulk_create([Skill(name=name) for name in missing])
+            self.skills.update(Skill.objects.filter(name__in=missing).values_list('name', 'pk'))
+            self.skills_created += len(missing)
+
+    def _workhours_id(self, workhours):
+        if workhours is None:
+            return None
+        if workhours not in self.workhours:
+            start, end, tz = workhours
+            # Few distinct schedules exist, save() also builds their intervals
+            self.workhours[workhours] = WorkHours.objects.create(start=start, end=end, timezone=tz).pk
+            self.workhours_created += 1
+        return self.workhours[workhours]
+
+    def _member(self, row):
+        return Member(
+            pk=row.pk,
+            first_name=row.first_name,
+            last_name=row.last_name,
+            project_id=row.project,
+            workhours_id=self._workhours_id(row.workhours),
+            on_holidays_till=row.on_holidays_till,
+        )
+
+    def _values(self, row):
+        on_holidays_till = row.on_holidays_till and row.on_holidays_till.isoformat()
+        return [row.first_name, row.last_name, row.project, self._workhours_id(row.workhours), on_holidays_till, row.pk]
+
+    def _write_batch(self, rows):
+        self._skill_ids(rows)
+
+        ids = [row.pk for row in rows if row.pk is not None]
+        existing = set(Member.objects.filter(pk__in=ids).values_list('pk', flat=True))
+
+        to_update = [self._values(row) for row in rows if row.pk in existing]
+        to_create = [row for row in rows if row.pk not in existing]
+
+        if to_update:
+            self._update_members(MEMBER_FIELDS, to_update)
+            self.through.objects.filter(member_id__in=existing).delete()
+            self.updated += len(to_update)
+
+        with_ids = [self._member(row) for row in to_create if row.pk is not None]
+        without_ids = [row for row in to_create if row.pk is None]
+        Member.objects.bulk_create(with_ids)
+
+        if self._can_return_ids():
+            members = Member.objects.bulk_create([self._member(row) for row in without_ids])
+            for row, member in zip(without_ids, members):
+                row.pk = member.pk
+        else:
+            for row in without_ids:
+                member = self._member(row)
+                member.save(force_insert=True)
+                row.pk = member.pk
+        self.created += len(to_create)
+
+        self._write_skills([
+            (row.pk, self.skills[name])
+            for row in rows
+            for name in row.skills
+        ])
+        # Existing members may lose their manager, new ones start without one
+        self._managers.extend(
+            (row.pk, row.manager, row.line) for row in rows if row.manager is not None or row.pk in existing
+        )
+
+    @staticmethod
+    def _can_return_ids():
+        features = connection.features
+        return getattr(features, 'can_return_rows_from_bulk_insert',
+                       getattr(features, 'can_return_ids_from_bulk_insert', False))
+
+    def _write_skills(self, pairs):
+        if not pairs:
+            return
+        table = self.through._meta.db_table
+        member_column = self.through._meta.get_field('member').column
+        skill_column = self.through._meta.get_field('skill').column
+
+        with connection.cursor() as cursor:
+            if connection.vendor != 'postgresql':
+                cursor.executemany(f'INSERT INTO {table} ({member_column}, {skill_column}) VALUES (%s, %s)', pairs)
+                return
+
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(pairs)
+            buffer.seek(0)
+            cursor.copy_expert(f'COPY {table} ({member_column}, {skill_column}) FROM STDIN WITH (FORMAT csv)', buffer)
+
+    @staticmethod
+    def _update_members(fields, rows):
+        """
+        Faster than QuerySet.bulk_update, which builds a CASE expression per row:
+        COPY into a temporary table and one UPDATE ... FROM on PostgreSQL,
+        a single executemany elsewhere
+        :param fields: names of the Member fields to update
+        :param rows: lists of database values in the order of fields, followed by the pk
+        """
+        if not rows:
+            return
+        quote = connection.ops.quote_name
+        table = quote(Member._meta.db_table)
+        columns = [quote(Member._meta.get_field(name).column) for name in fields]
+
+        with connection.cursor() as cursor:
+            if connection.vendor != 'postgresql':
+                assignments = ', '.join(f'{column} = %s' for column in columns)
+                cursor.executemany(f'UPDATE {table} SET {assignments} WHERE id = %s', rows)
+                return
+
+            cursor.execute('DROP TABLE IF EXISTS member_import')
+            cursor.execute(
+                f'CREATE TEMPORARY TABLE member_import ON COMMIT DROP AS '
+                f'SELECT {", ".join(columns)}, id FROM {table} WITH NO DATA'
+            )
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(rows)
+            buffer.seek(0)
+            cursor.copy_expert(f'COPY member_import ({", ".join(columns)}, id) FROM STDIN WITH (FORMAT csv)', buffer)
+            assignments = ', '.join(f'{column} = source.{column}' for column in columns)
+            cursor.execute(f'UPDATE {table} SET {assignments} FROM member_import AS source WHERE {table}.id = source.id')
+
+    def _write_managers(self):
+        if not self._managers:
+            return
+
+        manager_ids = list({manager for _, manager, _ in self._managers if manager is not None})
+        existing = set()
+        for start in range(0, len(manager_ids), self.batch_size):
+            chunk = manager_ids[start:start + self.batch_size]
+            existing.update(Member.objects.filter(pk__in=chunk).values_list('pk', flat=True))
+
+        updates = []
+        for member, manager, line in self._managers:
+            if manager is None:
+                updates.append((None, member))
+            elif manager == member:
+                self.add_error(line, {'manager_id': ['A member can not be their own manager.']})
+            elif manager not in existing:
+                self.add_error(line, {'manager_id': [f'Invalid pk "{manager}" - object does not exist.']})
+            else:
+                updates.append((manager, member))
+        for start in range(0, len(updates), self.batch_size):
+            self._update_members(('manager_id', ), updates[start:start + self.batch_size])
+
+        self._break_cycles([member for manager, member in updates if manager is not None])
+
+    def _break_cycles(self, member_ids):
+        lines = {member: line for member, _, line in self._managers}
+        in_cycles = set()
+        for start in range(0, len(member_ids), 500):
+            in_cycles.update(members_in_cycles(member_ids[start:start + 500]))
+
+        if not in_cycles:
+            return
+        # Every member on a loop keeps no manager, the loop can't be cut in a meaningful place
+        for member in sorted(in_cycles):
+            self.add_error(lines[member], {'manager_id': ['The manager is one of the reports of the member.']})
+        self._update_members(('manager_id', ), [(None, member) for member in sorted(in_cycles)])
+
+    def _reset_sequence(self):
+        """
+        Inserting explicit ids doesn't move PostgreSQL sequences
+        """
+        statements = connection.ops.sequence_reset_sql(no_style(), [Member])
+        if not statements:
+            return
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+
+
+def import_members(lines, fmt, batch_size=2000, dry_run=False):
+    return MemberImporter(batch_size=batch_size, dry_run=dry_run).run(lines, fmt)
@@ -0,0 +1,65 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from members.generator import BATCH_SIZE, TIMEZONES, OrgGenerator, clear_org, dump_org, load_org
+
+
+class Command(BaseCommand):
+    help = 'Generates a deterministic synthetic org of members, skills, projects and work hours, ' \
+           'see members.generator'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--members', type=int, default=1000)
+        parser.add_argument('--skills', type=int, help='Scales with --members by default')
+        parser.add_argument('--projects', type=int, help='Scales with --members by default')
+        parser.add_argument('--skills-per-member', type=float, default=4)
+        parser.add_argument('--span', type=int, default=6, help='Mean number of direct reports')
+        parser.add_argument('--timezones', type=int, default=len(TIMEZONES),
+                            help=f'Number of timezones with shifts, up to {len(TIMEZONES)}')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--as-of', type=date.fromisoformat, help='Date holidays are relative to, YYYY-MM-DD')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--clear', action='store_true', help='Delete the current directory first')
+        parser.add_argument('--dump', help='Write the directory to this .jsonl.gz file afterwards')
+        parser.add_argument('--load', help='Load a --dump file instead of generating')
+
+    def handle(self, *args, **options):
+        if options['members'] < 1 and not options['load']:
+            raise CommandError('--members must be positive')
+
+        started = time.monotonic()
+        if options['clear']:
+            clear_org()
+
+        if options['load']:
+            counts = load_org(options['load'], options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(
+                f'Loaded {", ".join(f"{count} {label}" for label, count in counts.items())} '
+                f'in {time.monotonic() - started:.1f}s'
+            ))
+        else:
+            org = OrgGenerator(
+                options['members'],
+                skills=options['skills'],
+                projects=options['projects'],
+                skills_per_member=options['skills_per_member'],
+                span=options['span'],
+                timezones=TIMEZONES[:max(1, options['timezones'])],
+                seed=options['seed'],
+                as_of=options['as_of'],
+                batch_size=options['batch_size'],
+            ).generate()
+            self.stdout.write(self.style.SUCCESS(
+                f'Generated {len(org["member_ids"])} members with {org["skill_links"]} skills, '
+                f'{len(org["skills"])} skills, {len(org["project_ids"])} projects and '
+                f'{len(org["workhours_ids"])} work hours in {time.monotonic() - started:.1f}s'
+            ))
+
+        if options['dump']:
+            started = time.monotonic()
+            counts = dump_org(options['dump'])
+            self.stdout.write(self.style.SUCCESS(
+                f'Dumped {sum(counts.values())} rows to {options["dump"]} in {time.monotonic() - started:.1f}s'
+            ))
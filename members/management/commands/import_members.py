@@ -0,0 +1,50 @@
+import json
+import os
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from members.importer import FORMATS, NDJSON, import_members
+
+
+class Command(BaseCommand):
+    help = 'Upserts members, skills and work hours from a CSV or NDJSON file, see members.importer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to import, "-" reads stdin')
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--dry-run', action='store_true', help='Validate and roll everything back')
+        parser.add_argument('--report', help='Write the full JSON report to this file')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format']
+        if fmt is None:
+            extension = os.path.splitext(path)[1].lstrip('.').lower()
+            fmt = {'jsonl': NDJSON}.get(extension, extension)
+        if fmt not in FORMATS:
+            raise CommandError('Can not detect the format, use --format')
+
+        started = time.monotonic()
+        if path == '-':
+            report = import_members(sys.stdin, fmt, options['batch_size'], options['dry_run'])
+        else:
+            with open(path, encoding='utf-8-sig', newline='') as lines:
+                report = import_members(lines, fmt, options['batch_size'], options['dry_run'])
+        elapsed = time.monotonic() - started
+
+        if options['report']:
+            with open(options['report'], 'w') as output:
+                json.dump(report, output, indent=2)
+
+        for error in report['errors']:
+            self.stderr.write(f'line {error["line"]}: {json.dumps(error["errors"])}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{"Dry run: " if report["dry_run"] else ""}'
+            f'{report["created"]} created, {report["updated"]} updated, '
+            f'{report["skills_created"]} skills and {report["workhours_created"]} work hours created, '
+            f'{report["error_count"]} errors in {elapsed:.1f}s'
+        ))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from members.models import WorkHours, WorkInterval
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds precomputed UTC working intervals of all WorkHours, ' \
+           'run it periodically to move the DST horizon forward'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        total = 0
+
+        with transaction.atomic():
+            WorkInterval.objects.all().delete()
+
+            batch = []
+            for work_hours in WorkHours.objects.iterator(chunk_size=batch_size):
+                batch.extend(work_hours.build_intervals())
+                total += 1
+                if len(batch) >= batch_size:
+                    WorkInterval.objects.bulk_create(batch)
+                    batch = []
+            WorkInterval.objects.bulk_create(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt intervals of {total} work hours'))
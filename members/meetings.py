@@ -0,0 +1,160 @@
+"""
+Meeting slots: the windows during which every member of a set is working.
+
+The precomputed UTC WorkIntervals of each distinct schedule are laid out over
+the requested range as a bitmask of its minutes, a Python int, clipped to the
+offset period every interval is valid in, so DST changes within the range are
+respected. Intersecting the schedules of a whole team is then one AND per
+member, done word by word in C like the weekly windows of members.staffing,
+and the windows are the runs of set bits left. The days a member is on
+holidays are masked out of their schedule, so a leave within the range only
+takes its own days out of the windows.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+import pytz
+
+from members.models import Holiday, WorkHours, WorkInterval
+from members.schedules import MINUTES_PER_WEEK, as_timezone, minute_of_week
+
+MAX_RANGE = timedelta(days=62)
+
+
+def minutes_between(start, moment):
+    return int((moment - start).total_seconds() // 60)
+
+
+def schedule_mask(intervals, start, minutes):
+    """
+    :param intervals: (valid_from, valid_till, start_minute, end_minute) of one schedule
+    :param start: aware start of the range, on a whole minute
+    :param minutes: length of the range
+    :return: int with bit i set when the schedule works during minute i of the range
+    """
+    lead = minute_of_week(start)  # the range starts that far into its first week
+    weeks = (lead + minutes) // MINUTES_PER_WEEK + 1
+    mask = 0
+    for valid_from, valid_till, start_minute, end_minute in intervals:
+        low = max(0, minutes_between(start, valid_from))
+        high = min(minutes, minutes_between(start, valid_till))
+        for week in range(weeks):
+            first = max(low, week * MINUTES_PER_WEEK - lead + start_minute)
+            last = min(high, week * MINUTES_PER_WEEK - lead + end_minute)
+            if first < last:
+                mask |= ((1 << (last - first)) - 1) << first
+    return mask
+
+
+def runs(mask):
+    """
+    :return: (first, last) bit positions of the runs of set bits, half-open
+    """
+    position = 0
+    while mask:
+        skipped = (mask & -mask).bit_length() - 1
+        mask >>= skipped
+        length = (~mask & (mask + 1)).bit_length() - 1  # the lowest unset bit
+        yield position + skipped, position + skipped + length
+        mask >>= length
+        position += skipped + length
+
+
+def schedule_masks(workhours_ids, start, minutes):
+    """
+    :return: dict workhours id -> schedule_mask() of its intervals over the range
+    """
+    intervals = defaultdict(list)
+    rows = WorkInterval.objects.filter(
+        workhours_id__in=workhours_ids,
+        valid_from__lt=start + timedelta(minutes=minutes),
+        valid_till__gt=start,
+    ).values_list('workhours_id', 'valid_from', 'valid_till', 'start_minute', 'end_minute')
+    for workhours_id, *interval in rows:
+        intervals[workhours_id].append(interval)
+    return {workhours_id: schedule_mask(intervals[workhours_id], start, minutes) for workhours_id in workhours_ids}
+
+
+def days_mask(periods, tz, start, minutes):
+    """
+    :param periods: (first, last) local days, both included, first None for every day up to last
+    :return: int with bit i set when minute i of the range falls on one of the days
+    """
+    def minute_of(day):
+        return minutes_between(start, tz.localize(datetime.combine(day, time.min)))
+
+    # Local days are at most a day off the UTC ones, beyond that the bounds are clipped anyway
+    earliest, latest = start.date() - timedelta(days=1), (start + timedelta(minutes=minutes)).date() + timedelta(days=1)
+    mask = 0
+    for first, last in periods:
+        low = 0 if first is None else max(0, minute_of(max(first, earliest)))
+        high = min(minutes, minute_of(min(last, latest) + timedelta(days=1)))
+        if low < high:
+            mask |= ((1 << (high - low)) - 1) << low
+    return mask
+
+
+def holiday_masks(members, start, minutes):
+    """
+    Days off are the local days of the member's schedule
+    :param members: (pk, workhours_id, on_holidays_till) of members with a schedule
+    :return: dict pk -> mask of the minutes of the range the member is on holidays, members never off left out
+    """
+    periods = defaultdict(list)
+    for pk, workhours_id, on_holidays_till in members:
+        if on_holidays_till is not None:
+            periods[pk].append((None, on_holidays_till))
+
+    # Local days of the range are at most a day off its UTC ones
+    end = start + timedelta(minutes=minutes)
+    holidays = Holiday.objects.filter(member_id__in=[pk for pk, workhours_id, till in members]).overlapping(
+        start.date() - timedelta(days=1), end.date() + timedelta(days=1),
+    ).values_list('member_id', 'start', 'end')
+    for member_id, first, last in holidays:
+        periods[member_id].append((first, last))
+    if not periods:
+        return {}
+
+    workhours_of = {pk: workhours_id for pk, workhours_id, till in members}
+    timezones = dict(WorkHours.objects.filter(
+        pk__in={workhours_of[pk] for pk in periods}
+    ).values_list('pk', 'timezone'))
+    masks = {
+        pk: days_mask(days, as_timezone(timezones[workhours_of[pk]]), start, minutes) for pk, days in periods.items()
+    }
+    return {pk: mask for pk, mask in masks.items() if mask}
+
+
+def common_windows(members, start, end, min_minutes=1):
+    """
+    :param members: (pk, workhours_id, on_holidays_till) of the members that all have to be working
+    :param start: aware start of the range, rounded down to the minute
+    :param end: aware end of the range
+    :return: (attending, on_holidays, windows): the ids of the members the windows are common to,
+        of those left out as they're on holidays all of their working time in the range, and the
+        list of (start, end) of the windows lasting min_minutes or more, in UTC
+    """
+    start = start.astimezone(pytz.utc).replace(second=0, microsecond=0)
+    minutes = minutes_between(start, end)
+    if not members or minutes <= 0:
+        return [pk for pk, workhours_id, till in members], [], []
+
+    schedules = schedule_masks({workhours_id for pk, workhours_id, till in members}, start, minutes)
+    holidays = holiday_masks(members, start, minutes)
+
+    attending, on_holidays, mask = [], [], (1 << minutes) - 1
+    for pk, workhours_id, till in members:
+        working = schedules[workhours_id]
+        available = working & ~holidays.get(pk, 0)
+        if working and not available:
+            on_holidays.append(pk)
+        else:
+            attending.append(pk)
+            mask &= available
+
+    windows = [
+        (start + timedelta(minutes=first), start + timedelta(minutes=last))
+        for first, last in runs(mask)
+        if last - first >= min_minutes
+    ] if attending else []
+    return attending, on_holidays, windows
@@ -1,10 +1,56 @@
 from django.contrib.auth.base_user import BaseUserManager, AbstractBaseUser
 from django.contrib.auth.models import PermissionsMixin
-from django.db import models
-from django.utils.datetime_safe import datetime, date
+from django.db import connections, models, transaction
+from django.db.models import BooleanField, Case, F, Field, Func, Q, Value, When
+from django.utils import timezone
 
 from timezone_field import TimeZoneField
 
+from members.schedules import daily_shifts, minute_of_week, working_intervals
+from SimpleOffice.cache import invalidate
+
+
+class MemberQuerySet(models.QuerySet):
+    """
+    Availability is defined here once: a member is on holidays on a day
+    not after on_holidays_till or within one of their Holiday periods
+    """
+
+    @staticmethod
+    def off_between_q(start, end):
+        # the periods are a subquery evaluated once, not a check per member
+        return Q(on_holidays_till__gte=start) | Q(pk__in=Holiday.objects.overlapping(start, end).values('member_id'))
+
+    @classmethod
+    def on_holidays_q(cls, as_of=None):
+        as_of = as_of or timezone.localdate()
+        return cls.off_between_q(as_of, as_of)
+
+    def on_holidays(self, as_of=None):
+        return self.filter(self.on_holidays_q(as_of))
+
+    def available(self, as_of=None):
+        return self.exclude(self.on_holidays_q(as_of))
+
+    def off_between(self, start, end):
+        """
+        Members on holidays on at least one day from start to end, both included
+        """
+        return self.filter(self.off_between_q(start, end))
+
+    def available_between(self, start, end):
+        return self.exclude(self.off_between_q(start, end))
+
+    def with_availability(self, as_of=None):
+        """
+        Annotates `available` so is_available doesn't need a query per member
+        """
+        return self.annotate(available=Case(
+            When(self.on_holidays_q(as_of), then=Value(False)),
+            default=Value(True),
+            output_field=BooleanField(),
+        ))
+
 
 class Member(models.Model):
 
@@ -40,21 +86,242 @@ class Member(models.Model):
         blank=True, null=True
     )
 
+    objects = MemberQuerySet.as_manager()
+
+    class Meta:
+        indexes = (
+            # Partial index: holiday lookups only ever range-scan members that have a date
+            models.Index(
+                fields=('on_holidays_till', ),
+                name='member_on_holidays_till_idx',
+                condition=Q(on_holidays_till__isnull=False),
+            ),
+            # Keyset pages of a project's members
+            models.Index(fields=('project', 'id'), name='member_project_id_idx'),
+        )
+
     @property
     def is_available(self):
-        if not self.on_holidays_till or self.on_holidays_till < date.today():
-            return True
-        return False
+        """
+        Uses the `available` annotation when the member was loaded with it
+        (MemberQuerySet.with_availability), otherwise takes one query
+        """
+        if hasattr(self, 'available'):
+            return self.available
+        return Member.objects.with_availability().filter(pk=self.pk).values_list('available', flat=True).get()
+
+    def set_holidays(self, periods):
+        """
+        Replaces the holiday periods
+        :param periods: iterable of (start, end), both days included
+        """
+        with transaction.atomic():
+            self.holidays.all().delete()
+            Holiday.objects.bulk_create(Holiday(member=self, start=start, end=end) for start, end in periods)
+        invalidate('members')  # bulk_create sends no post_save
 
     def __str__(self):
         return f'{self.first_name} {self.last_name}'
 
 
+class DateRange(Func):
+    """
+    PostgreSQL daterange with both days included
+    """
+    function = 'daterange'
+    template = "%(function)s(%(expressions)s, '[]')"
+    output_field = Field()
+
+
+class RangeOverlaps(Func):
+    arg_joiner = ' && '
+    template = '(%(expressions)s)'
+    output_field = BooleanField()
+
+
+class HolidayQuerySet(models.QuerySet):
+    def overlapping(self, start, end):
+        """
+        Periods sharing at least a day with start-end, both included
+        """
+        if connections[self.db].vendor == 'postgresql':
+            # Planned against the GiST index of HOLIDAY_SETUP, a range
+            # lookup can't be done with a B-tree on both ends
+            return self.annotate(
+                overlaps=RangeOverlaps(DateRange(F('start'), F('end')), DateRange(Value(start), Value(end))),
+            ).filter(overlaps=True)
+        return self.filter(start__lte=end, end__gte=start)
+
+
+class Holiday(models.Model):
+    """
+    A leave of a member from start to end, both days included
+    """
+    member = models.ForeignKey(
+        'Member',
+        on_delete=models.CASCADE,
+        related_name='holidays',
+    )
+
+    start = models.DateField()
+    end = models.DateField()
+
+    objects = HolidayQuerySet.as_manager()
+
+    class Meta:
+        ordering = ('start', )
+        indexes = (
+            # Other backends: periods ending on or after a day are the recent and future ones
+            models.Index(fields=('end', 'start'), name='holiday_end_start_idx'),
+        )
+
+    def __str__(self):
+        return f'{self.member_id}: {self.start} - {self.end}'
+
+
+HOLIDAY_SETUP = (
+    f'CREATE INDEX IF NOT EXISTS holiday_period_gist_idx ON {Holiday._meta.db_table} '
+    f'USING gist (daterange(start, "end", \'[]\'))',
+)
+
+
+def create_holiday_indexes(using, **kwargs):
+    """
+    post_migrate receiver, the project has no migrations to hold this DDL
+    """
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        for statement in HOLIDAY_SETUP:
+            cursor.execute(statement)
+
+
 class WorkHours(models.Model):
     start = models.TimeField()
     end = models.TimeField()
 
     timezone = TimeZoneField()  # works with pytz
 
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self.rebuild_intervals()
+
+    def shifts(self):
+        """
+        Local (weekday, start, end) shifts of the schedule: the weekly shifts
+        when it has any, start-end on every day otherwise
+        """
+        weekly = [(shift.weekday, shift.start, shift.end) for shift in self.weekly_shifts.all()]
+        return weekly or daily_shifts(self.start, self.end)
+
+    def set_shifts(self, shifts):
+        """
+        Replaces the weekly shifts, an empty list brings back start-end on every day
+        :param shifts: iterable of (weekday, start, end), end <= start runs overnight
+        """
+        with transaction.atomic():
+            self.weekly_shifts.all().delete()
+            Shift.objects.bulk_create(
+                Shift(workhours=self, weekday=weekday, start=start, end=end) for weekday, start, end in shifts
+            )
+            self.save()  # rebuilds the intervals
+
+    def build_intervals(self, now=None):
+        return [
+            WorkInterval(
+                workhours_id=self.pk,
+                valid_from=valid_from,
+                valid_till=valid_till,
+                start_minute=start_minute,
+                end_minute=end_minute,
+            )
+            for valid_from, valid_till, start_minute, end_minute in working_intervals(
+                self.shifts(), self.timezone, now
+            )
+        ]
+
+    def rebuild_intervals(self, now=None):
+        WorkInterval.objects.filter(workhours_id=self.pk).delete()
+        WorkInterval.objects.bulk_create(self.build_intervals(now))
+
     def __str__(self):
         return f'Start: {self.start}, End: {self.end}, Timezone: {self.timezone}'
+
+
+class Shift(models.Model):
+    """
+    A local shift of a weekly WorkHours schedule, e.g. Monday 22:00-06:00
+    """
+    WEEKDAYS = tuple(enumerate(('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')))
+
+    workhours = models.ForeignKey(
+        'WorkHours',
+        on_delete=models.CASCADE,
+        related_name='weekly_shifts',
+    )
+
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAYS)
+    start = models.TimeField()
+    end = models.TimeField()  # end <= start runs overnight into the next day
+
+    class Meta:
+        ordering = ('weekday', 'start')
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self.workhours.rebuild_intervals()
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            self.workhours.rebuild_intervals()
+        return result
+
+    def __str__(self):
+        return f'{self.get_weekday_display()} {self.start}-{self.end}'
+
+
+class WorkIntervalQuerySet(models.QuerySet):
+    def covering(self, moment):
+        """
+        Intervals during which someone is working at an aware moment
+        """
+        minute = minute_of_week(moment)
+        return self.filter(
+            start_minute__lte=minute,
+            end_minute__gt=minute,
+            valid_from__lte=moment,
+            valid_till__gt=moment,
+        )
+
+
+class WorkInterval(models.Model):
+    """
+    Precomputed UTC minute-of-week interval of a WorkHours schedule.
+    Intervals are valid while the timezone keeps the same UTC offset,
+    they are rebuilt every time WorkHours is saved
+    """
+    workhours = models.ForeignKey(
+        'WorkHours',
+        on_delete=models.CASCADE,
+        related_name='intervals',
+    )
+
+    valid_from = models.DateTimeField()
+    valid_till = models.DateTimeField()
+
+    start_minute = models.PositiveSmallIntegerField()  # minutes since Monday 00:00 UTC
+    end_minute = models.PositiveSmallIntegerField()
+
+    objects = WorkIntervalQuerySet.as_manager()
+
+    class Meta:
+        indexes = (
+            models.Index(fields=('start_minute', 'end_minute', 'workhours'), name='workinterval_minutes_idx'),
+        )
+
+    def __str__(self):
+        return f'{self.workhours_id}: {self.start_minute}-{self.end_minute}'
@@ -0,0 +1,156 @@
+"""
+Conversion of local working hours into UTC minute-of-week intervals.
+
+A minute of the week is counted from Monday 00:00 UTC, so every moment maps to
+an integer in [0, MINUTES_PER_WEEK) and "is working at" becomes a range lookup.
+"""
+from datetime import datetime, timedelta
+
+import pytz
+from django.utils.dateparse import parse_time
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+# Bounds used for the first and the last offset period of a timezone
+VALID_SINCE = datetime(1970, 1, 1, tzinfo=pytz.utc)
+VALID_TILL = datetime(9999, 12, 31, tzinfo=pytz.utc)
+
+# How far around "now" DST transitions are resolved
+HORIZON_PAST = timedelta(days=366)
+HORIZON_FUTURE = timedelta(days=3 * 366)
+
+
+def as_time(value):
+    if isinstance(value, str):
+        return parse_time(value)
+    return value
+
+
+def as_timezone(value):
+    if isinstance(value, str):
+        return pytz.timezone(value)
+    return value
+
+
+def minute_of_day(value, round_up=False):
+    """
+    Minute of the day for a time, partial minutes are rounded up for shift ends
+    so that 23:59:59 closes the day
+    """
+    minutes = value.hour * 60 + value.minute
+    if round_up and (value.second or value.microsecond):
+        minutes += 1
+    return minutes
+
+
+def minute_of_week(moment):
+    moment = moment.astimezone(pytz.utc)
+    return moment.weekday() * MINUTES_PER_DAY + moment.hour * 60 + moment.minute
+
+
+def utc_offset(tz, moment):
+    """
+    UTC offset of a timezone at an aware moment, in minutes
+    """
+    return int(moment.astimezone(tz).utcoffset().total_seconds() // 60)
+
+
+def _transition(tz, low, high):
+    """
+    Bisects the moment the offset changes between low and high to the minute
+    """
+    low_offset = utc_offset(tz, low)
+    while high - low > timedelta(minutes=1):
+        middle = low + (high - low) / 2
+        if utc_offset(tz, middle) == low_offset:
+            low = middle
+        else:
+            high = middle
+    return high.replace(second=0, microsecond=0)
+
+
+def offset_periods(tz, now=None):
+    """
+    Splits time into periods with a constant UTC offset for a timezone.
+    Transitions are resolved within the horizon around now, the first and the
+    last periods are extended to VALID_SINCE and VALID_TILL
+    :return: list of (valid_from, valid_till, offset in minutes)
+    """
+    tz = as_timezone(tz)
+    now = now or datetime.now(pytz.utc)
+    moment = now - HORIZON_PAST
+    end = now + HORIZON_FUTURE
+
+    periods = []
+    valid_from, offset = VALID_SINCE, utc_offset(tz, moment)
+    step = timedelta(days=1)
+    while moment < end:
+        following = moment + step
+        if utc_offset(tz, following) != offset:
+            changed_at = _transition(tz, moment, following)
+            periods.append((valid_from, changed_at, offset))
+            valid_from, offset = changed_at, utc_offset(tz, changed_at)
+        moment = following
+    periods.append((valid_from, VALID_TILL, offset))
+    return periods
+
+
+def merge_intervals(intervals):
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [tuple(interval) for interval in merged]
+
+
+def weekly_utc_intervals(shifts, offset):
+    """
+    UTC minute-of-week intervals for local shifts under a fixed UTC offset
+    :param shifts: iterable of (weekday, start time, end time) in local time,
+        end <= start means the shift runs overnight
+    :param offset: UTC offset in minutes
+    :return: merged list of half-open (start_minute, end_minute)
+    """
+    intervals = []
+    for weekday, start, end in shifts:
+        start_minute = minute_of_day(start)
+        end_minute = minute_of_day(end, round_up=True)
+        if end_minute <= start_minute:
+            end_minute += MINUTES_PER_DAY
+
+        start_minute += weekday * MINUTES_PER_DAY - offset
+        end_minute += weekday * MINUTES_PER_DAY - offset
+
+        # Normalise into the week, splitting the intervals that wrap around it
+        shift = (start_minute // MINUTES_PER_WEEK) * MINUTES_PER_WEEK
+        start_minute, end_minute = start_minute - shift, end_minute - shift
+        if end_minute > MINUTES_PER_WEEK:
+            intervals.append((start_minute, MINUTES_PER_WEEK))
+            intervals.append((0, end_minute - MINUTES_PER_WEEK))
+        else:
+            intervals.append((start_minute, end_minute))
+    return merge_intervals(intervals)
+
+
+def daily_shifts(start, end):
+    """
+    The same local shift on every day of the week
+    """
+    start, end = as_time(start), as_time(end)
+    return [(weekday, start, end) for weekday in range(7)]
+
+
+def working_intervals(shifts, tz, now=None):
+    """
+    :return: list of (valid_from, valid_till, start_minute, end_minute)
+    """
+    shifts = list(shifts)
+    return [
+        (valid_from, valid_till, start_minute, end_minute)
+        for valid_from, valid_till, offset in offset_periods(tz, now)
+        for start_minute, end_minute in weekly_utc_intervals(shifts, offset)
+    ]
+
@@ -0,0 +1,330 @@
+"""
+Fuzzy search of members by their names, skill names and project name.
+
+Every word of the query has to match, as a prefix of a word or through
+trigram similarity (for typos), and members are ranked by the sum of their
+best match per word, weighted by where it matched (FIELD_WEIGHTS), among
+the members the other filters of the request leave.
+
+PostgreSQL answers it with pg_trgm and GIN trigram indexes created on
+post_migrate. Other backends use SearchIndex, an in-process index built
+over the distinct words of the directory, rebuilt whenever members, skills
+or projects change.
+"""
+import heapq
+import re
+import threading
+import unicodedata
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import SearchFilter
+
+from members.models import Member
+from projects.models import Project
+from SimpleOffice.cache import get_state_versions
+from SimpleOffice.db import primary
+from SimpleOffice.pagination import RankedPagination
+from skills.models import Skill
+
+DEPENDENCIES = ('members', 'skills', 'projects')
+
+NAME, PROJECT, SKILL = 'name', 'project', 'skill'
+FIELD_WEIGHTS = {NAME: 1.0, PROJECT: 0.6, SKILL: 0.5}
+
+SIMILARITY_THRESHOLD = 0.3  # the pg_trgm default
+MAX_TERMS = 64  # vocabulary words considered per query word
+MAX_RESULTS = 100
+
+_WORD = re.compile(r'\w+')
+
+
+def normalize(text):
+    text = unicodedata.normalize('NFKD', text or '')
+    return ''.join(char for char in text if not unicodedata.combining(char)).lower()
+
+
+def words_of(text):
+    return _WORD.findall(normalize(text))
+
+
+def trigrams(word):
+    """
+    Trigrams of a word padded the way pg_trgm does it
+    """
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def term_score(word, term, similarity):
+    if term == word:
+        return 1.0
+    if term.startswith(word):
+        return max(similarity, 0.5 + 0.4 * len(word) / len(term))
+    return similarity
+
+
+class SearchIndex:
+    """
+    Vocabulary of the distinct words of names, skills and projects with a
+    trigram index over it, and postings from every word to member positions
+    """
+
+    def __init__(self, versions=None):
+        self.versions = versions
+        self.ids = array('q')
+        postings = {field: defaultdict(set) for field in FIELD_WEIGHTS}
+
+        rows = Member.objects.order_by('pk').values_list('pk', 'first_name', 'last_name', 'project_id')
+        position_of, members_of_project = {}, defaultdict(list)
+        for pk, first_name, last_name, project_id in rows.iterator(chunk_size=5000):
+            position = position_of[pk] = len(self.ids)
+            self.ids.append(pk)
+            for word in words_of(f'{first_name} {last_name}'):
+                postings[NAME][word].add(position)
+            if project_id is not None:
+                members_of_project[project_id].append(position)
+
+        for project_id, name in Project.objects.values_list('pk', 'name'):
+            for word in words_of(name):
+                postings[PROJECT][word].update(members_of_project.get(project_id, ()))
+
+        skill_words = {pk: words_of(name) for pk, name in Skill.objects.values_list('pk', 'name')}
+        links = Member.skills.through.objects.values_list('member_id', 'skill_id')
+        for member_id, skill_id in links.iterator(chunk_size=5000):
+            for word in skill_words[skill_id]:
+                postings[SKILL][word].add(position_of[member_id])
+
+        self.postings = {
+            field: {word: array('q', sorted(positions)) for word, positions in words.items()}
+            for field, words in postings.items()
+        }
+        self.vocabulary = sorted(set().union(*self.postings.values()))
+        self.by_trigram = defaultdict(list)
+        for term_id, term in enumerate(self.vocabulary):
+            for trigram in trigrams(term):
+                self.by_trigram[trigram].append(term_id)
+
+    def terms(self, word):
+        """
+        :return: list of (score, term) of the vocabulary words matching a query word
+        """
+        scores = {}
+        start = bisect_left(self.vocabulary, word)
+        for term in self.vocabulary[start:start + MAX_TERMS]:
+            if not term.startswith(word):
+                break
+            scores[term] = 0.0
+
+        if len(word) >= 3:
+            word_trigrams = trigrams(word)
+            shared = defaultdict(int)
+            for trigram in word_trigrams:
+                for term_id in self.by_trigram.get(trigram, ()):
+                    shared[term_id] += 1
+            for term_id, count in shared.items():
+                term = self.vocabulary[term_id]
+                similarity = count / (len(word_trigrams) + len(trigrams(term)) - count)
+                if similarity >= SIMILARITY_THRESHOLD:
+                    scores[term] = similarity
+
+        matched = ((term_score(word, term, similarity), term) for term, similarity in scores.items())
+        return heapq.nlargest(MAX_TERMS, matched)
+
+    def search(self, query, limit=MAX_RESULTS, within=None):
+        """
+        :param within: set of member ids to rank among, every member when None
+        :return: ids of the best matching members, best first
+        """
+        words = list(dict.fromkeys(words_of(query)))
+        if not words:
+            return []
+
+        totals = None
+        for word in words:
+            best = {}
+            for score, term in self.terms(word):
+                for field, weight in FIELD_WEIGHTS.items():
+                    weighted = score * weight
+                    for position in self.postings[field].get(term, ()):
+                        if best.get(position, 0) < weighted:
+                            best[position] = weighted
+            if totals is None:
+                totals = best if within is None else {
+                    position: total for position, total in best.items() if self.ids[position] in within
+                }
+            else:
+                totals = {position: total + best[position] for position, total in totals.items() if position in best}
+            if not totals:
+                return []
+
+        ranked = heapq.nsmallest(limit, totals.items(), key=lambda item: (-item[1], item[0]))
+        return [self.ids[position] for position, _ in ranked]
+
+
+_lock = threading.Lock()
+_index = None
+
+
+def get_search_index():
+    global _index
+    versions = get_state_versions(DEPENDENCIES)
+    index = _index
+    if index is not None and index.versions == versions:
+        return index
+    with _lock:
+        if _index is None or _index.versions != versions:
+            with primary():  # a lagging replica would go stale under the new versions
+                _index = SearchIndex(versions)
+        return _index
+
+
+def _escape_like(word):
+    return word.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _named_params(sql, params, prefix):
+    """
+    Compiled SQL with %s placeholders rewritten as %(<prefix><n>)s, to be
+    embedded in a query with named parameters
+    """
+    numbers = iter(range(len(params)))
+
+    def name(match):
+        return match.group() if match.group() == '%%' else f'%({prefix}{next(numbers)})s'
+
+    return re.sub(r'%[%s]', name, sql), {f'{prefix}{number}': value for number, value in enumerate(params)}
+
+
+def search_postgresql(query, limit=MAX_RESULTS, within=None):
+    """
+    The same matching and ranking in SQL: ILIKE prefix matches and the
+    word similarity operator <% are both served by the GIN trigram indexes
+
+    :param within: queryset of the members to rank among, every member when None
+    """
+    words = list(dict.fromkeys(words_of(query)))
+    if not words:
+        return []
+
+    member = Member._meta.db_table
+    through = Member.skills.through._meta.db_table
+    skill = Skill._meta.db_table
+    project = Project._meta.db_table
+
+    def score(column, number):
+        return (
+            f'GREATEST(word_similarity(%(word{number})s, {column}), '
+            f'CASE WHEN {column} ILIKE %(prefix{number})s THEN 0.9 ELSE 0 END)'
+        )
+
+    def matches(column, number):
+        return f'({column} ILIKE %(prefix{number})s OR %(word{number})s <%% {column})'
+
+    hits, params = [], {'words': len(words), 'limit': limit}
+    for number, word in enumerate(words):
+        params[f'word{number}'] = word
+        params[f'prefix{number}'] = _escape_like(word) + '%'
+        hits += [
+            f'SELECT id, {number}, {FIELD_WEIGHTS[NAME]} * {score("unaccent_lower(first_name)", number)} '
+            f'FROM {member} WHERE {matches("unaccent_lower(first_name)", number)}',
+            f'SELECT id, {number}, {FIELD_WEIGHTS[NAME]} * {score("unaccent_lower(last_name)", number)} '
+            f'FROM {member} WHERE {matches("unaccent_lower(last_name)", number)}',
+            f'SELECT m.id, {number}, {FIELD_WEIGHTS[PROJECT]} * {score("unaccent_lower(p.name)", number)} '
+            f'FROM {project} p JOIN {member} m ON m.project_id = p.id '
+            f'WHERE {matches("unaccent_lower(p.name)", number)}',
+            f'SELECT ms.member_id, {number}, {FIELD_WEIGHTS[SKILL]} * {score("unaccent_lower(s.name)", number)} '
+            f'FROM {skill} s JOIN {through} ms ON ms.skill_id = s.id '
+            f'WHERE {matches("unaccent_lower(s.name)", number)}',
+        ]
+
+    where = ''
+    if within is not None:
+        subquery, subquery_params = within.order_by().values('pk').query.sql_with_params()
+        subquery, subquery_params = _named_params(subquery, subquery_params, 'within')
+        where = f'WHERE member_id IN ({subquery}) '
+        params.update(subquery_params)
+
+    sql = (
+        f'SELECT member_id FROM ('
+        f'SELECT member_id, word, MAX(score) AS score FROM ({" UNION ALL ".join(hits)}) hits(member_id, word, score) '
+        f'{where}GROUP BY member_id, word'
+        f') best GROUP BY member_id HAVING COUNT(*) = %(words)s '
+        f'ORDER BY SUM(score) DESC, member_id LIMIT %(limit)s'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_members(query, limit=MAX_RESULTS, queryset=None):
+    """
+    :param queryset: members to rank among, e.g. those left by the other filters
+    """
+    if queryset is not None and not queryset.query.where:
+        queryset = None  # all of them, no need to restrict the candidates
+    if connection.vendor == 'postgresql':
+        return search_postgresql(query, limit, queryset)
+    within = None if queryset is None else set(queryset.order_by().values_list('pk', flat=True))
+    return get_search_index().search(query, limit, within)
+
+
+# Expression indexes the SQL above is planned against; unaccent() isn't
+# immutable, hence the wrapper function
+POSTGRESQL_SETUP = (
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE EXTENSION IF NOT EXISTS unaccent',
+    "CREATE OR REPLACE FUNCTION unaccent_lower(text) RETURNS text AS "
+    "$$ SELECT lower(public.unaccent('public.unaccent', $1)) $$ LANGUAGE sql IMMUTABLE PARALLEL SAFE",
+    f'CREATE INDEX IF NOT EXISTS member_first_name_trgm_idx ON {Member._meta.db_table} '
+    f'USING gin (unaccent_lower(first_name) gin_trgm_ops)',
+    f'CREATE INDEX IF NOT EXISTS member_last_name_trgm_idx ON {Member._meta.db_table} '
+    f'USING gin (unaccent_lower(last_name) gin_trgm_ops)',
+    f'CREATE INDEX IF NOT EXISTS skill_name_trgm_idx ON {Skill._meta.db_table} '
+    f'USING gin (unaccent_lower(name) gin_trgm_ops)',
+    f'CREATE INDEX IF NOT EXISTS project_name_trgm_idx ON {Project._meta.db_table} '
+    f'USING gin (unaccent_lower(name) gin_trgm_ops)',
+)
+
+
+def create_search_indexes(using, **kwargs):
+    """
+    post_migrate receiver, the project has no migrations to hold this DDL
+    """
+    from django.db import connections
+
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        for statement in POSTGRESQL_SETUP:
+            cursor.execute(statement)
+
+
+class MemberSearchFilter(SearchFilter):
+    """
+    ?search= over names, skills and project, ranked by relevance.
+    Only the best matches are returned, see RankedPagination
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+
+        paginator = getattr(view, 'paginator', None)
+        limit = paginator.get_page_size(request) if isinstance(paginator, RankedPagination) else MAX_RESULTS
+        # Ranked among the members left by the other filters, the best of all could all be filtered out
+        ids = search_members(query, limit, queryset)
+        if not ids:
+            return queryset.none()
+
+        # A raw CASE compiles in no time compared to a Case() with a When() per id
+        rank = RawSQL(
+            f'CASE {queryset.model._meta.db_table}.id {" ".join(["WHEN %s THEN %s"] * len(ids))} END',
+            [value for number, pk in enumerate(ids) for value in (pk, number)]
+        )
+        return queryset.filter(pk__in=ids).order_by(rank.asc())
@@ -1,9 +1,15 @@
-from django.utils import six
+from datetime import timedelta
+
+import pytz
+from django.utils import six, timezone
 from rest_framework import serializers
 
-from members.models import WorkHours, Member
+from members.hierarchy import creates_cycle
+from members.meetings import MAX_RANGE
+from members.models import Holiday, Shift, WorkHours, Member
 
 from skills.serializers import SkillSerializer
+from projects.models import Project
 from projects.serializers import ProjectSerializer
 
 
@@ -18,6 +24,7 @@ class WorkHoursSerializer(serializers.ModelSerializer):
             'end',
             'timezone',
         )
+        lean_fields = {'timezone': ('timezone', six.text_type)}
 
     def get_timezone(self, obj):
         """
@@ -26,6 +33,30 @@ class WorkHoursSerializer(serializers.ModelSerializer):
         return six.text_type(obj.timezone)
 
 
+class ShiftSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Shift
+        fields = (
+            'weekday',
+            'start',
+            'end',
+        )
+
+
+class HolidaySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Holiday
+        fields = (
+            'start',
+            'end',
+        )
+
+    def validate(self, attrs):
+        if attrs['end'] < attrs['start']:
+            raise serializers.ValidationError({'end': ['Must not be before start']})
+        return attrs
+
+
 class MemberSerializer(serializers.ModelSerializer):
     # read_only = True is set to be able to create models via POST requests
     # because django doesn't support nested creation
@@ -44,4 +75,73 @@ class MemberSerializer(serializers.ModelSerializer):
             'manager_id',
             'workhours',
             'on_holidays_till',
-        )
\ No newline at end of file
+        )
+
+    def validate_manager_id(self, value):
+        if self.instance is not None and value is not None and creates_cycle(self.instance.pk, value.pk):
+            raise serializers.ValidationError("The manager can't be the member or one of their reports.")
+        return value
+
+
+class BulkAssignToProjectSerializer(serializers.Serializer):
+    """
+    Either a list of member ids or MembersFilter params, e.g. {"skills": "js", "project": 1}
+    """
+    project = serializers.PrimaryKeyRelatedField(queryset=Project.objects.all())
+    members = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    filter = serializers.DictField(required=False)
+
+    def validate(self, attrs):
+        if ('members' in attrs) == ('filter' in attrs):
+            raise serializers.ValidationError("Exactly one of 'members' and 'filter' is required")
+        return attrs
+
+
+class StaffingSerializer(serializers.Serializer):
+    """
+    Required skills with an optional headcount per skill, e.g.
+    {"skills": ["python", "js"], "headcount": {"python": 2}, "overlap_hours": 4}
+    """
+    skills = serializers.ListField(child=serializers.CharField(), allow_empty=False)
+    headcount = serializers.DictField(child=serializers.IntegerField(min_value=1), required=False, default=dict)
+    overlap_hours = serializers.FloatField(min_value=0, max_value=24, required=False, default=0)
+    exclude_assigned = serializers.BooleanField(required=False, default=True)
+    as_of = serializers.DateField(required=False)
+    teams = serializers.IntegerField(min_value=1, max_value=10, required=False, default=3)
+
+    def validate(self, attrs):
+        unknown = set(attrs['headcount']) - set(attrs['skills'])
+        if unknown:
+            raise serializers.ValidationError({'headcount': [f'Not among the required skills: {", ".join(sorted(unknown))}']})
+        attrs['requirements'] = {name: attrs['headcount'].get(name, 1) for name in attrs['skills']}
+        return attrs
+
+
+class MeetingSlotsSerializer(serializers.Serializer):
+    """
+    Either a list of member ids or a project, and the range to search, e.g.
+    {"project": 1, "start": "2024-01-08T00:00:00Z", "end": "2024-01-13T00:00:00Z", "duration_minutes": 60},
+    the week from now by default
+    """
+    members = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    project = serializers.PrimaryKeyRelatedField(queryset=Project.objects.all(), required=False)
+    start = serializers.DateTimeField(required=False)
+    end = serializers.DateTimeField(required=False)
+    duration_minutes = serializers.IntegerField(min_value=1, max_value=24 * 60, required=False, default=30)
+
+    def validate(self, attrs):
+        if ('members' in attrs) == ('project' in attrs):
+            raise serializers.ValidationError("Exactly one of 'members' and 'project' is required")
+        attrs.setdefault('start', timezone.now())
+        attrs.setdefault('end', attrs['start'] + timedelta(days=7))
+        if attrs['end'] <= attrs['start']:
+            raise serializers.ValidationError({'end': ['Must be after start']})
+        if attrs['end'] - attrs['start'] > MAX_RANGE:
+            raise serializers.ValidationError({'end': [f'At most {MAX_RANGE.days} days after start']})
+        return attrs
+
+
+class MeetingWindowSerializer(serializers.Serializer):
+    start = serializers.DateTimeField(default_timezone=pytz.utc)
+    end = serializers.DateTimeField(default_timezone=pytz.utc)
+    minutes = serializers.IntegerField()
@@ -0,0 +1,99 @@
+"""
+In-process snapshot of members, their skills and the attributes staffing
+needs to enumerate candidate teams without a query per candidate.
+
+Members get dense positions in the order of their ids and every skill name
+maps to the sorted positions of its holders. The snapshot is rebuilt lazily,
+on the next use after a change of the 'members' or 'skills' namespaces by
+this process or, through the shared versions, by any other one (see
+SimpleOffice.cache). Member filtering doesn't use it, MembersFilter matches
+skills in SQL.
+"""
+import threading
+from array import array
+from collections import defaultdict
+
+from members.models import Holiday, Member
+from skills.models import Skill
+from SimpleOffice.cache import get_state_versions
+from SimpleOffice.db import primary
+
+DEPENDENCIES = ('members', 'skills')
+
+
+class SkillIndex:
+    """
+    Immutable snapshot of members, their skills and the attributes staffing needs.
+    Dates are kept as ordinals and missing foreign keys as 0
+    """
+
+    def __init__(self, versions=None):
+        self.versions = versions
+
+        rows = Member.objects.order_by('pk').values_list('pk', 'project_id', 'workhours_id', 'on_holidays_till')
+        self.ids = array('q')
+        self.projects = array('q')
+        self.workhours = array('q')
+        self.holidays = array('q')
+        for pk, project_id, workhours_id, on_holidays_till in rows.iterator(chunk_size=5000):
+            self.ids.append(pk)
+            self.projects.append(project_id or 0)
+            self.workhours.append(workhours_id or 0)
+            self.holidays.append(on_holidays_till.toordinal() if on_holidays_till else 0)
+        self.position = {pk: position for position, pk in enumerate(self.ids)}
+
+        self.periods = defaultdict(list)  # position -> (start, end) of its holidays
+        for member_id, start, end in Holiday.objects.values_list('member_id', 'start', 'end').iterator(chunk_size=5000):
+            position = self.position.get(member_id)
+            if position is not None:
+                self.periods[position].append((start.toordinal(), end.toordinal()))
+
+        skill_names = dict(Skill.objects.values_list('pk', 'name'))
+        positions = defaultdict(list)
+        links = Member.skills.through.objects.values_list('member_id', 'skill_id')
+        for member_id, skill_id in links.iterator(chunk_size=5000):
+            position = self.position.get(member_id)
+            if position is not None:
+                positions[skill_names[skill_id]].append(position)
+
+        # Several skills may share a name, they are one skill for matching
+        self.positions = {name: sorted(set(members)) for name, members in positions.items()}
+        self.names = set(skill_names.values())
+        self._sets = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def on_holidays(self, position, as_of):
+        """
+        Mirrors MemberQuerySet.on_holidays_q for an ordinal
+        """
+        return self.holidays[position] >= as_of or any(
+            start <= as_of <= end for start, end in self.periods.get(position, ())
+        )
+
+    def positions_set(self, name):
+        members = self._sets.get(name)
+        if members is None:
+            members = self._sets[name] = frozenset(self.positions.get(name, ()))
+        return members
+
+
+_lock = threading.Lock()
+_index = None
+
+
+def get_skill_index():
+    """
+    The current index of this process, rebuilt after any member or skill change
+    """
+    global _index
+    versions = get_state_versions(DEPENDENCIES)
+    index = _index
+    if index is not None and index.versions == versions:
+        return index
+    with _lock:
+        if _index is None or _index.versions != versions:
+            with primary():  # a lagging replica would go stale under the new versions
+                _index = SkillIndex(versions)
+        return _index
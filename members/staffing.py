@@ -0,0 +1,176 @@
+"""
+Team composition: pick few available members who together cover the required
+skills, a weighted set cover solved greedily over the skill index.
+
+Every step takes the member covering most of the still missing skill slots;
+the search is restarted from the best holders of the rarest skill to produce
+several alternative teams. Working hours are compared as bitmasks of the
+minutes of the coming week laid out from the UTC WorkIntervals of their
+schedules (see members.meetings), weekly shifts and DST changes included, so
+the time a whole team works simultaneously is the popcount of the AND of its
+members' masks.
+"""
+from collections import defaultdict
+from datetime import datetime
+
+import pytz
+from django.utils import timezone
+
+from members.meetings import schedule_masks
+from members.schedules import MINUTES_PER_WEEK
+from members.skill_index import get_skill_index
+
+DAYS_PER_WEEK = 7
+FULL_WEEK = (1 << MINUTES_PER_WEEK) - 1
+MAX_SEEDS = 10
+
+
+class Staffing:
+    """
+    :param requirements: dict skill name -> number of members needed with it
+    :param overlap_minutes: minimum time a day the whole team works at once, on average over
+        the coming week, members without working hours can't be checked and are left out then
+    :param exclude_assigned: leave out members already assigned to a project
+    """
+
+    def __init__(self, requirements, overlap_minutes=0, exclude_assigned=True, as_of=None, now=None):
+        index = self.index = get_skill_index()
+        self.requirements = {name: count for name, count in requirements.items() if count > 0}
+        self.overlap_minutes = overlap_minutes
+        self.min_overlap = overlap_minutes * DAYS_PER_WEEK
+        self.unknown = sorted(name for name in self.requirements if name not in index.names)
+
+        as_of = (as_of or timezone.localdate()).toordinal()
+
+        def is_eligible(position):
+            return (
+                not index.on_holidays(position, as_of)
+                and not (exclude_assigned and index.projects[position])
+                and not (overlap_minutes and not index.workhours[position])
+            )
+
+        # Eligible holders of every required skill and the number of required skills of every candidate
+        self.holders = {
+            name: [position for position in index.positions.get(name, ()) if is_eligible(position)]
+            for name in self.requirements
+        }
+        self.skills_of = defaultdict(list)
+        for name, positions in self.holders.items():
+            for position in positions:
+                self.skills_of[position].append(name)
+
+        self.windows = self.load_windows(now or datetime.now(pytz.utc)) if overlap_minutes else {}
+        if overlap_minutes:
+            # Those working less than the overlap on their own can't be in any team, not even seed one
+            short = {
+                position for position in self.skills_of if bin(self.window(position)).count('1') < self.min_overlap
+            }
+            self.holders = {name: [position for position in positions if position not in short]
+                            for name, positions in self.holders.items()}
+            for position in short:
+                del self.skills_of[position]
+
+    def load_windows(self, now):
+        ids = {self.index.workhours[position] for position in self.skills_of}
+        return schedule_masks(ids, now.astimezone(pytz.utc).replace(second=0, microsecond=0), MINUTES_PER_WEEK)
+
+    def window(self, position):
+        if not self.overlap_minutes:
+            return FULL_WEEK
+        return self.windows[self.index.workhours[position]]
+
+    def greedy(self, seed=None):
+        """
+        Candidates are kept in buckets by gain, the number of still missing skills
+        they have, and the buckets are updated as skills get covered
+        """
+        remaining = dict(self.requirements)
+        gains = {position: len(names) for position, names in self.skills_of.items()}
+        buckets = defaultdict(set)
+        for position, gain in gains.items():
+            buckets[gain].add(position)
+        team, window = [], FULL_WEEK
+
+        def add(position):
+            nonlocal window
+            buckets[gains.pop(position)].discard(position)
+            team.append(position)
+            window &= self.window(position)
+            for name in self.skills_of[position]:
+                if remaining[name] > 0:
+                    remaining[name] -= 1
+                    if remaining[name] == 0:
+                        for holder in self.holders[name]:
+                            gain = gains.get(holder)
+                            if gain:
+                                buckets[gain].discard(holder)
+                                gains[holder] = gain - 1
+                                buckets[gain - 1].add(holder)
+
+        def pick():
+            # Most gain first, then the widest shared window, then the lowest id
+            for gain in sorted((gain for gain in buckets if gain and buckets[gain]), reverse=True):
+                overlaps, best = {}, None
+                for position in buckets[gain]:
+                    key = self.index.workhours[position] if self.overlap_minutes else 0
+                    if key not in overlaps:
+                        overlaps[key] = bin(window & self.window(position)).count('1')
+                    overlap = overlaps[key]
+                    if overlap >= self.min_overlap and (best is None or (-overlap, position) < best):
+                        best = (-overlap, position)
+                if best is not None:
+                    return best[1]
+            return None
+
+        if seed is not None:
+            add(seed)
+        while any(count > 0 for count in remaining.values()):
+            position = pick()
+            if position is None:
+                break
+            add(position)
+        return team, remaining, window
+
+    def seeds(self):
+        """
+        Holders of the rarest required skill having most of the other ones
+        """
+        rarest = min((name for name in self.holders if self.holders[name]),
+                     key=lambda name: len(self.holders[name]), default=None)
+        if rarest is None:
+            return []
+        return sorted(
+            self.holders[rarest], key=lambda position: (-len(self.skills_of[position]), position)
+        )[:MAX_SEEDS]
+
+    def teams(self, limit=3):
+        """
+        :return: up to `limit` distinct teams, complete and small ones first
+        """
+        candidates = {}
+        for seed in [None] + self.seeds():
+            team, remaining, window = self.greedy(seed)
+            if team:
+                candidates.setdefault(frozenset(team), (team, remaining, window))
+
+        ranked = sorted(
+            candidates.values(),
+            key=lambda candidate: (
+                sum(candidate[1].values()),
+                len(candidate[0]),
+                -bin(candidate[2]).count('1'),
+                sorted(candidate[0]),
+            )
+        )
+        return [self.describe(*candidate) for candidate in ranked[:limit]]
+
+    def describe(self, team, remaining, window):
+        ids = self.index.ids
+        return {
+            'members': [ids[position] for position in team],
+            'size': len(team),
+            'complete': not any(remaining.values()),
+            'missing': {name: count for name, count in remaining.items() if count},
+            'overlap_minutes': round(bin(window).count('1') / DAYS_PER_WEEK) if self.overlap_minutes else None,
+            'skills': {ids[position]: sorted(self.skills_of[position]) for position in team},
+        }
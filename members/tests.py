@@ -1,13 +1,37 @@
+import csv
+import io
+import itertools
 import json
+import os
+import tempfile
+import time
+from collections import Counter
+from datetime import date, datetime
 
+import pytz
+
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 
-from members.models import Member, WorkHours
+from members.generator import TIMEZONES, clear_org, generate_org
+from members.hierarchy import members_in_cycles, rollup
+from members.meetings import runs
+from members.models import Holiday, Member, WorkHours, WorkInterval
 from members.serializers import MemberSerializer, WorkHoursSerializer
+from members.search import get_search_index
+from members.skill_index import get_skill_index
+from members.staffing import Staffing
 from projects.models import Project
 from skills.models import Skill
+from SimpleOffice.cache import _version_key, get_shared_cache, get_shared_versions
+from SimpleOffice.lean import lean_serializer_for
+from SimpleOffice.prefetch import CLASS_CACHE_SIZE, plan_for
+from SimpleOffice.sparse import _sparse_class
 
 client = Client()
 
@@ -30,6 +54,75 @@ class GetAllMembersTest(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
 
+class MembersPaginationTest(TestCase):
+    """ Test module for keyset pagination of members """
+
+    def setUp(self) -> None:
+        self.js = Skill.objects.create(name='js')
+        self.python = Skill.objects.create(name='python')
+        for i in range(25):
+            member = Member.objects.create(first_name='Vasya{}'.format(i), last_name='Pupkin')
+            member.skills.set([self.js, self.python])
+
+    def collect(self, url):
+        ids = []
+        while url:
+            response = client.get(url)
+            ids += [member['id'] for member in response.data['results']]
+            url = response.data['next']
+        return ids
+
+    def test_pages_are_stable_and_distinct(self):
+        ids = self.collect(reverse('members-list') + '?skills=js,python&page_size=7')
+        self.assertEqual(ids, sorted(Member.objects.values_list('pk', flat=True)))
+
+    def test_page_size_is_capped(self):
+        response = client.get(reverse('members-list'), {'page_size': 10000})
+        self.assertEqual(len(response.data['results']), 25)
+        self.assertNotIn('count', response.data)
+
+    def test_approximate_count(self):
+        response = client.get(reverse('members-list'), {'count': 'approx', 'page_size': 5})
+        self.assertEqual(response.data['count'], 25)
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_skills_opt_in(self):
+        response = client.get(reverse('skills-list'))
+        self.assertEqual(response.data['count'], 2)
+
+        response = client.get(reverse('skills-list'), {'pagination': 'cursor', 'page_size': 1})
+        self.assertNotIn('count', response.data)
+        self.assertEqual([skill['id'] for skill in response.data['results']], [self.js.pk])
+        self.assertIn('pagination=cursor', response.data['next'])
+
+
+class CachedMembersTest(TestCase):
+    """ Test module for invalidation of cached members """
+
+    def setUp(self) -> None:
+        self.member = Member.objects.create(first_name='Vasya', last_name='Pupkin')
+
+    def test_related_changes_invalidate(self):
+        url = reverse('members-detail', kwargs={'pk': self.member.pk})
+        client.get(url)
+
+        skill = Skill.objects.create(name='js')
+        self.member.skills.add(skill)
+        self.assertEqual(client.get(url).data['skills'], [{'id': skill.pk, 'name': 'js'}])
+
+        skill.name = 'javascript'
+        skill.save()
+        self.assertEqual(client.get(url).data['skills'][0]['name'], 'javascript')
+
+        project = Project.objects.create(name='project')
+        client.post(
+            reverse('members-bulk-assign-to-project'),
+            data=json.dumps({'project': project.pk, 'members': [self.member.pk]}),
+            content_type='application/json'
+        )
+        self.assertEqual(client.get(url).data['project']['id'], project.pk)
+
+
 class GetMembersByFilters(TestCase):
     """ Test module for getting all users by filters """
 
@@ -66,21 +159,297 @@ class GetMembersByFilters(TestCase):
 
     def test_get_by_skills(self):
         response = client.get(reverse('members-list') + '?skills={}'.format(self.js.name))
-        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(len(response.data['results']), 1)
 
     def test_get_by_project(self):
         response = client.get(reverse('members-list') + '?project={}'.format(self.project.pk))
         print(response)
-        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(len(response.data['results']), 1)
 
     def test_get_by_holidays(self):
         response = client.get(reverse('members-list') + '?holidays=True')
-        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(len(response.data['results']), 1)
 
     def test_get_by_is_working(self):
         response = client.get(reverse('members-list') + '?is_working=True')  # no matter what time it is
         # there is only gonna be one record in the response
-        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(len(response.data['results']), 1)
+
+
+class SkillSetFilterTest(TestCase):
+    """ Test module for all/any/none skill matching """
+
+    def setUp(self) -> None:
+        skills = {name: Skill.objects.create(name=name) for name in ('js', 'python', 'sql')}
+        self.members = {}
+        for name, member_skills in (('js', ('js', )), ('py_sql', ('python', 'sql')), ('all', ('js', 'python', 'sql')),
+                                    ('none', ())):
+            member = self.members[name] = Member.objects.create(first_name=name, last_name='Dev')
+            member.skills.add(*(skills[skill] for skill in member_skills))
+
+    def names(self, **params):
+        response = client.get(reverse('members-list'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [member['first_name'] for member in response.data['results']]
+
+    def test_all(self):
+        self.assertEqual(self.names(skills_all='python,sql'), ['py_sql', 'all'])
+        self.assertEqual(self.names(skills_all='js,python,sql'), ['all'])
+        self.assertEqual(self.names(skills_all='js,go'), [])
+
+    def test_any_is_distinct(self):
+        self.assertEqual(self.names(skills_any='js,python,sql'), ['js', 'py_sql', 'all'])
+        self.assertEqual(self.names(skills='js,python'), ['js', 'py_sql', 'all'])
+
+    def test_none_and_combinations(self):
+        self.assertEqual(self.names(skills_none='js'), ['py_sql', 'none'])
+        self.assertEqual(self.names(skills_any='python', skills_none='js'), ['py_sql'])
+        self.assertEqual(self.names(skills_all='sql', skills_any='js'), ['all'])
+
+    def test_follows_changes(self):
+        self.assertEqual(self.names(skills_all='js,sql'), ['all'])
+        self.members['py_sql'].skills.add(Skill.objects.get(name='js'))
+        self.assertEqual(self.names(skills_all='js,sql'), ['py_sql', 'all'])
+
+    def test_matched_in_sql(self):
+        # another skill with the same name counts as the same skill
+        self.members['js'].skills.add(Skill.objects.create(name='sql'))
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.names(skills_all='js,sql', skills_none='python'), ['js'])
+        members_query = queries.captured_queries[-2]['sql']  # then skills
+        # one grouped subquery however many skills are required
+        self.assertEqual(members_query.count('IN (SELECT'), 2)
+        self.assertIn('HAVING COUNT(DISTINCT', members_query)
+        for member in self.members.values():
+            self.assertNotIn(f'IN ({member.pk}', members_query)
+
+
+class SearchMembersTest(TestCase):
+    """ Test module for the fuzzy ?search= of members """
+
+    def setUp(self) -> None:
+        self.project = Project.objects.create(name='Apollo')
+        self.python = Skill.objects.create(name='python')
+        self.vasya = Member.objects.create(first_name='Vasya', last_name='Pupkin')
+        self.vasyl = Member.objects.create(first_name='Vasyl', last_name='Shevchenko', project=self.project)
+        self.olena = Member.objects.create(first_name='Olena', last_name='Kovalenko')
+        self.olena.skills.add(self.python)
+
+    def search(self, query, **params):
+        response = client.get(reverse('members-list'), dict(params, search=query))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [member['id'] for member in response.data['results']]
+
+    def test_prefix(self):
+        self.assertEqual(self.search('vas'), [self.vasya.pk, self.vasyl.pk])
+        self.assertEqual(self.search('Vasyl'), [self.vasyl.pk, self.vasya.pk])
+        self.assertEqual(self.search('vas', page_size=1), [self.vasya.pk])
+
+    def test_typos_and_all_words(self):
+        self.assertEqual(self.search('shevcenko'), [self.vasyl.pk])
+        self.assertEqual(self.search('vasya pup'), [self.vasya.pk])
+        self.assertEqual(self.search('vasya kovalenko'), [])
+
+    def test_skills_and_project(self):
+        self.assertEqual(self.search('pyth'), [self.olena.pk])
+        self.assertEqual(self.search('apollo'), [self.vasyl.pk])
+        self.assertEqual(self.search('vas', project=self.project.pk), [self.vasyl.pk])
+
+    def test_ranked_within_filters(self):
+        # The best match overall isn't on the project, the page is filled from those who are
+        self.assertEqual(self.search('vas', page_size=1), [self.vasya.pk])
+        self.assertEqual(self.search('vas', project=self.project.pk, page_size=1), [self.vasyl.pk])
+        self.assertEqual(self.search('vas', skills='python'), [])
+
+    def test_index_follows_changes(self):
+        self.assertEqual(self.search('petro'), [])
+        Member.objects.create(first_name='Petro', last_name='Petrenko')
+        self.assertEqual(len(self.search('petro')), 1)
+
+    def test_index_follows_other_processes(self):
+        index = get_search_index()
+        self.assertIs(get_search_index(), index)
+        # Another worker committed a change
+        get_shared_cache().set(_version_key('members'), time.time(), None)
+        self.assertIsNot(get_search_index(), index)
+
+
+class IsWorkingFilterTest(TestCase):
+    """ Test module for the is_working filter at arbitrary moments """
+
+    def setUp(self) -> None:
+        self.year = timezone.now().year + 1
+
+        self.day_shift = Member.objects.create(
+            first_name='Vasya',
+            last_name='Pupkin',
+            workhours=WorkHours.objects.create(start="09:00:00", end="18:00:00", timezone="Europe/Kiev"),
+        )
+        self.night_shift = Member.objects.create(
+            first_name='Petr',
+            last_name='Petrov',
+            workhours=WorkHours.objects.create(start="22:00:00", end="06:00:00", timezone="UTC"),
+        )
+        self.no_schedule = Member.objects.create(
+            first_name='Ivan',
+            last_name='Ivanov',
+        )
+
+    def working_at(self, moment, is_working=True):
+        response = client.get(reverse('members-list'), {'is_working': is_working, 'at': moment})
+        return {member['id'] for member in response.data['results']}
+
+    def test_timezone_and_dst(self):
+        # Kyiv is UTC+2 in winter and UTC+3 in summer
+        self.assertEqual(self.working_at(f'{self.year}-01-15T15:30:00Z'), {self.day_shift.pk})
+        self.assertEqual(self.working_at(f'{self.year}-07-15T15:30:00Z'), set())
+        self.assertEqual(self.working_at(f'{self.year}-07-15T06:30:00Z'), {self.day_shift.pk})
+        self.assertEqual(self.working_at(f'{self.year}-01-15T06:30:00Z'), set())
+
+    def test_overnight_shift(self):
+        self.assertEqual(self.working_at(f'{self.year}-01-18T23:00:00Z'), {self.night_shift.pk})
+        self.assertEqual(self.working_at(f'{self.year}-01-19T03:00:00Z'), {self.night_shift.pk})
+
+    def test_not_working(self):
+        self.assertEqual(
+            self.working_at(f'{self.year}-01-15T12:00:00Z', is_working=False),
+            {self.night_shift.pk, self.no_schedule.pk}
+        )
+
+    def test_intervals_follow_schedule_changes(self):
+        work_hours = self.night_shift.workhours
+        work_hours.start, work_hours.end = "10:00:00", "12:00:00"
+        work_hours.save()
+        self.assertEqual(self.working_at(f'{self.year}-01-15T11:00:00Z'), {self.day_shift.pk, self.night_shift.pk})
+
+
+class AvailabilityTest(TestCase):
+    """ Test module for the holidays filter and member availability """
+
+    def setUp(self) -> None:
+        self.today = timezone.localdate()
+        self.no_holidays = Member.objects.create(first_name='Vasya', last_name='Pupkin')
+        self.past = Member.objects.create(
+            first_name='Petr',
+            last_name='Petrov',
+            on_holidays_till=self.today - timezone.timedelta(days=1),
+        )
+        self.last_day = Member.objects.create(
+            first_name='Ivan',
+            last_name='Ivanov',
+            on_holidays_till=self.today,
+        )
+        self.future = Member.objects.create(
+            first_name='Olga',
+            last_name='Olgina',
+            on_holidays_till=self.today + timezone.timedelta(days=10),
+        )
+
+    def filtered(self, **params):
+        response = client.get(reverse('members-list'), params)
+        return {member['id'] for member in response.data['results']}
+
+    def test_filter_matches_is_available(self):
+        on_holidays = self.filtered(holidays=True)
+        available = self.filtered(holidays=False)
+
+        self.assertEqual(on_holidays, {self.last_day.pk, self.future.pk})
+        self.assertEqual(available, {self.no_holidays.pk, self.past.pk})
+        for member in Member.objects.all():
+            with self.assertNumQueries(1):
+                self.assertEqual(member.is_available, member.pk in available)
+        for member in Member.objects.with_availability():
+            self.assertEqual(member.is_available, member.pk in available)
+
+    def test_filter_as_of(self):
+        as_of = self.today + timezone.timedelta(days=5)
+        self.assertEqual(self.filtered(holidays=True, as_of=as_of), {self.future.pk})
+        self.assertEqual(
+            set(Member.objects.available(as_of).values_list('pk', flat=True)),
+            {self.no_holidays.pk, self.past.pk, self.last_day.pk}
+        )
+
+    def test_assigning_member_on_holidays(self):
+        project = Project.objects.create(name='project')
+        response = client.post(
+            reverse('members-assign-to-project', kwargs={'pk': self.future.pk}),
+            data=json.dumps({'id': project.pk}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('message', response.data)
+        self.future.refresh_from_db()
+        self.assertIsNone(self.future.project)
+
+
+class HolidayPeriodsTest(TestCase):
+    """ Test module for holiday periods and the overlap filters """
+
+    def setUp(self) -> None:
+        self.today = timezone.localdate()
+        self.august = Member.objects.create(first_name='Vasya', last_name='Pupkin')
+        self.august.set_holidays([(date(2030, 8, 10), date(2030, 8, 20))])
+        self.now = Member.objects.create(first_name='Petr', last_name='Petrov')
+        self.now.set_holidays([(self.today - timezone.timedelta(days=2), self.today)])
+        self.legacy = Member.objects.create(first_name='Ivan', last_name='Ivanov', on_holidays_till=date(2030, 8, 1))
+        self.free = Member.objects.create(first_name='Olga', last_name='Olgina')
+
+    def filtered(self, **params):
+        response = client.get(reverse('members-list'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {member['id'] for member in response.data['results']}
+
+    def test_overlap_filters(self):
+        self.assertEqual(self.filtered(off_between='2030-08-01,2030-08-15'), {self.august.pk, self.legacy.pk})
+        self.assertEqual(self.filtered(off_between='2030-08-02,2030-08-09'), set())
+        self.assertEqual(self.filtered(off_between='2030-08-20,2030-08-31'), {self.august.pk})
+        self.assertEqual(
+            self.filtered(available_between='2030-08-02,2030-08-31'), {self.now.pk, self.legacy.pk, self.free.pk}
+        )
+
+        response = client.get(reverse('members-list'), {'off_between': '2030-08-15,2030-08-01'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_availability_uses_periods(self):
+        self.assertEqual(self.filtered(holidays=True), {self.now.pk, self.legacy.pk})
+        self.assertEqual(self.filtered(holidays=True, as_of='2030-08-20'), {self.august.pk})
+        with self.assertNumQueries(1):
+            available = {member.pk: member.is_available for member in Member.objects.with_availability()}
+        self.assertEqual(available, {self.august.pk: True, self.now.pk: False, self.legacy.pk: False, self.free.pk: True})
+        self.assertFalse(Member.objects.get(pk=self.now.pk).is_available)
+        self.assertTrue(Member.objects.get(pk=self.august.pk).is_available)
+
+        staffing = Staffing({'python': 1})
+        index = staffing.index
+        self.assertTrue(index.on_holidays(index.position[self.now.pk], self.today.toordinal()))
+        self.assertFalse(index.on_holidays(index.position[self.august.pk], self.today.toordinal()))
+
+    def test_assigning_member_on_holidays(self):
+        project = Project.objects.create(name='project')
+        response = client.post(
+            reverse('members-assign-to-project', kwargs={'pk': self.now.pk}),
+            data=json.dumps({'id': project.pk}),
+            content_type='application/json'
+        )
+        self.assertIn('message', response.data)
+        self.now.refresh_from_db()
+        self.assertIsNone(self.now.project)
+
+    def test_replace_holidays(self):
+        url = reverse('members-holidays', kwargs={'pk': self.free.pk})
+        self.assertEqual(client.get(url).data, [])
+        self.assertEqual(self.filtered(off_between='2030-12-24,2030-12-24'), set())
+
+        periods = [{'start': '2030-12-20', 'end': '2031-01-02'}, {'start': '2030-07-01', 'end': '2030-07-01'}]
+        response = client.put(url, data=json.dumps(periods), content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, periods[::-1])
+        self.assertEqual(self.filtered(off_between='2030-12-24,2030-12-24'), {self.free.pk})
+
+        response = client.put(url, data=json.dumps([{'start': '2030-12-20', 'end': '2030-12-19'}]),
+                              content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Holiday.objects.filter(member=self.free).count(), 2)
 
 
 class GetSingleMemberTest(TestCase):
@@ -180,6 +549,617 @@ class AssignMemberToProjectTest(TestCase):
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
 
+class BulkAssignMembersToProjectTest(TestCase):
+    """ Test module to test assigning many members to the project at once """
+
+    def setUp(self) -> None:
+        self.project = Project.objects.create(name='project')
+        self.js = Skill.objects.create(name='js')
+
+        self.available = Member.objects.create(first_name='Vasya', last_name='Pupkin')
+        self.available.skills.add(self.js)
+        self.on_holidays = Member.objects.create(
+            first_name='Petr',
+            last_name='Petrov',
+            on_holidays_till='3000-09-20',
+        )
+        self.on_holidays.skills.add(self.js)
+        self.other = Member.objects.create(first_name='Ivan', last_name='Ivanov')
+
+    def assign(self, payload):
+        return client.post(
+            reverse('members-bulk-assign-to-project'),
+            data=json.dumps(payload),
+            content_type='application/json'
+        )
+
+    def test_assigning_by_ids(self):
+        with self.assertNumQueries(5):  # project, savepoint, locked availability, update, release
+            response = self.assign({
+                'project': self.project.pk,
+                'members': [self.available.pk, self.on_holidays.pk, 1000],
+            })
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['assigned'], 1)
+        self.assertEqual(response.data['results'], [
+            {'id': self.available.pk, 'status': 'assigned'},
+            {'id': self.on_holidays.pk, 'status': 'on_holiday'},
+            {'id': 1000, 'status': 'not_found'},
+        ])
+        self.assertEqual(
+            list(Member.objects.filter(project=self.project).values_list('pk', flat=True)),
+            [self.available.pk]
+        )
+
+    def test_assigning_by_filter(self):
+        response = self.assign({'project': self.project.pk, 'filter': {'skills': ['js']}})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['assigned'], 1)
+        self.assertEqual(len(response.data['results']), 2)
+        self.other.refresh_from_db()
+        self.assertIsNone(self.other.project)
+
+    def test_results_in_requested_order(self):
+        response = self.assign({'project': self.project.pk, 'members': [1000, self.on_holidays.pk, self.available.pk]})
+        self.assertEqual([result['id'] for result in response.data['results']],
+                         [1000, self.on_holidays.pk, self.available.pk])
+
+    def test_filter_update_uses_subquery(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.assign({'project': self.project.pk, 'filter': {'holidays': False}})
+        self.assertEqual(response.data['assigned'], 2)
+        update = next(query['sql'] for query in queries.captured_queries if query['sql'].startswith('UPDATE'))
+        self.assertIn('IN (SELECT', update)
+
+    def test_invalid_assigning(self):
+        response = self.assign({'project': self.project.pk})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.assign({'project': 1000, 'members': [self.available.pk]})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ImportMembersTest(TestCase):
+    """ Test module for the bulk import of members """
+
+    def setUp(self) -> None:
+        self.project = Project.objects.create(name='project')
+        self.member = Member.objects.create(first_name='Vasya', last_name='Pupkin')
+        self.member.skills.add(Skill.objects.create(name='js'))
+
+    def import_members(self, body, content_type, dry_run=False):
+        url = reverse('members-import') + ('?dry_run=true' if dry_run else '')
+        return client.post(url, data=body, content_type=content_type)
+
+    def test_import_ndjson(self):
+        rows = [
+            {
+                'id': self.member.pk,
+                'first_name': 'Vasiliy',
+                'last_name': 'Pupkin',
+                'skills': ['python'],
+                'manager_id': 100,
+                'workhours': {'start': '09:00', 'end': '18:00', 'timezone': 'Europe/Kiev'},
+            },
+            {
+                'id': 100,
+                'first_name': 'Petr',
+                'last_name': 'Petrov',
+                'skills': ['js', 'python'],
+                'project': self.project.pk,
+                'on_holidays_till': '3000-09-20',
+                'workhours': {'start': '09:00', 'end': '18:00', 'timezone': 'Europe/Kiev'},
+            },
+            {'first_name': 'Ivan', 'last_name': 'Ivanov'},
+        ]
+        body = '\n'.join(json.dumps(row) for row in rows)
+        response = self.import_members(body, 'application/x-ndjson')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(response.data['updated'], 1)
+        self.assertEqual(response.data['skills_created'], 1)
+        self.assertEqual(response.data['workhours_created'], 1)
+        self.assertEqual(response.data['error_count'], 0)
+
+        self.member.refresh_from_db()
+        self.assertEqual(self.member.first_name, 'Vasiliy')
+        self.assertEqual(self.member.manager_id_id, 100)
+        self.assertEqual(list(self.member.skills.values_list('name', flat=True)), ['python'])
+
+        petr = Member.objects.get(pk=100)
+        self.assertEqual(petr.project, self.project)
+        self.assertEqual(petr.workhours, self.member.workhours)
+        self.assertEqual(petr.skills.count(), 2)
+        self.assertTrue(Member.objects.filter(first_name='Ivan').exists())
+
+    def test_import_csv_with_errors(self):
+        body = (
+            'id,first_name,last_name,skills,project,manager_id,on_holidays_till,'
+            'workhours_start,workhours_end,workhours_timezone\n'
+            '200,Petr,Petrov,js;go,,,,09:00,18:00,UTC\n'
+            '201,,Ivanov,,,,,,,\n'
+            '202,Ivan,Ivanov,,1000,,,,,\n'
+            '203,Olga,Olgina,,,999,,09:00,18:00,Mars/Base\n'
+            '204,Olga,Olgina,,,999,,,,\n'
+        )
+        response = self.import_members(body, 'text/csv')
+
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(response.data['error_count'], 4)
+        self.assertEqual(
+            [(error['line'], list(error['errors'])) for error in response.data['errors']],
+            [(3, ['first_name']), (4, ['project']), (5, ['workhours']), (6, ['manager_id'])]
+        )
+        self.assertEqual(Member.objects.get(pk=200).skills.count(), 2)
+
+    def test_ndjson_values_of_wrong_types(self):
+        rows = [
+            {'first_name': 5, 'last_name': 'Ivanov'},
+            {'first_name': 'Ivan', 'last_name': ['Ivanov']},
+            {'first_name': 'Ivan', 'last_name': 'Ivanov', 'skills': 5},
+            {'first_name': 'Ivan', 'last_name': 'Ivanov', 'skills': [1]},
+            {'first_name': 'Ivan', 'last_name': 'Ivanov', 'workhours': {'start': '09:00', 'end': '18:00', 'timezone': []}},
+            {'first_name': 'Olga', 'last_name': 'Olgina', 'skills': 'js;go'},
+        ]
+        response = self.import_members('\n'.join(json.dumps(row) for row in rows), 'application/x-ndjson')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(
+            [(error['line'], list(error['errors'])) for error in response.data['errors']],
+            [(1, ['first_name']), (2, ['last_name']), (3, ['skills']), (4, ['skills']), (5, ['workhours'])]
+        )
+
+    def test_dry_run(self):
+        response = self.import_members('{"first_name": "Ivan", "last_name": "Ivanov"}', 'application/x-ndjson',
+                                       dry_run=True)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(Member.objects.count(), 1)
+
+    def test_unsupported_format(self):
+        response = self.import_members('<members/>', 'application/xml')
+        self.assertEqual(response.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+
+
+class ExportMembersTest(TestCase):
+    """ Test module for the streaming export of members """
+
+    def setUp(self) -> None:
+        self.js = Skill.objects.create(name='js')
+        self.project = Project.objects.create(name='project')
+        work_hours = WorkHours.objects.create(start="09:00:00", end="18:00:00", timezone="Europe/Kiev")
+
+        for i in range(5):
+            member = Member.objects.create(
+                first_name='Vasya{}'.format(i),
+                last_name='Pupkin',
+                project=self.project if i % 2 else None,
+                workhours=work_hours,
+            )
+            member.skills.add(self.js)
+
+    def export(self, **params):
+        response = client.get(reverse('members-export'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_export_ndjson_matches_serializer(self):
+        rows = [json.loads(line) for line in self.export().splitlines()]
+        serializer = MemberSerializer(Member.objects.order_by('pk'), many=True)
+        self.assertEqual(rows, json.loads(json.dumps(serializer.data)))
+
+    def test_export_csv_with_filters(self):
+        rows = list(csv.DictReader(self.export(format='csv', project=self.project.pk).splitlines()))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]['skills'], 'js')
+        self.assertEqual(rows[0]['project_name'], 'project')
+        self.assertEqual(rows[0]['workhours_timezone'], 'Europe/Kiev')
+
+    def test_export_query_count_is_constant(self):
+        with self.assertNumQueries(2):  # members with joins, skills of the chunk
+            self.export()
+
+
+class HierarchyTest(TestCase):
+    """ Test module for org chart queries over manager_id """
+
+    def setUp(self) -> None:
+        self.ceo = Member.objects.create(first_name='Ceo', last_name='Boss')
+        self.cto = Member.objects.create(first_name='Cto', last_name='Boss', manager_id=self.ceo)
+        self.lead = Member.objects.create(first_name='Lead', last_name='Dev', manager_id=self.cto)
+        self.devs = [
+            Member.objects.create(first_name=f'Dev{i}', last_name='Dev', manager_id=self.lead) for i in range(3)
+        ]
+        self.project = Project.objects.create(name='finance')
+        self.cfo = Member.objects.create(first_name='Cfo', last_name='Boss', manager_id=self.ceo, project=self.project)
+
+    def test_reports(self):
+        response = client.get(reverse('members-reports', kwargs={'pk': self.cto.pk}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [member['id'] for member in response.data['results']],
+            [self.lead.pk] + [dev.pk for dev in self.devs]
+        )
+
+        response = client.get(reverse('members-reports', kwargs={'pk': self.ceo.pk}), {'project': self.project.pk})
+        self.assertEqual([member['id'] for member in response.data['results']], [self.cfo.pk])
+
+    def test_chain(self):
+        response = client.get(reverse('members-chain', kwargs={'pk': self.devs[0].pk}))
+        self.assertEqual([member['id'] for member in response.data], [self.lead.pk, self.cto.pk, self.ceo.pk])
+
+        response = client.get(reverse('members-chain', kwargs={'pk': 9999}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_rollup(self):
+        response = client.get(reverse('members-rollup', kwargs={'pk': self.ceo.pk}))
+        self.assertEqual(response.data, {'id': self.ceo.pk, 'direct_reports': 2, 'headcount': 6, 'depth': 3})
+
+        response = client.get(reverse('members-rollups'))
+        self.assertEqual([row['id'] for row in response.data], [self.ceo.pk, self.cto.pk, self.lead.pk])
+
+    def test_cycle_is_rejected(self):
+        response = client.patch(
+            reverse('members-detail', kwargs={'pk': self.cto.pk}),
+            data=json.dumps({'manager_id': self.devs[0].pk}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('manager_id', response.data)
+
+    def test_import_breaks_cycles(self):
+        body = '\n'.join(json.dumps(row) for row in [
+            {'id': self.ceo.pk, 'first_name': 'Ceo', 'last_name': 'Boss', 'manager_id': self.devs[0].pk},
+        ])
+        response = client.post(reverse('members-import'), data=body, content_type='application/x-ndjson')
+        self.assertEqual(response.data['error_count'], 1)
+        self.ceo.refresh_from_db()
+        self.assertIsNone(self.ceo.manager_id)
+
+
+class StaffingTest(TestCase):
+    """ Test module for the team composition endpoint """
+
+    def setUp(self) -> None:
+        self.skills = {name: Skill.objects.create(name=name) for name in ('python', 'js', 'sql', 'go')}
+        kyiv = WorkHours.objects.create(start='09:00', end='18:00', timezone='Europe/Kiev')
+        tokyo = WorkHours.objects.create(start='09:00', end='18:00', timezone='Asia/Tokyo')
+
+        def member(name, skills, workhours=kyiv, **kwargs):
+            member = Member.objects.create(first_name=name, last_name='Dev', workhours=workhours, **kwargs)
+            member.skills.add(*(self.skills[skill] for skill in skills))
+            return member
+
+        self.full_stack = member('Full', ('python', 'js', 'sql'))
+        self.backend = member('Back', ('python', 'go'))
+        self.frontend = member('Front', ('js', ))
+        self.gopher = member('Gopher', ('go', ), workhours=tokyo)
+        self.busy = member('Busy', ('python', 'js', 'sql', 'go'), project=Project.objects.create(name='project'))
+        self.resting = member('Rest', ('python', 'js', 'sql', 'go'), on_holidays_till=timezone.localdate())
+
+    def staffing(self, **payload):
+        response = client.post(reverse('members-staffing'), data=json.dumps(payload), content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def team_ids(self, team):
+        return [member['id'] for member in team['members']]
+
+    def test_smallest_team_first(self):
+        data = self.staffing(skills=['python', 'js', 'sql', 'go'])
+        best = data['teams'][0]
+        self.assertTrue(best['complete'])
+        self.assertEqual(self.team_ids(best), [self.full_stack.pk, self.backend.pk])
+        self.assertEqual(best['members'][0]['skills'], ['js', 'python', 'sql'])
+
+    def test_headcount(self):
+        best = self.staffing(skills=['python', 'js'], headcount={'js': 2})['teams'][0]
+        self.assertTrue(best['complete'])
+        self.assertEqual(set(self.team_ids(best)), {self.full_stack.pk, self.frontend.pk})
+
+    def test_overlap_and_assigned(self):
+        data = self.staffing(skills=['go'], overlap_hours=4, teams=5)
+        self.assertEqual(sorted(self.team_ids(team)[0] for team in data['teams']), [self.backend.pk, self.gopher.pk])
+
+        data = self.staffing(skills=['python', 'go'], overlap_hours=4, exclude_assigned=False, teams=10)
+        for team in data['teams']:
+            self.assertNotIn(self.gopher.pk, self.team_ids(team)[1:])
+            self.assertNotIn(self.resting.pk, self.team_ids(team))
+        self.assertEqual(self.team_ids(data['teams'][0]), [self.backend.pk])
+
+    def test_overlap_of_weekly_shifts(self):
+        # Works the hours of the others on Mondays only, 9 hours a week
+        mondays = WorkHours.objects.create(start='09:00', end='18:00', timezone='Europe/Kiev')
+        mondays.set_shifts([(0, '09:00', '18:00')])
+        weekly = Member.objects.create(first_name='Weekly', last_name='Dev', workhours=mondays)
+        weekly.skills.add(self.skills['go'])
+
+        data = self.staffing(skills=['go'], overlap_hours=1, teams=5)
+        self.assertIn([weekly.pk], [self.team_ids(team) for team in data['teams']])
+        data = self.staffing(skills=['go'], overlap_hours=2, teams=5)
+        self.assertNotIn([weekly.pk], [self.team_ids(team) for team in data['teams']])
+
+    def test_index_follows_other_processes(self):
+        index = get_skill_index()
+        self.assertIs(get_skill_index(), index)
+
+        # A write of another process: no signal here, its commit bumps the shared versions
+        Member.objects.filter(pk=self.busy.pk).update(project=None)
+        self.assertIs(get_skill_index(), index)
+        get_shared_cache().set(_version_key('members'), time.time(), None)
+        self.assertIsNot(get_skill_index(), index)
+        self.assertEqual(get_skill_index().projects[get_skill_index().position[self.busy.pk]], 0)
+
+    def test_unknown_and_missing_skills(self):
+        data = self.staffing(skills=['python', 'cobol'])
+        self.assertEqual(data['unknown_skills'], ['cobol'])
+        self.assertFalse(data['teams'][0]['complete'])
+        self.assertEqual(data['teams'][0]['missing'], {'cobol': 1})
+
+        response = client.post(reverse('members-staffing'), data=json.dumps({'skills': ['js'], 'headcount': {'go': 1}}),
+                               content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class MeetingSlotsTest(TestCase):
+    """ Test module for weekly shifts and the meeting slots endpoint """
+
+    # Intervals are resolved around this moment, 2024 is past the horizon of now
+    NOW = datetime(2024, 1, 1, tzinfo=pytz.utc)
+
+    def setUp(self) -> None:
+        self.project = Project.objects.create(name='project')
+        self.utc = self.workhours('09:00', '17:00', 'UTC')
+        self.kyiv = self.workhours('09:00', '18:00', 'Europe/Kiev')
+
+        def member(name, **kwargs):
+            return Member.objects.create(first_name=name, last_name='Dev', project=self.project, **kwargs).pk
+
+        self.london = member('London', workhours=self.utc)
+        self.kyivan = member('Kyiv', workhours=self.kyiv)
+        self.resting = member('Rest', workhours=self.utc, on_holidays_till=date(2024, 1, 20))
+        self.unscheduled = member('Free')
+
+    def workhours(self, start, end, tz):
+        workhours = WorkHours.objects.create(start=start, end=end, timezone=tz)
+        workhours.rebuild_intervals(self.NOW)
+        return workhours
+
+    def slots(self, **payload):
+        response = client.post(reverse('members-meeting-slots'), data=json.dumps(payload),
+                               content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return json.loads(response.content)
+
+    def test_project_slots(self):
+        data = self.slots(project=self.project.pk, start='2024-01-08T00:00:00Z', end='2024-01-10T00:00:00Z',
+                          duration_minutes=60)
+        self.assertEqual(data['members'], [self.london, self.kyivan])
+        self.assertEqual(data['on_holidays'], [self.resting])
+        self.assertEqual(data['without_workhours'], [self.unscheduled])
+        # 09:00-17:00 UTC and 09:00-18:00 UTC+2
+        self.assertEqual([(window['start'], window['end'], window['minutes']) for window in data['windows']], [
+            ('2024-01-08T09:00:00Z', '2024-01-08T16:00:00Z', 420),
+            ('2024-01-09T09:00:00Z', '2024-01-09T16:00:00Z', 420),
+        ])
+
+        # A leave within the range takes its days out, a leave over all of it leaves the member out
+        Holiday.objects.create(member_id=self.kyivan, start=date(2024, 1, 9), end=date(2024, 1, 9))
+        data = self.slots(project=self.project.pk, start='2024-01-08T00:00:00Z', end='2024-01-10T00:00:00Z',
+                          duration_minutes=60)
+        self.assertEqual(data['members'], [self.london, self.kyivan])
+        self.assertEqual([window['start'] for window in data['windows']], ['2024-01-08T09:00:00Z'])
+        data = self.slots(members=[self.london, self.resting], start='2024-01-19T00:00:00Z',
+                          end='2024-01-23T00:00:00Z', duration_minutes=60)
+        self.assertEqual(data['members'], [self.london, self.resting])
+        self.assertEqual([window['start'] for window in data['windows']], [
+            '2024-01-21T09:00:00Z', '2024-01-22T09:00:00Z',
+        ])
+
+        data = self.slots(members=[self.london, self.kyivan, 0], start='2024-01-08T10:30:00Z',
+                          end='2024-01-08T12:00:00Z', duration_minutes=120)
+        self.assertEqual(data['not_found'], [0])
+        self.assertEqual(data['windows'], [])
+
+    def test_dst(self):
+        # Kyiv moves from UTC+2 to UTC+3 on March 31st, 2024
+        data = self.slots(members=[self.kyivan], start='2024-03-30T00:00:00Z', end='2024-04-01T00:00:00Z')
+        self.assertEqual([(window['start'], window['end']) for window in data['windows']], [
+            ('2024-03-30T07:00:00Z', '2024-03-30T16:00:00Z'),
+            ('2024-03-31T06:00:00Z', '2024-03-31T15:00:00Z'),
+        ])
+
+    def test_weekly_shifts(self):
+        url = reverse('workhours-shifts', kwargs={'pk': self.utc.pk})
+        shifts = [
+            {'weekday': 0, 'start': '22:00:00', 'end': '06:00:00'},  # overnight
+            {'weekday': 2, 'start': '09:00:00', 'end': '12:00:00'},
+            {'weekday': 2, 'start': '13:00:00', 'end': '17:00:00'},  # split
+        ]
+        response = client.put(url, data=json.dumps(shifts), content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(client.get(url).data, shifts)
+        self.assertEqual(
+            sorted(self.utc.intervals.values_list('start_minute', 'end_minute')),
+            [(1320, 1800), (3420, 3600), (3660, 3900)],
+        )
+
+        data = self.slots(members=[self.london], start='2024-01-08T00:00:00Z', end='2024-01-15T00:00:00Z',
+                          duration_minutes=60)
+        self.assertEqual([(window['start'], window['end']) for window in data['windows']], [
+            ('2024-01-08T22:00:00Z', '2024-01-09T06:00:00Z'),
+            ('2024-01-10T09:00:00Z', '2024-01-10T12:00:00Z'),
+            ('2024-01-10T13:00:00Z', '2024-01-10T17:00:00Z'),
+        ])
+
+        client.put(url, data=json.dumps([]), content_type='application/json')
+        self.assertEqual(self.utc.intervals.count(), 7)
+
+    def test_validation(self):
+        for payload in ({}, {'members': [self.london], 'project': self.project.pk},
+                        {'members': [self.london], 'start': '2024-01-08T00:00:00Z', 'end': '2024-04-08T00:00:00Z'}):
+            response = client.post(reverse('members-meeting-slots'), data=json.dumps(payload),
+                                   content_type='application/json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_runs(self):
+        self.assertEqual(list(runs(0b1110011)), [(0, 2), (4, 7)])
+        self.assertEqual(list(runs(0)), [])
+
+
+class LeanSerializerTest(TestCase):
+    """ Test module for the parity of lean and regular serialization """
+
+    def setUp(self) -> None:
+        project = Project.objects.create(name='project')
+        work_hours = WorkHours.objects.create(start='09:00', end='18:00:30', timezone='Europe/Kiev')
+        skills = [Skill.objects.create(name=name) for name in ('js', 'python')]
+        manager = Member.objects.create(first_name='Boss', last_name='Bossov')
+        for number in range(5):
+            member = Member.objects.create(
+                first_name=f'Name{number}',
+                last_name='Last',
+                project=project if number % 2 else None,
+                workhours=work_hours if number % 3 else None,
+                manager_id=manager if number else None,
+                on_holidays_till='2030-01-01' if number == 4 else None,
+            )
+            member.skills.set(skills[:number % 3])
+
+    def test_parity(self):
+        for serializer_class, queryset in ((MemberSerializer, Member.objects.order_by('pk')),
+                                           (WorkHoursSerializer, WorkHours.objects.order_by('pk'))):
+            lean = lean_serializer_for(serializer_class)
+            self.assertIsNotNone(lean)
+            self.assertEqual(
+                json.dumps(lean.serialize(lean.values(queryset))),
+                json.dumps(serializer_class(queryset, many=True).data),
+            )
+
+    def test_views_use_lean_path(self):
+        response = client.get(reverse('members-list'), {'page_size': 100})
+        expected = MemberSerializer(Member.objects.order_by('pk'), many=True).data
+        self.assertEqual(json.dumps(response.data['results']), json.dumps(expected))
+
+        member = Member.objects.filter(skills__isnull=False).first()
+        response = client.get(reverse('members-detail', kwargs={'pk': member.pk}))
+        self.assertEqual(response.data, MemberSerializer(member).data)
+
+    def test_method_fields_need_lean_fields(self):
+        class Serializer(WorkHoursSerializer):
+            class Meta(WorkHoursSerializer.Meta):
+                lean_fields = {}
+
+        self.assertIsNone(lean_serializer_for(Serializer))
+
+
+class SparseFieldsTest(TestCase):
+    """ Test module for ?fields=, ?expand= and ?omit= """
+
+    def setUp(self) -> None:
+        self.project = Project.objects.create(name='project')
+        self.skill = Skill.objects.create(name='js')
+        self.member = Member.objects.create(first_name='Vasya', last_name='Pupkin', project=self.project)
+        self.member.skills.add(self.skill)
+        get_shared_versions(('members', 'skills', 'projects', 'workhours'))
+
+    def get(self, **params):
+        response = client.get(reverse('members-detail', kwargs={'pk': self.member.pk}), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_fields_render_relations_as_ids(self):
+        with CaptureQueriesContext(connection) as queries:
+            data = self.get(fields='id,first_name,project,skills')
+        self.assertEqual(data, {'id': self.member.pk, 'first_name': 'Vasya', 'project': self.project.pk,
+                                'skills': [self.skill.pk]})
+        self.assertFalse(any('projects_project' in query['sql'] for query in queries.captured_queries))
+
+    def test_expand_and_dotted_fields(self):
+        data = self.get(fields='id,skills', expand='project')
+        self.assertEqual(data['project'], {'id': self.project.pk, 'name': 'project'})
+        self.assertEqual(data['skills'], [self.skill.pk])
+
+        self.assertEqual(self.get(fields='project.name'), {'project': {'name': 'project'}})
+
+    def test_omit(self):
+        with self.assertNumQueries(2):  # shared versions, member, no skills query
+            data = self.get(omit='skills,workhours')
+        self.assertNotIn('skills', data)
+        self.assertNotIn('workhours', data)
+        self.assertEqual(data['project'], {'id': self.project.pk, 'name': 'project'})
+
+        response = client.get(reverse('projects-list'), {'omit': 'name'})
+        self.assertEqual(response.data['results'], [{'id': self.project.pk}])
+
+    def test_caches_are_bounded(self):
+        names = MemberSerializer.Meta.fields
+        combinations = [
+            {param: ','.join(chosen)}
+            for param in ('fields', 'omit') for size in (1, 2, 3, 4) for chosen in itertools.combinations(names, size)
+        ]
+        self.assertGreater(len(combinations), CLASS_CACHE_SIZE)
+        for params in combinations:
+            client.get(reverse('members-list'), params)
+        for cache in (_sparse_class, lean_serializer_for, plan_for):
+            self.assertLessEqual(cache.cache_info().currsize, CLASS_CACHE_SIZE)
+
+    def test_list_and_unknown_fields(self):
+        response = client.get(reverse('members-list'), {'fields': 'id,last_name'})
+        self.assertEqual(response.data['results'], [{'id': self.member.pk, 'last_name': 'Pupkin'}])
+
+        response = client.get(reverse('members-list'), {'fields': 'id,salary'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_schema(self):
+        schema = json.loads(client.get(reverse('docs'), {'format': 'openapi'}).content)
+        for path in ('/members/', '/members/{id}/'):
+            names = [parameter['name'] for parameter in schema['paths'][path]['get']['parameters']]
+            self.assertTrue({'fields', 'expand', 'omit'} <= set(names), path)
+
+
+class GenerateOrgTest(TestCase):
+    """ Test module for members.generator and the generate_org command """
+
+    def snapshot(self):
+        return (
+            list(Member.objects.order_by('pk').values_list(
+                'pk', 'first_name', 'last_name', 'manager_id', 'project', 'workhours__timezone', 'on_holidays_till'
+            )),
+            list(Member.skills.through.objects.order_by('member_id', 'skill_id').values_list('member_id', 'skill__name')),
+        )
+
+    def test_deterministic_org(self):
+        options = {'seed': 1, 'timezones': TIMEZONES[:1], 'as_of': date(2024, 1, 1)}
+        org = generate_org(300, **options)
+        first = self.snapshot()
+        clear_org()
+        generate_org(300, **options)
+        self.assertEqual(self.snapshot(), first)
+
+        # One tree under a single root, popular skills first
+        ids = list(org['member_ids'])
+        self.assertEqual(Member.objects.filter(manager_id=None).count(), 1)
+        self.assertFalse(members_in_cycles(ids))
+        self.assertEqual(rollup(ids[0])['headcount'], 299)
+        counts = Counter(Member.skills.through.objects.values_list('skill__name', flat=True))
+        self.assertGreater(counts[org['skills'][0]], counts[org['skills'][-1]])
+        self.assertTrue(Member.objects.filter(on_holidays_till__gte=date(2024, 1, 1)).exists())
+
+    def test_dump_and_load(self):
+        path = os.path.join(tempfile.mkdtemp(), 'org.jsonl.gz')
+        call_command('generate_org', members=100, timezones=1, dump=path, stdout=io.StringIO())
+        dumped = self.snapshot()
+
+        call_command('generate_org', clear=True, load=path, stdout=io.StringIO())
+        self.assertEqual(self.snapshot(), dumped)
+        self.assertTrue(WorkInterval.objects.exists())
+        self.assertGreater(Member.objects.create(first_name='New', last_name='Member').pk, dumped[0][-1][0])
+
+
 class UpdateSingleMemberTest(TestCase):
     """ Test module for updating an existing member record """
 
@@ -231,6 +1211,66 @@ class DeleteSingleMemberTest(TestCase):
             reverse('members-detail', kwargs={'pk': 30}))
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
+class MembersQueryCountTest(TestCase):
+    """ Test module to pin the number of queries per members endpoint """
+
+    def create_members(self, count):
+        work_hours = WorkHours.objects.create(
+            start="09:00:00",
+            end="18:00:00",
+            timezone="Europe/Kiev"
+        )
+        skills = [Skill.objects.create(name=name) for name in ('js', 'python')]
+
+        for i in range(count):
+            member = Member.objects.create(
+                first_name='Vasya{}'.format(i),
+                last_name='Pupkin',
+                project=self.project,
+                workhours=work_hours,
+            )
+            member.skills.set(skills)
+
+    def setUp(self) -> None:
+        self.project = Project.objects.create(
+            name='project'
+        )
+        get_shared_versions(('members', 'skills', 'projects', 'workhours'))  # started once per namespace
+
+    def test_list_query_count_is_constant(self):
+        self.create_members(1)
+        with self.assertNumQueries(3):  # shared versions, members with joins, skills
+            client.get(reverse('members-list'))
+
+        self.create_members(9)
+        with self.assertNumQueries(3):
+            response = client.get(reverse('members-list'))
+        self.assertEqual(len(response.data['results']), 10)
+
+    def test_retrieve_query_count(self):
+        self.create_members(1)
+        member = Member.objects.get()
+        with self.assertNumQueries(3):  # shared versions, member with joins, skills
+            response = client.get(reverse('members-detail', kwargs={'pk': member.pk}))
+        self.assertEqual(len(response.data['skills']), 2)
+
+    def test_assign_to_project_query_count(self):
+        self.create_members(1)
+        member = Member.objects.get()
+        project = Project.objects.create(name='project2')
+        with self.assertNumQueries(5):  # member, project, update, member with joins, skills
+            response = client.post(
+                reverse('members-assign-to-project', kwargs={'pk': member.pk}),
+                data=json.dumps({'id': project.pk}),
+                content_type='application/json'
+            )
+        self.assertEqual(response.data['project']['id'], project.pk)
+
+    def test_workhours_list_query_count(self):
+        self.create_members(5)
+        with self.assertNumQueries(3):  # shared versions, count, workhours
+            client.get(reverse('workhours-list'))
+
 # ===================================== Work Hours Tests =====================================
 
 
@@ -1,28 +1,105 @@
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.utils import timezone
 from django_filters import rest_framework as filters
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import UnsupportedMediaType, ValidationError
 from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 
+from members.export import export_rows
 from members.filters import MembersFilter
+from members.hierarchy import chain_of_command, reports_of, rollup, rollups
+from members.importer import CSV, NDJSON, import_members
+from members.meetings import common_windows
 from members.models import WorkHours, Member
-from members.serializers import WorkHoursSerializer, MemberSerializer
+from members.search import MemberSearchFilter
+from members.serializers import WorkHoursSerializer, MemberSerializer, BulkAssignToProjectSerializer, \
+    StaffingSerializer, ShiftSerializer, MeetingSlotsSerializer, MeetingWindowSerializer, HolidaySerializer
+from members.staffing import Staffing
 from projects.models import Project
 
 from projects.serializers import ProjectIdSerializer
+from SimpleOffice.cache import CachedResponseMixin, invalidate
+from SimpleOffice.db import ReplicaReadMixin
+from SimpleOffice.lean import LeanReadMixin
+from SimpleOffice.pagination import KeysetPagination, RankedPagination
+from SimpleOffice.renderers import CSVRenderer, NDJSONRenderer
+from SimpleOffice.prefetch import PrefetchPlannerMixin, plan_queryset
+from SimpleOffice.sparse import SparseFieldsMixin
 
 
-class WorkHoursViewSet(viewsets.ModelViewSet):
+class WorkHoursViewSet(ReplicaReadMixin, CachedResponseMixin, LeanReadMixin, SparseFieldsMixin, PrefetchPlannerMixin,
+                       viewsets.ModelViewSet):
     queryset = WorkHours.objects.all()
     serializer_class = WorkHoursSerializer
+    cache_dependencies = ('workhours', )
 
+    @action(detail=True, methods=['GET', 'PUT'], serializer_class=ShiftSerializer)
+    def shifts(self, request, pk=None):
+        """
+        URL: /workhours/{id}/shifts/
+        The weekly shifts of the schedule, PUT replaces all of them,
+        an empty list brings back start-end on every day
+        """
+        workhours = get_object_or_404(WorkHours, pk=pk)
+        if request.method == 'PUT':
+            serializer = self.get_serializer(data=request.data, many=True)
+            serializer.is_valid(raise_exception=True)
+            workhours.set_shifts(
+                (shift['weekday'], shift['start'], shift['end']) for shift in serializer.validated_data
+            )
+        serializer = self.get_serializer(workhours.weekly_shifts.all(), many=True)
+        return Response(serializer.data)
 
-class MembersViewSet(viewsets.ModelViewSet):
+
+class MembersViewSet(ReplicaReadMixin, CachedResponseMixin, LeanReadMixin, SparseFieldsMixin, PrefetchPlannerMixin,
+                     viewsets.ModelViewSet):
     queryset = Member.objects.all()
     serializer_class = MemberSerializer
+    cache_dependencies = ('members', 'skills', 'projects', 'workhours')
+
+    import_formats = {
+        'text/csv': CSV,
+        'application/x-ndjson': NDJSON,
+        'application/jsonl': NDJSON,
+    }
 
-    filter_backends = (filters.DjangoFilterBackend, )
+    filter_backends = (filters.DjangoFilterBackend, MemberSearchFilter)
     filterset_class = MembersFilter
+    pagination_class = KeysetPagination
+
+    @property
+    def paginator(self):
+        # Search results are ordered by relevance, which a cursor over ids can't follow
+        if not hasattr(self, '_paginator'):
+            searching = self.request is not None and self.request.query_params.get(MemberSearchFilter.search_param)
+            self._paginator = RankedPagination() if searching else self.pagination_class()
+        return self._paginator
+
+    def get_cache_key_extra(self, request):
+        # Filters without an explicit moment depend on the current time
+        params = request.query_params
+        now = timezone.now()
+        return '|'.join((
+            now.strftime('%Y-%m-%dT%H:%M') if 'is_working' in params and 'at' not in params else '',
+            now.strftime('%Y-%m-%d') if 'holidays' in params and 'as_of' not in params else '',
+        ))
+
+    @action(detail=True, methods=['GET', 'PUT'], serializer_class=HolidaySerializer)
+    def holidays(self, request, pk=None):
+        """
+        URL: /members/{id}/holidays/
+        The holiday periods of the member, PUT replaces all of them
+        """
+        member = get_object_or_404(Member, pk=pk)
+        if request.method == 'PUT':
+            serializer = self.get_serializer(data=request.data, many=True)
+            serializer.is_valid(raise_exception=True)
+            member.set_holidays((holiday['start'], holiday['end']) for holiday in serializer.validated_data)
+        serializer = self.get_serializer(member.holidays.all(), many=True)
+        return Response(serializer.data)
 
     @action(detail=True, methods=['POST', ], serializer_class=ProjectIdSerializer)
     def assign_to_project(self, request, pk=None):
@@ -31,15 +108,203 @@ class MembersViewSet(viewsets.ModelViewSet):
         :param pk: id of the member we're assigning to the project
         :return: Response
         """
-        member = get_object_or_404(Member, pk=pk)
+        member = get_object_or_404(Member.objects.with_availability(), pk=pk)
         project = get_object_or_404(Project, pk=request.data['id'])
 
-        serializer = MemberSerializer(member)
-
-        if member.is_available:
-            member.project = project
-            member.save()
-
+        # The update is conditional so a holiday set in between is respected too
+        if member.is_available and Member.objects.available().filter(pk=member.pk).update(project=project):
+            invalidate('members')
+            member = plan_queryset(Member.objects.all(), MemberSerializer).get(pk=member.pk)
+            serializer = MemberSerializer(member)
             return Response(serializer.data, status=status.HTTP_200_OK)
 
         return Response({"message": "Member can't be assigned to the project now"})
+
+    @action(detail=False, methods=['POST', ], serializer_class=BulkAssignToProjectSerializer,
+            url_path='assign_to_project', url_name='bulk-assign-to-project')
+    def bulk_assign_to_project(self, request):
+        """
+        URL: /members/assign_to_project/
+        Assigns many members at once, only the available ones are moved
+        :return: Response with the outcome for every member
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        project = serializer.validated_data['project']
+
+        if 'members' in serializer.validated_data:
+            requested = list(dict.fromkeys(serializer.validated_data['members']))
+            queryset = Member.objects.filter(pk__in=requested)
+        else:
+            params = {
+                key: ','.join(map(str, value)) if isinstance(value, list) else value
+                for key, value in serializer.validated_data['filter'].items()
+            }
+            filterset = MembersFilter(data=params, queryset=Member.objects.all(), request=request)
+            if not filterset.is_valid():
+                raise ValidationError({'filter': filterset.errors})
+            requested = None
+            queryset = Member.objects.filter(pk__in=filterset.qs.values('pk'))
+
+        with transaction.atomic():
+            availability = dict(
+                queryset.with_availability().select_for_update().order_by('pk').values_list('pk', 'available')
+            )
+            # The rows are locked, the update runs over the same subquery rather than a list of their ids
+            assigned = queryset.available().update(project=project)
+            invalidate('members')
+
+        statuses = {pk: 'assigned' if available else 'on_holiday' for pk, available in availability.items()}
+        results = [
+            {'id': pk, 'status': statuses.get(pk, 'not_found')}
+            for pk in (availability if requested is None else requested)
+        ]
+
+        return Response({'project': project.pk, 'assigned': assigned, 'results': results}, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['POST', ], serializer_class=StaffingSerializer)
+    def staffing(self, request):
+        """
+        URL: /members/staffing/
+        Proposes teams of available members covering the required skills
+        :return: Response with the ranked teams, complete and small ones first
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        staffing = Staffing(
+            data['requirements'],
+            overlap_minutes=round(data['overlap_hours'] * 60),
+            exclude_assigned=data['exclude_assigned'],
+            as_of=data.get('as_of'),
+        )
+        teams = staffing.teams(data['teams'])
+
+        ids = {pk for team in teams for pk in team['members']}
+        names = {
+            pk: {'id': pk, 'first_name': first_name, 'last_name': last_name}
+            for pk, first_name, last_name in Member.objects.filter(pk__in=ids).values_list('pk', 'first_name', 'last_name')
+        }
+        for team in teams:
+            team['members'] = [dict(names[pk], skills=team['skills'][pk]) for pk in team['members'] if pk in names]
+            del team['skills']
+
+        return Response({'unknown_skills': staffing.unknown, 'teams': teams}, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['POST', ], serializer_class=MeetingSlotsSerializer)
+    def meeting_slots(self, request):
+        """
+        URL: /members/meeting_slots/
+        Windows in which all the members, or all of the project's, are working and not on holidays,
+        those on holidays all of their working time in the range and those without working hours are left out
+        :return: Response with the windows in UTC and who was left out
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        start, end = data['start'], data['end']
+
+        if 'members' in data:
+            requested = list(dict.fromkeys(data['members']))
+            queryset = Member.objects.filter(pk__in=requested)
+        else:
+            requested = None
+            queryset = Member.objects.filter(project=data['project'])
+        rows = list(queryset.order_by('pk').values_list('pk', 'workhours_id', 'on_holidays_till'))
+        found = {pk for pk, workhours_id, till in rows}
+
+        without_workhours = [pk for pk, workhours_id, till in rows if workhours_id is None]
+        attending, on_holidays, windows = common_windows(
+            [row for row in rows if row[1] is not None], start, end, data['duration_minutes'],
+        )
+        windows = [
+            {'start': first, 'end': last, 'minutes': int((last - first).total_seconds() // 60)}
+            for first, last in windows
+        ]
+        return Response({
+            'members': attending,
+            'on_holidays': on_holidays,
+            'without_workhours': without_workhours,
+            'not_found': [pk for pk in requested if pk not in found] if requested is not None else [],
+            'windows': MeetingWindowSerializer(windows, many=True).data,
+        }, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['POST', ], url_path='import', url_name='import')
+    def bulk_import(self, request):
+        """
+        URL: /members/import/?dry_run=true
+        Upserts members from a CSV (text/csv) or NDJSON (application/x-ndjson) body,
+        see members.importer for the row format
+        :return: Response with counters and per-row errors
+        """
+        content_type = request.content_type.split(';')[0].strip()
+        fmt = self.import_formats.get(content_type)
+        if fmt is None:
+            raise UnsupportedMediaType(content_type)
+
+        stream = request.stream
+        lines = (line.decode('utf-8-sig' if number == 0 else 'utf-8') for number, line in enumerate(stream or ()))
+        dry_run = request.query_params.get('dry_run', '').lower() in ('1', 'true')
+
+        report = import_members(lines, fmt, dry_run=dry_run)
+        return Response(report, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['GET', ], renderer_classes=(NDJSONRenderer, CSVRenderer))
+    def export(self, request):
+        """
+        URL: /members/export/?format=ndjson|csv
+        Streams every member matching the MembersFilter params
+        :return: StreamingHttpResponse
+        """
+        queryset = self.filter_queryset(Member.objects.order_by('pk'))
+        renderer = request.accepted_renderer
+
+        response = StreamingHttpResponse(
+            renderer.stream(export_rows(queryset, flat=renderer.flat)),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}',
+        )
+        response['Content-Disposition'] = f'attachment; filename="members.{renderer.format}"'
+        return response
+
+    @action(detail=True, methods=['GET', ])
+    def reports(self, request, pk=None):
+        """
+        URL: /members/{id}/reports/
+        Every direct and indirect report of the member, MembersFilter params apply
+        """
+        member = get_object_or_404(Member.objects.only('pk'), pk=pk)
+        queryset = self.filter_queryset(reports_of(self.get_queryset(), member.pk))
+
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=True, methods=['GET', ])
+    def chain(self, request, pk=None):
+        """
+        URL: /members/{id}/chain/
+        Chain of command from the direct manager up to the root
+        """
+        member = get_object_or_404(Member.objects.only('pk'), pk=pk)
+        ids = chain_of_command(member.pk)
+        managers = self.get_queryset().in_bulk(ids)
+        serializer = self.get_serializer([managers[pk] for pk in ids if pk in managers], many=True)
+        return Response(serializer.data)
+
+    @action(detail=True, methods=['GET', ])
+    def rollup(self, request, pk=None):
+        """
+        URL: /members/{id}/rollup/
+        :return: direct reports, headcount and depth of the member's organisation
+        """
+        member = get_object_or_404(Member.objects.only('pk'), pk=pk)
+        return Response(rollup(member.pk))
+
+    @action(detail=False, methods=['GET', ])
+    def rollups(self, request):
+        """
+        URL: /members/rollups/
+        :return: rollup of every manager, biggest organisations first
+        """
+        return Response(rollups())
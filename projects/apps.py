@@ -3,3 +3,9 @@ from django.apps import AppConfig
 
 class ProjectsConfig(AppConfig):
     name = 'projects'
+
+    def ready(self):
+        from projects.models import Project
+        from SimpleOffice.cache import invalidate_on_change
+
+        invalidate_on_change(Project, 'projects')
@@ -2,9 +2,18 @@ from django.shortcuts import render
 from rest_framework import viewsets
 
 from projects.models import Project
+from SimpleOffice.cache import CachedResponseMixin
+from SimpleOffice.db import ReplicaReadMixin
+from SimpleOffice.lean import LeanReadMixin
+from SimpleOffice.pagination import OptionalKeysetPagination
+from SimpleOffice.prefetch import PrefetchPlannerMixin
+from SimpleOffice.sparse import SparseFieldsMixin
 from projects.serializers import ProjectSerializer
 
 
-class ProjectsViewSet(viewsets.ModelViewSet):
+class ProjectsViewSet(ReplicaReadMixin, CachedResponseMixin, LeanReadMixin, SparseFieldsMixin, PrefetchPlannerMixin,
+                      viewsets.ModelViewSet):
     queryset = Project.objects.all()
     serializer_class = ProjectSerializer
+    pagination_class = OptionalKeysetPagination
+    cache_dependencies = ('projects', )
@@ -3,3 +3,9 @@ from django.apps import AppConfig
 
 class SkillsConfig(AppConfig):
     name = 'skills'
+
+    def ready(self):
+        from skills.models import Skill
+        from SimpleOffice.cache import invalidate_on_change
+
+        invalidate_on_change(Skill, 'skills')
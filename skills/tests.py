@@ -1,9 +1,13 @@
 import json
+import time
 
-from django.test import TestCase, Client
+from django.conf import settings
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from rest_framework import status
 
+from SimpleOffice.cache import _version_key, get_shared_cache
+
 from skills.models import Skill
 from skills.serializers import SkillSerializer
 
@@ -54,6 +58,69 @@ class GetSingleSkillTest(TestCase):
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
 
+class CachedSkillsTest(TestCase):
+    """ Test module for the response cache of skills """
+
+    def setUp(self) -> None:
+        Skill.objects.create(
+            name='JS'
+        )
+
+    def test_second_request_is_cached(self):
+        client.get(reverse('skills-list'))
+        with self.assertNumQueries(1):  # the shared versions
+            response = client.get(reverse('skills-list'))
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_write_invalidates(self):
+        client.get(reverse('skills-list'))
+        Skill.objects.create(
+            name='Python'
+        )
+        response = client.get(reverse('skills-list'))
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_conditional_get(self):
+        response = client.get(reverse('skills-list'))
+        etag = response['ETag']
+        self.assertNotIn('Last-Modified', response)
+
+        response = client.get(reverse('skills-list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        # a second's resolution would hide writes made within the same second
+        response = client.get(reverse('skills-list'), HTTP_IF_MODIFIED_SINCE='Wed, 01 Jan 3000 00:00:00 GMT')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        Skill.objects.filter(name='JS').delete()
+        response = client.get(reverse('skills-list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    @override_settings(CACHES=dict(settings.CACHES, worker={
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'worker',
+    }))
+    def test_follows_other_processes(self):
+        # Another worker with versions of its own caches the list and tags it
+        with override_settings(API_CACHE_ALIAS='worker'):
+            etag = client.get(reverse('skills-list'))['ETag']
+
+        # A write in this process, its commit bumps the shared versions
+        Skill.objects.create(name='Python')
+        get_shared_cache().set(_version_key('skills'), time.time(), None)
+
+        with override_settings(API_CACHE_ALIAS='worker'):
+            response = client.get(reverse('skills-list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_stats(self):
+        client.get(reverse('skills-list'))
+        client.get(reverse('skills-list'))
+        response = client.get(reverse('cache-stats'))
+        self.assertGreaterEqual(response.data['skills-list']['hit'], 1)
+        self.assertGreaterEqual(response.data['skills-list']['miss'], 1)
+
+
 class CreateNewSkillTest(TestCase):
     """ Test module for inserting a new skill """
 
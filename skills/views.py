@@ -2,9 +2,18 @@ from django.shortcuts import render
 from rest_framework import viewsets
 
 from skills.models import Skill
+from SimpleOffice.cache import CachedResponseMixin
+from SimpleOffice.db import ReplicaReadMixin
+from SimpleOffice.lean import LeanReadMixin
+from SimpleOffice.pagination import OptionalKeysetPagination
+from SimpleOffice.prefetch import PrefetchPlannerMixin
+from SimpleOffice.sparse import SparseFieldsMixin
 from skills.serializers import SkillSerializer
 
 
-class SkillsViewSet(viewsets.ModelViewSet):
+class SkillsViewSet(ReplicaReadMixin, CachedResponseMixin, LeanReadMixin, SparseFieldsMixin, PrefetchPlannerMixin,
+                    viewsets.ModelViewSet):
     queryset = Skill.objects.all()
-    serializer_class = SkillSerializer
\ No newline at end of file
+    serializer_class = SkillSerializer
+    pagination_class = OptionalKeysetPagination
+    cache_dependencies = ('skills', )